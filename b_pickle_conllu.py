@@ -8,11 +8,10 @@ Key fixes:
 """
 
 import pickle
-from grc_utils import vowel
 from tqdm import tqdm
 import os
 
-from class_token import Token
+from grc_macronizer.conllu import is_archive, read_sentences, sentences_from_archive
 
 
 # -------------------------
@@ -20,7 +19,7 @@ from class_token import Token
 # -------------------------
 def prepare_sentence_list_from_conllu_ud(input_tsv, output_pkl="oga_sentences.pkl", chunk_size=10000):
     """
-    Reads a UD .tsv file and processes sentences into Token objects.
+    Reads a UD .tsv file (or an archive of .conllu files) and processes sentences into Token objects.
     Skips words without vowels. Writes pickle in chunks to avoid memory issues.
 
     Minimal changes from your previous version: the Token signature now supports token_id.
@@ -36,69 +35,37 @@ def prepare_sentence_list_from_conllu_ud(input_tsv, output_pkl="oga_sentences.pk
     # Temporary storage for chunks
     temp_files = []
 
-    current_sentence = []
-
-    # Count total lines for tqdm
-    with open(input_tsv, "r", encoding="utf-8") as f:
-        total_lines = sum(1 for _ in f)
-
-    with open(input_tsv, "r", encoding="utf-8") as f:
-        for line in tqdm(f, total=total_lines, desc="Processing lines"):
-            if not line.strip() or line.startswith("#"):
-                continue
-
-            fields = line.strip().split("\t")
-            if len(fields) < 10:
-                continue
-
-            token_id = fields[0]
-            if "-" in token_id or "." in token_id:
-                continue  # skip multi-word tokens and empty nodes
-
-            # safe token_id int conversion; keep as int if possible
-            try:
-                token_id_int = int(token_id)
-            except ValueError:
-                token_id_int = token_id
-
-            text = fields[1]
-            lemma_ = fields[2]
-            pos_ = fields[3]
-            morph_str = fields[5]
-
-            # sentence boundary: token ID resets to 1
-            if token_id_int == 1 and current_sentence:
-                batch.append(current_sentence)
-                sentence_count += 1
-                current_sentence = []
-
-                # flush batch to temporary pickle if large
-                if len(batch) >= chunk_size:
-                    temp_file = f"{output_pkl}_chunk_{len(temp_files)}.pkl"
-                    with open(temp_file, "wb") as f_chunk:
-                        pickle.dump(batch, f_chunk, protocol=pickle.HIGHEST_PROTOCOL)
-                    temp_files.append(temp_file)
-                    batch = []
-
-            # skip words without vowels
-            if not any(vowel(char) for char in text):
-                continue
-
-            # instantiate Token with token_id (works with older and newer constructors)
-            tok = Token(text, lemma_, pos_, morph_str, token_id_int)
-            current_sentence.append(tok)
-
-    # append last sentence
-    if current_sentence:
-        batch.append(current_sentence)
-        sentence_count += 1
-
-    # flush remaining batch
-    if batch:
+    def flush_batch():
         temp_file = f"{output_pkl}_chunk_{len(temp_files)}.pkl"
         with open(temp_file, "wb") as f_chunk:
             pickle.dump(batch, f_chunk, protocol=pickle.HIGHEST_PROTOCOL)
         temp_files.append(temp_file)
+
+    # input_tsv can also be a compressed archive of CoNLL-U files (e.g. oga_conllu_ud.7z),
+    # which is then streamed member by member without extracting anything to disk
+    if is_archive(input_tsv):
+        sentences = sentences_from_archive(input_tsv)
+        f = None
+    else:
+        f = open(input_tsv, "r", encoding="utf-8")
+        sentences = read_sentences(f) # skips words without vowels, multi-word tokens and empty nodes
+
+    try:
+        for sentence in tqdm(sentences, desc="Processing sentences"):
+            batch.append(sentence)
+            sentence_count += 1
+
+            # flush batch to temporary pickle if large
+            if len(batch) >= chunk_size:
+                flush_batch()
+                batch = []
+    finally:
+        if f is not None:
+            f.close()
+
+    # flush remaining batch
+    if batch:
+        flush_batch()
         batch = []
 
     # Merge all chunk files into the final pickle
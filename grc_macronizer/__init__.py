@@ -1 +1,9 @@
-from .class_macronizer import Macronizer
\ No newline at end of file
+def __getattr__(name):
+    '''
+    Macronizer is imported lazily, since importing class_macronizer loads all the databases.
+    This way the readers (conllu, class_token) can be used without paying for that.
+    '''
+    if name == "Macronizer":
+        from .class_macronizer import Macronizer
+        return Macronizer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,97 @@
+'''
+The accentuation rules, as a table from the accent shape of a word to the markup it implies:
+
+    - paroxytone with short ultima (e.g. λόγος):          penultima short
+    - paroxytone with long acute penultima (σωτῆρα-rule): ultima long
+    - properispomenon (e.g. σῶμα) or proparoxytone:        ultima short
+
+The shape of a word is the four facts the rules ask about its last syllables (see shape()). The rules are compiled
+into ACCENT_RULES once, so applying them is a syllabification, a table lookup and the markup of at most two
+syllables, and apply_accentuation_rules is memoized on the word, since it runs at least twice per token
+(in the cascade and as the final sanity pass) and once more for every recursion variant.
+'''
+
+from functools import lru_cache
+from itertools import product
+import logging
+
+from grc_utils import long_acute, paroxytone, proparoxytone, properispomenon, short_vowel, syllabifier, vowel, word_with_real_dichrona
+
+from .format_macrons import merge_or_overwrite_markup
+from .sanity_check import macronized_diphthong
+from .word_forms import normalize_word
+
+MEMO_SIZE = 1 << 18
+
+
+def compile_rules():
+    '''
+    {(paroxytone, short ultima, long acute penultima, properispomenon or proparoxytone): ((syllable position, mark), ...)}
+    '''
+    table = {}
+    for is_paroxytone, short_ultima, long_acute_penultima, circumflex_or_proparoxytone in product((False, True), repeat=4):
+        marks = []
+        if is_paroxytone and short_ultima:
+            marks.append((-2, '^'))
+        if is_paroxytone and long_acute_penultima:
+            marks.append((-1, '_'))
+        elif circumflex_or_proparoxytone:
+            marks.append((-1, '^'))
+        table[(is_paroxytone, short_ultima, long_acute_penultima, circumflex_or_proparoxytone)] = tuple(marks)
+    return table
+
+
+ACCENT_RULES = compile_rules()
+
+
+def shape(word, syllables):
+    '''
+    The key into ACCENT_RULES for a word without markup, given the syllables of the word with its markup
+    (the markup can decide short_vowel and long_acute).
+    '''
+    is_paroxytone = paroxytone(word)
+    short_ultima = is_paroxytone and len(syllables) > 1 and short_vowel(syllables[-1])
+    long_acute_penultima = is_paroxytone and long_acute(syllables[-2] if len(syllables) > 1 else None)
+    circumflex_or_proparoxytone = not long_acute_penultima and (properispomenon(word) or proparoxytone(word))
+    return (is_paroxytone, bool(short_ultima), bool(long_acute_penultima), bool(circumflex_or_proparoxytone))
+
+
+def mark_last_vowel(syllable, mark):
+    '''
+    Puts the mark after the last vowel of the syllable, if it has a real dichronon, replacing any later markup.
+    '''
+    if not word_with_real_dichrona(syllable):
+        return syllable.replace('_', '').replace('^', '')
+    for i in range(len(syllable) - 1, -1, -1):
+        if vowel(syllable[i]):
+            return syllable[:i + 1] + mark + syllable[i + 1:].replace('^', '').replace('_', '')
+    return syllable.replace('_', '').replace('^', '')
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def apply_accentuation_rules(old_version):
+    if "'" in old_version:
+        return old_version
+
+    if not old_version:
+        return old_version
+    old_version = normalize_word(old_version)
+
+    syllables = syllabifier(old_version) # important: needs to use old_version, for markup to potentially decide short_vowel and long_acute
+    if not syllables:
+        return old_version
+
+    marks = ACCENT_RULES[shape(old_version.replace('_', '').replace('^', ''), syllables)]
+
+    new_syllables = [syllable.replace('_', '').replace('^', '') for syllable in syllables]
+    for position, mark in marks:
+        if len(syllables) + position >= 0:
+            new_syllables[position] = mark_last_vowel(syllables[position], mark)
+    new_version = ''.join(new_syllables)
+
+    merged = merge_or_overwrite_markup(new_version, old_version)
+
+    if macronized_diphthong(merged):
+        logging.debug(f"apply_accentuation_rules just macronized a diphthong, so we returned the old version: {merged}")
+        return old_version
+    return merged
@@ -0,0 +1,277 @@
+'''
+Throughput benchmarks over the bundled test corpora:
+
+    python -m grc_macronizer.benchmark --output bench.json
+    python -m grc_macronizer.benchmark --compare bench_before.json   # exits with 1 on a regression
+
+Every corpus is macronized in a fresh process (so that peak RSS means something), a number of times in a row,
+reporting tokens per second, the time spent in each stage of Macronizer.macronize, and the peak resident set.
+The "modules" stage is broken down by cascade stage: the time of every word is split over the modules it was
+credited to (its provenance), and the words no module helped with are under "none".
+Startup is measured separately, cold (nothing compiled yet, so every database module is compiled from source)
+and warm (with the bytecode from the cold run). The memory held by each database is reported by memory.py and
+checked against a budget; a database over budget counts as a regression.
+
+The corpora:
+    - hiketides: Aeschylus' Suppliants (grc_macronizer/tests/hiketides.py), plain text without morphology
+    - anabasis: Xenophon's Anabasis (grc_macronizer/tests/anabasis.py), plain text without morphology
+    - example_ud_pkl, example_ud_tsv: the OGA samples in the repository root
+    - synthetic: example_ud.tsv scaled up --scale times, sentence order shuffled, as a stand-in for an OGA shard
+
+The results are written as JSON, so that runs on different commits can be diffed with --compare.
+'''
+
+import argparse
+from datetime import datetime
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError: # not on Windows
+    resource = None
+
+from .class_token import Token
+from .cli import load_shard
+from .memory import check_budget, DEFAULT_BUDGET_MB, load_budget, memory_report, MB
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+REPO_DIR = PACKAGE_DIR.parent
+
+CORPORA = ("hiketides", "anabasis", "example_ud_pkl", "example_ud_tsv", "synthetic")
+
+
+#####################
+# --- Corpora ---  #
+#####################
+
+def sentences_from_plain_text(text):
+    '''
+    Splits plain text into sentences of Token objects without lemma, POS or morphology (the word doubles as its lemma).
+    '''
+    sentences = []
+    for chunk in re.split(r"(?<=[.;\u037e\u0387\u00b7])\s+|\n+", text):
+        words = [word for word in re.split(r"[\s,.;:!\u037e\u0387\u00b7]+", chunk) if word]
+        if words:
+            sentences.append([Token(word, word, "X", "_", i + 1) for i, word in enumerate(words)])
+    return sentences
+
+
+def load_corpus(name, scale=20, seed=0):
+    if name == "hiketides":
+        from .tests.hiketides import hiketides
+        return sentences_from_plain_text(hiketides)
+    if name == "anabasis":
+        from .tests.anabasis import anabasis
+        return sentences_from_plain_text(anabasis)
+    if name == "example_ud_pkl":
+        return load_shard(REPO_DIR / "example_ud.pkl")
+    if name == "example_ud_tsv":
+        return load_shard(REPO_DIR / "example_ud.tsv")
+    if name == "synthetic":
+        sentences = load_shard(REPO_DIR / "example_ud.tsv") * scale
+        random.Random(seed).shuffle(sentences)
+        return sentences
+    raise ValueError(f"Unknown corpus: {name}")
+
+
+######################
+# --- Measuring ---  #
+######################
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 if sys.platform != "darwin" else peak / (1024 * 1024), 1) # KiB on Linux, bytes on macOS
+
+
+def measure_startup(pycache_prefix):
+    '''
+    Seconds for importing class_macronizer (i.e. loading all the databases) in a fresh interpreter.
+    '''
+    code = "import time; start = time.perf_counter(); import grc_macronizer.class_macronizer; print(time.perf_counter() - start)"
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=str(pycache_prefix), PYTHONPATH=os.pathsep.join(filter(None, (str(REPO_DIR), os.environ.get("PYTHONPATH")))))
+    with tempfile.TemporaryDirectory() as cwd: # importing class_macronizer starts a log in diagnostics/ under the working directory
+        output = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True).stdout
+    return round(float(output.strip().splitlines()[-1]), 3)
+
+
+def run_corpus(job):
+    '''
+    Runs in a fresh process: loads the macronizer and the corpus, then macronizes the corpus `repeats` times.
+    '''
+    name, options = job
+
+    start = time.perf_counter()
+    from .class_macronizer import Macronizer
+    macronizer = Macronizer(make_prints=False, no_hypotactic=options["no_hypotactic"])
+    load_seconds = time.perf_counter() - start
+
+    sentences = load_corpus(name, scale=options["scale"])
+    tokens = sum(len(sentence) for sentence in sentences)
+
+    runs = []
+    for _ in range(options["repeats"]):
+        start = time.perf_counter()
+        macronizer.macronize(sentences, genre=options["genre"])
+        seconds = time.perf_counter() - start
+        runs.append({
+            "seconds": round(seconds, 3),
+            "tokens_per_second": round(tokens / seconds, 1) if seconds else None,
+            "stages": {stage: round(value, 3) for stage, value in macronizer.stage_seconds.items()},
+            "modules": {module or "none": round(value, 3) for module, value in sorted(macronizer.module_seconds.items(), key=lambda item: -item[1])},
+        })
+
+    best = min(runs, key=lambda run: run["seconds"])
+    return name, {
+        "sentences": len(sentences),
+        "tokens": tokens,
+        "load_seconds": round(load_seconds, 3),
+        "first_run": runs[0],
+        "best_run": best,
+        "tokens_per_second": best["tokens_per_second"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(corpora=CORPORA, repeats=2, scale=20, genre="prose", no_hypotactic=False, startup=True, memory=True):
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {"repeats": repeats, "scale": scale, "genre": genre, "no_hypotactic": no_hypotactic},
+    }
+
+    if startup:
+        with tempfile.TemporaryDirectory() as pycache_prefix:
+            results["startup"] = {
+                "cold_seconds": measure_startup(pycache_prefix),
+                "warm_seconds": measure_startup(pycache_prefix),
+            }
+
+    if memory:
+        results["memory_mb"] = {name: round(size / MB, 1) for name, size in memory_report().items()}
+
+    options = {"repeats": repeats, "scale": scale, "genre": genre, "no_hypotactic": no_hypotactic}
+    context = multiprocessing.get_context("spawn")
+    results["corpora"] = {}
+    for name in corpora:
+        with context.Pool(1) as pool: # a fresh process per corpus
+            name, result = pool.apply(run_corpus, ((name, options),))
+        results["corpora"][name] = result
+        print(f"{name}: {result['tokens']} tokens, {result['tokens_per_second']} tokens/s, peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+
+    return results
+
+
+######################
+# --- Comparing ---  #
+######################
+
+def compare(old, new, tolerance=0.1):
+    '''
+    Returns a list of regressions: throughput down, or peak RSS or startup up, by more than `tolerance`.
+    '''
+    regressions = []
+
+    def check(label, old_value, new_value, higher_is_better):
+        if not old_value or new_value is None:
+            return
+        change = (new_value - old_value) / old_value
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{label}: {old_value} -> {new_value} ({change:+.0%})")
+
+    for name, new_result in new.get("corpora", {}).items():
+        old_result = old.get("corpora", {}).get(name)
+        if old_result is None or old_result["tokens"] != new_result["tokens"]:
+            continue
+        check(f"{name} tokens/s", old_result["tokens_per_second"], new_result["tokens_per_second"], higher_is_better=True)
+        check(f"{name} peak RSS (MB)", old_result["peak_rss_mb"], new_result["peak_rss_mb"], higher_is_better=False)
+
+    for key in ("cold_seconds", "warm_seconds"):
+        check(f"startup {key}", old.get("startup", {}).get(key), new.get("startup", {}).get(key), higher_is_better=False)
+
+    for name, new_size in new.get("memory_mb", {}).items():
+        check(f"{name} memory (MB)", old.get("memory_mb", {}).get(name), new_size, higher_is_better=False)
+
+    return regressions
+
+
+####################
+# --- Main ---  #
+####################
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="grc-macronize-benchmark", description="Benchmark the macronizer on the bundled corpora.")
+    parser.add_argument("--corpus", action="append", choices=CORPORA, help="corpus to run (repeatable; default: all)")
+    parser.add_argument("--repeats", type=int, default=2, help="macronize each corpus this many times in a row (default: 2)")
+    parser.add_argument("--scale", type=int, default=20, help="how many copies of example_ud.tsv make up the synthetic corpus (default: 20)")
+    parser.add_argument("--genre", default="prose", choices=["prose", "epic"])
+    parser.add_argument("--no-hypotactic", action="store_true")
+    parser.add_argument("--no-startup", action="store_true", help="skip the cold and warm startup measurements")
+    parser.add_argument("--no-memory", action="store_true", help="skip the memory report and the budget check")
+    parser.add_argument("--memory-budget", metavar="JSON", help="database memory budget in MB (default: memory.DEFAULT_BUDGET_MB)")
+    parser.add_argument("--output", help="write the results to this JSON file (default: stdout)")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results to compare with; exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change counted as a regression (default: 0.1)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    results = run_benchmarks(
+        corpora=args.corpus or CORPORA,
+        repeats=args.repeats,
+        scale=args.scale,
+        genre=args.genre,
+        no_hypotactic=args.no_hypotactic,
+        startup=not args.no_startup,
+        memory=not args.no_memory,
+    )
+
+    failed = False
+    if "memory_mb" in results:
+        budget = load_budget(args.memory_budget) if args.memory_budget else DEFAULT_BUDGET_MB
+        violations = check_budget({name: size * MB for name, size in results["memory_mb"].items()}, budget)
+        results["memory_budget_violations"] = violations
+        for violation in violations:
+            print(f"OVER BUDGET {violation}", file=sys.stderr)
+        failed = bool(violations)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), results, tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        failed = failed or bool(regressions)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
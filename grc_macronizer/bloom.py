@@ -0,0 +1,60 @@
+'''
+Bloom filters: compact sets that can answer "maybe" for a key that is not in them, but never "no" for one that is.
+
+Most tokens are in none of the databases, and a miss used to cost as much as a hit: the custom module scans all of
+its keys for case variants, Wiktionary strips macrons and retries in lowercase, and so on. A filter per database
+(built with the indexes, see indexes.py) lets the cascade skip a database outright for most of the tokens it does not
+have. At BITS_PER_KEY bits per key and HASHES hashes, about 1% of the misses are let through.
+
+The hashes are CRC32s of the key and of the key reversed (double hashing), so that they are the same in every process.
+'''
+from zlib import crc32
+
+BITS_PER_KEY = 10
+HASHES = 7
+
+
+class BloomFilter:
+    def __init__(self, size, hashes=HASHES):
+        bits = 8
+        while bits < size: # a power of two, for the hashes to be masked rather than divided
+            bits *= 2
+        self.mask = bits - 1
+        self.hashes = hashes
+        self.bits = bytearray(bits // 8)
+        self.count = 0
+
+    @classmethod
+    def from_keys(cls, keys, bits_per_key=BITS_PER_KEY, hashes=HASHES):
+        keys = set(keys)
+        bloom = cls(bits_per_key * max(len(keys), 1), hashes)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def _positions(self, key):
+        data = key.encode("utf-8")
+        h1 = crc32(data)
+        h2 = crc32(data[::-1]) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) & self.mask
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        # _positions() inlined, since a token is looked up in a filter at every stage of every recursion
+        data = key.encode("utf-8")
+        h1 = crc32(data)
+        h2 = crc32(data[::-1]) | 1
+        bits, mask = self.bits, self.mask
+        for i in range(self.hashes):
+            position = (h1 + i * h2) & mask
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __repr__(self):
+        return f"BloomFilter({self.count} keys, {len(self.bits)} bytes)"
@@ -0,0 +1,143 @@
+'''
+ALGORITHMIC MACRONIZING: WRONG CASE ENDINGS
+
+Many forms are only in the databases as their nominative: πόλιν should go through πόλις, στρατηγόν through στρατηγός.
+The wrong-case-ending recursion reconstructs the lemma form of a token from its ending, macronizes that, and puts the
+markup of the stem back on the token (the ending itself changes, so its markup is not carried over).
+
+The endings are declared in PARADIGMS as (declension, case, observed ending, lemma-form ending) and compiled into
+ENDING_TABLE, keyed on (declension, whether the ending is matched without diacritics, observed ending), so that
+a token costs one lookup per ending length. To add a paradigm, add its endings to PARADIGMS and, if need be, a test
+for its lemmata to declension().
+
+The reconstructed form is macronized as a nominative singular (see nominative_morph), so that every form of a noun
+reconstructs the same (form, lemma, morphology), and the Macronizer memoizes the result for all of them.
+'''
+from collections import namedtuple
+
+from .class_token import Morph
+from .word_forms import only_bases
+
+# declension: "1" (feminine lemma on -α or -η), "2" (lemma on -ος) or "3" (ι- and υ-stems: lemma on -ις or -υς)
+# observed: the ending of the token; bare: matched on only_bases (any accent) rather than as is
+# replaced: how many letters of the token the lemma-form ending replaces (the accent of the ο in στρατηγό-ν is kept)
+# lemma_ending: the ending of the lemma form, or None for the last letter of the lemma
+# pos: the POS the ending is restricted to, if any
+Ending = namedtuple("Ending", ["declension", "case", "observed", "bare", "replaced", "lemma_ending", "pos"])
+
+PARADIGMS = [
+    # 2nd declension; confirmed to yield στρα^τηγόν when having only "στρα^τηγός" in the db
+    # cases only differing wrt the last char: gen and acc sing, and nom plur
+    Ending("2", "Gen", "ου", True, 1, "ς", None),
+    Ending("2", "Acc", "ον", True, 1, "ς", None),
+    Ending("2", "Nom", "οι", True, 1, "ς", None),
+    # dat sing
+    Ending("2", "Dat", "ῳ", False, 1, "ος", None),
+    Ending("2", "Dat", "ῷ", False, 1, "ός", None),
+    # gen plur
+    Ending("2", "Gen", "ων", False, 2, "ος", None),
+    Ending("2", "Gen", "ῶν", False, 2, "ός", None),
+    # dat plur
+    Ending("2", "Dat", "οις", False, 3, "ος", None),
+    Ending("2", "Dat", "οῖς", False, 3, "ός", None),
+    # acc plur
+    Ending("2", "Acc", "ους", False, 3, "ος", None),
+    Ending("2", "Acc", "ούς", False, 3, "ός", None),
+
+    # 1st declension
+    # gen sing, e.g. οἰκίας => οἰκία, καλῆς => καλή (note that this does not accomodate -α following non-ειρ.)
+    Ending("1", "Gen", "ας", False, 2, "α", None),
+    Ending("1", "Gen", "ης", False, 2, "η", None),
+    Ending("1", "Gen", "ᾶς", False, 2, "ά", None),
+    Ending("1", "Gen", "ῆς", False, 2, "ή", None),
+    # dat and acc sing; adjectives have D1 lemmata
+    Ending("1", "Dat", "ῃ", False, 1, None, "NOUN"),
+    Ending("1", "Dat", "ῇ", False, 1, None, "NOUN"),
+    Ending("1", "Dat", "ᾳ", False, 1, None, "NOUN"),
+    Ending("1", "Dat", "ᾷ", False, 1, None, "NOUN"),
+    Ending("1", "Acc", "ην", True, 2, None, "NOUN"),
+    Ending("1", "Acc", "αν", True, 2, None, "NOUN"),
+
+    # 3rd declension
+    # acc sing of ι- and υ-stems, e.g. πόλιν => πόλις, ἰχθύν => ἰχθύς
+    Ending("3", "Acc", "ιν", True, 1, "ς", None),
+    Ending("3", "Acc", "υν", True, 1, "ς", None),
+]
+
+
+def compile_paradigms(paradigms):
+    table = {}
+    for ending in paradigms:
+        key = (ending.declension, ending.bare, ending.observed)
+        if key in table:
+            raise ValueError(f"Two paradigms for the ending {ending.observed!r} of declension {ending.declension}")
+        table[key] = ending
+    return table
+
+
+ENDING_TABLE = compile_paradigms(PARADIGMS)
+ENDING_LENGTHS = sorted({len(ending.observed) for ending in PARADIGMS}, reverse=True)
+
+
+def declension(lemma, signature):
+    if only_bases(lemma[-2:]) == 'ος':
+        return "2"
+    if only_bases(lemma[-1]) in ('α', 'η') and "Fem" in signature.gender:
+        return "1"
+    if only_bases(lemma[-2:]) in ('ις', 'υς'):
+        return "3"
+    return None
+
+
+def case_ending(token, lemma, pos, signature):
+    '''
+    The Ending of the paradigm table that the token shows, or None.
+    '''
+    declension_class = declension(lemma, signature)
+    if declension_class is None:
+        return None
+
+    bare_token = None
+    for length in ENDING_LENGTHS:
+        ending = ENDING_TABLE.get((declension_class, False, token[-length:]))
+        if ending is None:
+            bare_token = bare_token or only_bases(token)
+            ending = ENDING_TABLE.get((declension_class, True, bare_token[-length:]))
+        if ending is not None:
+            if ending.case in signature.case and (ending.pos is None or ending.pos == pos):
+                return ending
+            return None
+    return None
+
+
+def lemma_form(ending, token, lemma):
+    '''
+    The token with the lemma-form ending instead of its own, e.g. στρατηγόν => στρατηγός, χώραν => χώρα.
+    '''
+    lemma_ending = lemma[-1] if ending.lemma_ending is None else ending.lemma_ending
+    return token[:-ending.replaced] + lemma_ending
+
+
+def restore(ending, token, lemma, macronized_lemma_form):
+    '''
+    The markup of the stem of the macronized lemma form on the token, e.g. στρα^τηγός => στρα^τηγόν.
+    '''
+    if not macronized_lemma_form:
+        return ''
+    if macronized_lemma_form[-1] in ('^', '_'): # e.g. κα^λά_ ; note that ending changes so is not to be macronized
+        macronized_lemma_form = macronized_lemma_form[:-1]
+    lemma_ending = lemma[-1] if ending.lemma_ending is None else ending.lemma_ending
+    return macronized_lemma_form[:-len(lemma_ending)] + token[-ending.replaced:]
+
+
+NOMINATIVE_MORPHS = {}
+
+
+def nominative_morph(morph):
+    '''
+    The morphology of the lemma form of a token: nominative singular, of the gender of the token.
+    '''
+    gender = morph.get("Gender")
+    if gender not in NOMINATIVE_MORPHS:
+        NOMINATIVE_MORPHS[gender] = Morph("|".join(["Case=Nom"] + ([f"Gender={gender}"] if gender else []) + ["Number=Sing"]))
+    return NOMINATIVE_MORPHS[gender]
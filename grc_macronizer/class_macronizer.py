@@ -1,4 +1,4 @@
-from collections import Counter
+from collections import Counter, OrderedDict
 from datetime import datetime
 from importlib.resources import files
 import logging
@@ -6,24 +6,28 @@ import os
 from pathlib import Path
 import pickle
 import re
+import time
 
 from tqdm import tqdm
 
-from grc_utils import ACCENTS, only_bases, CONSONANTS_LOWER_TO_UPPER, count_ambiguous_dichrona_in_open_syllables, count_dichrona_in_open_syllables, GRAVES, long_acute, lower_grc, no_macrons, normalize_word, paroxytone, patterns, proparoxytone, properispomenon, short_vowel, syllabifier, upper_grc, vowel, VOWELS_LOWER_TO_UPPER, word_with_real_dichrona
+import grc_utils
+from grc_utils import only_bases, count_ambiguous_dichrona_in_open_syllables, patterns
 
+from .accent_rules import apply_accentuation_rules
 from .ascii import ascii_macronizer
-from .barytone import replace_grave_with_acute, replace_acute_with_grave
+from .case_endings import case_ending, lemma_form, nominative_morph, restore
 from .class_text import Text
+from .class_token import morph_signature
 from .db.custom import custom_macronizer
-from .db.lsj import lsj
-from .db.proper_names import proper_names
-from .db.wiktionary_ambiguous import wiktionary_ambiguous_map
-from .db.wiktionary_singletons import wiktionary_singletons_map
-from .format_macrons import macron_unicode_to_markup, merge_or_overwrite_markup
-from .morph_disambiguator import morph_disambiguator
+from .format_macrons import merge_or_overwrite_markup, transfer_markup
+from .indexes import load as load_index, load_derived
+from .morph_disambiguator import disambiguate
 from .nominal_forms import macronize_nominal_forms
-from .sanity_check import demacronize_diphthong, macronized_diphthong
+from .prefixes import compile_marks, PrefixTrie
+from .sanity_check import demacronize_diphthong
+from .shared_db import shared_databases
 from .verbal_forms import macronize_verbal_forms
+from .word_forms import canonical, count_dichrona_in_open_syllables, folds, key, MEMO_SIZE, normalize_word, single_accent
 
 ####################
 # --- Preamble --- #
@@ -48,19 +52,65 @@ for line in ascii_macronizer:
     logging.info(line)
 
 ###########################
-# Load pickled databases  #
+# Load databases          #
 ###########################
 
-lsj_keys_path = files("grc_macronizer.db").joinpath("lsj_keys.pkl")
-with lsj_keys_path.open("rb") as f:
-    lsj_keys = pickle.load(f)
-
-# Convert lsj_keys to a set for faster lookups
-lsj_keys_set = {only_bases(key) for key in lsj_keys}
-
-hypotactic_path = files("grc_macronizer.db").joinpath("hypotactic.pkl")
-with hypotactic_path.open("rb") as f:
-    hypotactic = pickle.load(f)
+# With GRC_MACRONIZER_SHARED_DB set, the lookup databases are memory-mapped tables shared by all processes (see shared_db.py)
+shared = shared_databases()
+
+if shared:
+    logging.info(f"Using the shared databases in {os.environ.get('GRC_MACRONIZER_SHARED_DB')}")
+    lsj = shared["lsj"]
+    proper_names = shared["proper_names"]
+    wiktionary_ambiguous = shared["wiktionary_ambiguous"]
+    wiktionary_singletons = shared["wiktionary_singletons"]
+    lsj_keys_set = shared["lsj_keys_set"]
+    hypotactic = shared["hypotactic"]
+    elisions = {"databases": shared["elisions_databases"], "hypotactic": shared["elisions_hypotactic"]}
+else:
+    from .db.proper_names import proper_names
+
+    lsj_keys_path = files("grc_macronizer.db").joinpath("lsj_keys.pkl")
+    with lsj_keys_path.open("rb") as f:
+        lsj_keys = pickle.load(f)
+
+    # Convert lsj_keys to a set for faster lookups
+    lsj_keys_set = {only_bases(key) for key in lsj_keys}
+
+    # LSJ and hypotactic as validated, diphthong-cleaned indexes, the ambiguous Wiktionary forms keyed on their morphology,
+    # and the Wiktionary singletons as a memory-mapped table of markup (see indexes.py)
+    lsj = load_index("lsj")
+    hypotactic = load_index("hypotactic")
+    wiktionary_ambiguous = load_index("wiktionary_ambiguous")
+    wiktionary_singletons = load_index("wiktionary_singletons")
+
+    # The markup of the stems of elided words, from all their full forms (see elision.py)
+    elisions = load_derived("elisions")
+
+# Bloom filters of the words the custom module, Wiktionary and hypotactic have, to skip them for the others (see bloom.py, indexes.py)
+filters = load_derived("filters")
+
+# The preverbs, with the splits of the lemmata into preverbs and LSJ entries memoized as they are met
+prefix_trie = PrefixTrie(lsj_keys_set)
+
+# Names of the modules whose efficacy is tracked (cf. Macronizer.record_result), in the order they are written to diagnostics/modules
+
+MODULES = (
+    "custom",
+    "wiktionary",
+    "lsj",
+
+    "nominal_forms",
+    "verbal_forms",
+    "accent_rules",
+    "prefix",
+
+    "double_accent",
+    "case_ending_recursion",
+    "elision",
+
+    "hypotactic",
+)
 
 #######################
 # --- Main class ---  #
@@ -73,7 +123,9 @@ class Macronizer:
                  unicode=False,
                  debug=False,
                  no_hypotactic=False,
-                 lowercase=False):
+                 lowercase=False,
+                 cache=None,
+                 morphology=True):
 
         self.macronize_everything = macronize_everything
         self.make_prints = make_prints
@@ -81,34 +133,55 @@ class Macronizer:
         self.debug = debug
         self.no_hypotactic = no_hypotactic
         self.lowercase = lowercase
+        self.stage_seconds = {}
+        self.module_seconds = {}
+        self.cache = cache # a ResultCache (see result_cache.py) opened with a fingerprint matching no_hypotactic and morphology, or None
+        self.morphology = morphology # False for text without lemma, POS and morphology: the modules that need them are skipped (see plain_text.py)
+        self.forms = OrderedDict() # memo of macronize_form, least recently used first and bounded like the memos of word_forms.py
+        self.plain = None # the Macronizer without morphology that plain text goes to (see plain_text_macronizer)
+
+        self.reset_results()
             
     def wiktionary(self, word, lemma, pos, morph):
         """
-        Should return with macron_unicode_to_markup
+        Returns markup
         """
-        word = normalize_word(no_macrons(word.replace('^', '').replace('_', '')))
-        word_lower = lower_grc(word[0]) + word[1:]
-        
-        if word in wiktionary_singletons_map:
-            disambiguated = wiktionary_singletons_map[word][0][0] # get the db_word singleton content
-            return macron_unicode_to_markup(disambiguated)
-        elif word_lower in wiktionary_singletons_map:
-            disambiguated = wiktionary_singletons_map[word_lower][0][0]
-            word_recapitalized = upper_grc(disambiguated[0]) + disambiguated[1:]
-            return macron_unicode_to_markup(word_recapitalized)
-        elif word in wiktionary_ambiguous_map: # format: [[unnormalized tokens with macrons], [table names], [row headers 1], row headers 2], [column header 1], [column header 2]]
-            match = wiktionary_ambiguous_map[word]
-            #print(match)
-            disambiguated = morph_disambiguator(word, lemma, pos, morph, token=match[0], tense=match[1], case_voice=match[2], mode=match[3], person=match[4], number=match[5])
-            return macron_unicode_to_markup(disambiguated)
-        elif word_lower in wiktionary_ambiguous_map: # format: [[unnormalized tokens with macrons], [table names], [row headers 1], row headers 2], [column header 1], [column header 2]]
-            match = wiktionary_ambiguous_map[word]
-            disambiguated = morph_disambiguator(word, lemma, pos, morph, token=match[0], tense=match[1], case_voice=match[2], mode=match[3], person=match[4], number=match[5])
-            word_recapitalized = upper_grc(disambiguated[0]) + disambiguated[1:]
-            return macron_unicode_to_markup(word_recapitalized)
-        else:
-            return word
+        word = key(word)
+
+        singleton = wiktionary_singletons.get(word)
+        if singleton:
+            return singleton
+
+        # the ambiguous forms, by the morphology of the token; without morphology, only what all their readings agree on
+        morph = morph if self.morphology else None
+        return disambiguate(wiktionary_ambiguous, word, morph) or word
     
+    def look_up(self, lookup, word, bloom=None, folded_first=False):
+        """
+        The markup of lookup(word), merged with that of lookup() of the keys folded for case and for accent and case
+        (see word_forms.folds), put back on the word. Earlier probes have precedence, and a probe is only made
+        if the ones before it leave dichrona. Keys that are not in `bloom` are not looked up. Returns None if none has markup.
+
+        The folded keys stand in for the oxytonizing and decapitalizing recursions, which sent στρατηγὸν and Ἄρης
+        through all the modules again as στρατηγόν and ἄρης: the databases are keyed on such forms, so a probe or two more does.
+        """
+        probes = [(word, False)] + [(folded, True) for folded in folds(word)]
+        if folded_first:
+            probes.reverse()
+        markup = None
+        for probe, is_folded in probes:
+            if bloom is not None and probe not in bloom:
+                continue
+            found = lookup(probe)
+            if not found or found == probe:
+                continue
+            if is_folded:
+                found = transfer_markup(found, word)
+            markup = merge_or_overwrite_markup(found, markup, precedence='old')
+            if count_dichrona_in_open_syllables(markup) == 0:
+                break
+        return markup
+
     def hypotactic(self, word):
         '''
         >>> hypotactic('ἀγαθῆς')
@@ -120,16 +193,11 @@ class Macronizer:
         word = word.replace('^', '').replace('_', '')
         word = normalize_word(word)
 
-        macronized = hypotactic.get(word)
-        
-        if macronized:
-            macronized = demacronize_diphthong(macronized)
-
-        return macronized
+        return hypotactic.get(word) # with its diphthongs already demacronized (see indexes.py)
 
     def macronize(self, text, genre='prose'):
         """
-        Macronization is a modular and recursive process comprised of the following 13 steps, 
+        Macronization is a modular and recursive process comprised of the following 11 steps, 
         with the high-trust db modules first, then the algorithmic modules, the recursive ones and finally the hypotactic db module:
             
             [custom]
@@ -142,600 +210,436 @@ class Macronizer:
             [prefixes]
 
             [double-accent recursion]
-            [reversed-elision recursion]
+            [elision]
             [wrong-case recursion]
-            [oxytonizing recursion]
-            [decapitalization recursion]
 
             [hypotactic]
             [accent rules] (re-applied in overwrite mode as a sanity check)
 
         Accent rules relies on the output of the other modules for optimal performance.
+        The databases are probed with the token folded for case and for accent and case too (Σπονδὰς as σπονδὰς, στρατηγὸν as στρατηγόν, Ἄρης as ἄρης; see look_up),
+        which used to be the oxytonizing and decapitalizing recursions.
         Hypotactic has special safety measures in place; refer to it's docstring below. 
         My design goal is that it should be easy for the "power user" to change the order of the other modules, and to graft in new ones.
         """
 
+        self.stage_seconds = {} # wall time per stage of the last call, read by benchmark.py
+        self.module_seconds = {} # the "modules" stage split over the modules that contributed to each word (None: none did)
+        stage_start = time.perf_counter()
+
+        if isinstance(text, str): # plain text, tokenized without a parser (see plain_text.py)
+            from .plain_text import macronize_plain_text
+            self.reset_results()
+            macronized_text = macronize_plain_text(self.plain_text_macronizer(), text, genre, lowercase=self.lowercase)
+            stage_start = self.end_stage("modules", stage_start)
+            self.write_diagnostics(macronized_text.split(maxsplit=1)[0] if macronized_text.strip() else None)
+            self.end_stage("diagnostics", stage_start)
+            return macronized_text
+
         text_object = Text(text, genre, debug=self.debug, lowercase=self.lowercase)
         token_lemma_pos_morph = text_object.token_lemma_pos_morph # format: [[orth, token.lemma_, token.pos_, token.morph], ...]
+        stage_start = self.end_stage("text", stage_start)
 
-        # lists to keep track of the modules' efficacy
-        
-        custom_results = []
-        wiktionary_results = []
-        lsj_results = []
-
-        nominal_forms_results = []
-        verbal_forms_results = []
-        accent_rules_results = []
-        prefix_results = []
-
-        double_accent_recursion_results = []
-        reversed_elision_recursion_results = []
-        case_ending_recursion_results = []
-        oxytonization_results = []
-        decapitalization_results = []
-        
-        hypotactic_results = []
-            
-        def macronization_modules(token, lemma, pos, morph, recursion_depth=0, oxytonized_pass=False, capitalized_pass=False, decapitalized_pass=False, different_ending_pass=False, is_lemma=False, double_accent_pass=False, reversed_elision_pass=False):
-            '''
-            NOTE it is possible to change the order of modules without having to rewrite too many lines. 
-            '''
-            
-            recursion_depth += 1
-            if recursion_depth > 10:
-                raise RecursionError("Maximum recursion depth exceeded in macronization_modules")
-            
-            if oxytonized_pass:
-                logging.debug(f'🔄 Macronizing (oxytonized): {token} ({lemma}, {pos}, {morph})')
-            elif capitalized_pass:
-                logging.debug(f'🔄 Macronizing (capitalized): {token} ({lemma}, {pos}, {morph})')
-            elif decapitalized_pass:
-                logging.debug(f'🔄 Macronizing (decapitalized): {token} ({lemma}, {pos}, {morph})')
-            elif different_ending_pass:
-                logging.debug(f'🔄 Macronizing (different-ending): {token} ({lemma}, {pos}, {morph})')
-            elif is_lemma:
-                logging.debug(f'🔄 Macronizing (lemma): {token} ({lemma}, {pos}, {morph})')
-            elif reversed_elision_pass:
-                logging.debug(f'🔄 Macronizing (reversed elision): {token} ({lemma}, {pos}, {morph})')
-            else:
-                logging.debug(f'🔄 Macronizing: {token} ({lemma}, {pos}, {morph})')
+        self.reset_results()
+
+        macronized_tokens = []
+        for token, lemma, pos, morph in tqdm(token_lemma_pos_morph, desc="Macronizing tokens ☕️", leave=self.make_prints):
+            word_start = time.perf_counter()
+            result, modules = self.macronize_word(token, lemma, pos, morph)
+            word_seconds = (time.perf_counter() - word_start) / (len(modules) or 1)
+            for module in modules or (None,):
+                self.module_seconds[module] = self.module_seconds.get(module, 0.0) + word_seconds
+            macronized_tokens.append(result)
+        stage_start = self.end_stage("modules", stage_start)
 
-            macronized_token = token
+        logging.info(f'\n\n### END OF MACRONIZATION ###\n\n')
 
-            ### CUSTOM OVERRIDING ###
+        text_object.macronized_words = macronized_tokens
+        text_object.integrate() # creates the final .macronized_text
+        stage_start = self.end_stage("integrate", stage_start)
 
-            # Minimal pairs requiring special disambiguation
+        if self.make_prints:
+            the_ratio = self.macronization_ratio(text_object.text, text_object.macronized_text, count_all_dichrona=True, count_proper_names=True)
+            stage_start = self.end_stage("ratio", stage_start)
 
-            if token == 'ἄλλα':
-                if 'Fem' in (morph.get("Gender") or ""):
-                    logging.debug(f'\t✅ Macronized feminine {token}')
-                    return 'ἄλλα_'
-                else:
-                    logging.debug(f'\t✅ Macronized neutre {token}')
-                    return 'ἄλλα^' # neutre plural
-            
-            custom_token = custom_macronizer(macronized_token)
-            if self.debug and custom_token != macronized_token:
-                logging.debug(f'\t✅ Custom: {macronized_token} => {merge_or_overwrite_markup(custom_token, macronized_token)}, with {count_dichrona_in_open_syllables(merge_or_overwrite_markup(custom_token, macronized_token))} left')
-            elif self.debug:
-                logging.debug(f'\t❌ Custom did not help')
-            macronized_token = merge_or_overwrite_markup(custom_token, macronized_token)
+        self.write_diagnostics(macronized_tokens[0] if macronized_tokens else None)
+        self.end_stage("diagnostics", stage_start)
 
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                custom_results.append(macronized_token)
-                return macronized_token
+        return text_object.macronized_text
 
-            ### DB MODULES ####
+    def plain_text_macronizer(self):
+        """
+        The Macronizer for plain text (see plain_text.py): this one if made with morphology=False, else one like it without
+        morphology (the databases are shared), keeping its efficacy lists in this one's. It gets no result cache,
+        as this one's is stamped for results with morphology.
+        """
+        if not self.morphology:
+            return self
+        if self.plain is None:
+            self.plain = Macronizer(macronize_everything=self.macronize_everything, make_prints=False, unicode=self.unicode, debug=self.debug,
+                                    no_hypotactic=self.no_hypotactic, lowercase=self.lowercase, morphology=False)
+        self.plain.module_results, self.plain.still_ambiguous = self.module_results, self.still_ambiguous
+        return self.plain
+
+    def end_stage(self, stage, stage_start):
+        now = time.perf_counter()
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + now - stage_start
+        return now
+
+    def macronize_sentence(self, sentence, genre='prose'):
+        """
+        Macronizes one sentence (a list of Token objects) word by word, without building and integrating a whole text.
+        Returns [(token, macronized_word, modules), ...] for the tokens that went through the modules, 
+        where token is the original Token object and modules are the names of the modules that contributed.
 
-            # WIKTIONARY
+        The efficacy lists keep accumulating over consecutive calls; call reset_results() before and write_diagnostics() after a batch.
+        """
+        text_object = Text([sentence], genre, debug=self.debug, lowercase=self.lowercase)
 
-            old_macronized_token = macronized_token
-            wiktionary_token = self.wiktionary(macronized_token, lemma, pos, morph)
-            macronized_token = merge_or_overwrite_markup(wiktionary_token, macronized_token)
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                wiktionary_results.append(macronized_token)
-                logging.debug(f'\t✅ Wiktionary: {token} => {wiktionary_token}, with {count_dichrona_in_open_syllables(wiktionary_token)} left')
-            else:
-                logging.debug(f'\t❌ Wiktionary did not help')
-            
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
+        results = []
+        for source_token, (token, lemma, pos, morph) in zip(text_object.tokens, text_object.token_lemma_pos_morph):
+            result, modules = self.macronize_word(token, lemma, pos, morph)
+            results.append((source_token, result, modules))
 
-            # LSJ
-            
-            old_macronized_token = macronized_token
-            lsj_token = lsj.get(token, token)
-            if normalize_word(lsj_token.replace('^', '').replace('_', '')) == normalize_word(token.replace('^', '').replace('_', '')): # There are some accent bugs in the lsj db. Better safe than sorry
-                macronized_token = merge_or_overwrite_markup(lsj_token, macronized_token)
-                if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    lsj_results.append(macronized_token)
-                    logging.debug(f'\t✅ LSJ helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
-                    logging.debug(f'\t❌ LSJ did not help')
+        return results
+
+    def macronize_word(self, token, lemma, pos, morph):
+        """
+        Sends one word through all the modules. Returns the macronized word and the names of the modules that contributed to it.
+        With a cache, words already macronized in an earlier run are looked up instead (and credited to their modules again).
+        """
+        cached = self.cache.get(token, lemma, pos, morph) if self.cache is not None else None
 
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
+        if cached is not None:
+            result, modules = cached
+            self.provenance = list(modules)
+            for module in modules:
+                self.module_results[module].append(result)
+        else:
+            logging.debug(f'Sending to macronization_modules: {token} ({lemma}, {pos}, {morph})')
+            self.provenance = []
+            result = self.macronization_modules(token, lemma, pos, morph)
+            if self.cache is not None:
+                self.cache.add(token, lemma, pos, morph, result, self.provenance)
 
-            ### ALGORITHMIC MODULES ###
+        if count_dichrona_in_open_syllables(result) > 0:
+            self.still_ambiguous.append((result, lemma, pos, morph))
+        return result, tuple(self.provenance)
 
-            old_macronized_token = macronized_token
-            nominal_forms_token = macronize_nominal_forms(token, lemma, pos, morph, debug=self.debug)
-            macronized_token = merge_or_overwrite_markup(nominal_forms_token, macronized_token)
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                nominal_forms_results.append(macronized_token)
-                logging.debug(f'\t✅ Nominal forms helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
-            else:
-                logging.debug(f'\t❌ Nominal forms did not help')
+    def reset_results(self):
+        """
+        Empties the lists that keep track of the modules' efficacy.
+        """
+        self.module_results = {module: [] for module in MODULES}
+        self.still_ambiguous = []
+        self.provenance = []
 
+    def record_result(self, module, macronized_token):
+        self.module_results[module].append(macronized_token)
+        if module not in self.provenance:
+            self.provenance.append(module)
 
-            old_macronized_token = macronized_token
-            verbal_forms_token = macronize_verbal_forms(token, lemma, pos, morph, debug=self.debug)
-            macronized_token = merge_or_overwrite_markup(verbal_forms_token, macronized_token)
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                verbal_forms_results.append(macronized_token)
-                logging.debug(f'\t✅ Verbal forms helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
+    def macronize_form(self, form, lemma, pos, morph, recursion_depth, **passes):
+        """
+        Sends a form reconstructed from a token (the lemma form of the wrong-case-ending recursion, the single-accent form
+        of the double-accent recursion) through the modules. Memoized, so that all the tokens that reconstruct the same form
+        share one run (and the modules it credits); the MEMO_SIZE most recently used forms are kept.
+        """
+        memo_key = (form, lemma, pos, repr(morph), tuple(sorted(passes.items())))
+        memoized = self.forms.get(memo_key)
+        if memoized is None:
+            provenance, self.provenance = self.provenance, []
+            result = self.macronization_modules(form, lemma, pos, morph, recursion_depth, **passes)
+            memoized = self.forms[memo_key] = (result, tuple(self.provenance))
+            self.provenance = provenance
+            if len(self.forms) > MEMO_SIZE:
+                self.forms.popitem(last=False)
+        else:
+            self.forms.move_to_end(memo_key)
+        result, modules = memoized
+        for module in modules:
+            self.record_result(module, result)
+        return result
+
+    def macronize_lemma_form(self, token, lemma, pos, morph, recursion_depth, **passes):
+        """
+        Sends the lemma form reconstructed by the wrong-case-ending recursion through the modules, as a nominative singular,
+        so that all the forms of a noun share one run.
+        """
+        return self.macronize_form(token, lemma, pos, nominative_morph(morph), recursion_depth, different_ending_pass=True, **passes)
+
+    def macronization_modules(self, token, lemma, pos, morph, recursion_depth=0, different_ending_pass=False, is_lemma=False, double_accent_pass=False):
+        '''
+        NOTE it is possible to change the order of modules without having to rewrite too many lines. 
+        '''
+        
+        recursion_depth += 1
+        if recursion_depth > 10:
+            raise RecursionError("Maximum recursion depth exceeded in macronization_modules")
+        
+        if different_ending_pass:
+            logging.debug(f'🔄 Macronizing (different-ending): {token} ({lemma}, {pos}, {morph})')
+        elif is_lemma:
+            logging.debug(f'🔄 Macronizing (lemma): {token} ({lemma}, {pos}, {morph})')
+        else:
+            logging.debug(f'🔄 Macronizing: {token} ({lemma}, {pos}, {morph})')
+
+        macronized_token = token
+        word = key(token) # the key of the filters of the databases
+
+        ### CUSTOM OVERRIDING ###
+
+        # Minimal pairs requiring special disambiguation
+
+        if token == 'ἄλλα':
+            if 'Fem' in (morph.get("Gender") or ""):
+                logging.debug(f'\t✅ Macronized feminine {token}')
+                macronized_token = 'ἄλλα_'
             else:
-                logging.debug(f'\t❌ Verbal forms did not help')
-            
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
+                logging.debug(f'\t✅ Macronized neutre {token}')
+                macronized_token = 'ἄλλα^' # neutre plural
+            self.record_result("custom", macronized_token)
+            return macronized_token
+        
+        custom_token = self.look_up(custom_macronizer, word, filters["custom"]) or macronized_token
+        if self.debug and custom_token != macronized_token:
+            logging.debug(f'\t✅ Custom: {macronized_token} => {merge_or_overwrite_markup(custom_token, macronized_token)}, with {count_dichrona_in_open_syllables(merge_or_overwrite_markup(custom_token, macronized_token))} left')
+        elif self.debug:
+            logging.debug(f'\t❌ Custom did not help')
+        macronized_token = merge_or_overwrite_markup(custom_token, macronized_token)
+
+        if count_dichrona_in_open_syllables(macronized_token) == 0:
+            self.record_result("custom", macronized_token)
+            return macronized_token
 
-            old_macronized_token = macronized_token
-            accent_rules_token = self.apply_accentuation_rules(macronized_token) # accent rules benefit from earlier macronization
-            macronized_token = merge_or_overwrite_markup(accent_rules_token, macronized_token)
+        ### DB MODULES ####
+
+        # WIKTIONARY
+
+        old_macronized_token = macronized_token
+        wiktionary_token = self.look_up(lambda probe: self.wiktionary(probe, lemma, pos, morph), word, filters["wiktionary"]) or macronized_token
+        macronized_token = merge_or_overwrite_markup(wiktionary_token, macronized_token)
+        if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
+            self.record_result("wiktionary", macronized_token)
+            logging.debug(f'\t✅ Wiktionary: {token} => {wiktionary_token}, with {count_dichrona_in_open_syllables(wiktionary_token)} left')
+        else:
+            logging.debug(f'\t❌ Wiktionary did not help')
+        
+        if count_dichrona_in_open_syllables(macronized_token) == 0:
+            return macronized_token
+
+        # LSJ
+        
+        old_macronized_token = macronized_token
+        lsj_token = self.look_up(lsj.get, word) # the entries with accent bugs are dropped when the index is built (see indexes.py)
+        if lsj_token:
+            macronized_token = merge_or_overwrite_markup(lsj_token, macronized_token)
             if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                accent_rules_results.append(macronized_token)
-                logging.debug(f'\t✅ Accent rules helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
+                self.record_result("lsj", macronized_token)
+                logging.debug(f'\t✅ LSJ helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
             else:
-                logging.debug(f'\t❌ Accent rules did not help')
+                logging.debug(f'\t❌ LSJ did not help')
 
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
-            
-            ### PREFIXES ###
-            '''
-            If the word's lemma minus a prefix string is still an LSJ entry, then we macronize the prefix.
-            Example: ἀφίκοντο can be macronized to ἀ^φίκοντο because ικνεομαι is in LSJ
-            '''
-            dichronic_prefixes = {
-                                'ἀνα': 'ἀ^να^', 
-                                'ἀντι': 'ἀντι^',
-                                'ἀπο': 'ἀ^πο',
-                                'ἀφ': 'ἀ^φ',
-                                'δια': 'δι^α^',
-                                'ἐπι': 'ἐπι^',
-                                'κατα': 'κα^τα^',
-                                'καθ': 'κα^θ',
-                                'μετα': 'μετα^',
-                                'παρα': 'πα^ρα^',
-                                'περι': 'περι^',
-                                'συν': 'συ^ν',
-                                'ξυν': 'ξυ^ν',
-                                'συμ': 'συ^μ',
-                                'ὑπερ': 'ὑ^περ',
-                                'ὑπο': 'ὑ^πο',
-                                'ὑφ': 'ὑ^φ',
-            }
-
-            dichronic_prefixes_unaspirated_elision = { # these need to be checked after the above since they are substrings of some of them
-                                'ἀν': 'ἀ^ν', # e.g. ἀν-ειλέω 
-                                'ἀπ': 'ἀ^π',
-                                'δι': 'δι^', # e.g. δι-έχω
-                                'κατ': 'κα^τ',
-                                'παρ': 'πα^ρ',
-                                'ὑπ': 'ὑ^π'
-            }
-
-            prefix_match = ''
-            macronized_prefix_match = ''
-            unprefixed_lemma = ''
-            old_macronized_token = macronized_token
-            for prefix, macronized_prefix in dichronic_prefixes.items():
-                if token.startswith(prefix) and lemma.startswith(prefix):
-                    prefix_match = prefix
-                    macronized_prefix_match = macronized_prefix
-
-                    unprefixed_lemma = lemma.removeprefix(prefix) # cool python 3.9 method!
-                    unprefixed_lemma = only_bases(unprefixed_lemma)
-                    logging.debug(f'\t Unprefixed lemma for {token}: {unprefixed_lemma}')
-                    break
-                
-            for prefix, macronized_prefix in dichronic_prefixes_unaspirated_elision.items():
-                if token.startswith(prefix) and lemma.startswith(prefix):
-                    prefix_match = prefix
-                    macronized_prefix_match = macronized_prefix
-
-                    unprefixed_lemma = lemma.removeprefix(prefix)
-                    unprefixed_lemma = only_bases(unprefixed_lemma)
-                    logging.debug(f'\t Unprefixed lemma for {token}: {unprefixed_lemma}')
-                    break
+        if count_dichrona_in_open_syllables(macronized_token) == 0:
+            return macronized_token
 
-            if unprefixed_lemma in lsj_keys_set:
-                prefix_token = token.removeprefix(prefix_match)
-                prefix_token = macronized_prefix_match + prefix_token
+        ### ALGORITHMIC MODULES ###
+
+        old_macronized_token = macronized_token
+        nominal_forms_token = macronize_nominal_forms(token, lemma, pos, morph, debug=self.debug) if self.morphology else token
+        macronized_token = merge_or_overwrite_markup(nominal_forms_token, macronized_token)
+        if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
+            self.record_result("nominal_forms", macronized_token)
+            logging.debug(f'\t✅ Nominal forms helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
+        else:
+            logging.debug(f'\t❌ Nominal forms did not help')
+
+
+        old_macronized_token = macronized_token
+        verbal_forms_token = macronize_verbal_forms(token, lemma, pos, morph, debug=self.debug) if self.morphology else token
+        macronized_token = merge_or_overwrite_markup(verbal_forms_token, macronized_token)
+        if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
+            self.record_result("verbal_forms", macronized_token)
+            logging.debug(f'\t✅ Verbal forms helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
+        else:
+            logging.debug(f'\t❌ Verbal forms did not help')
+        
+        if count_dichrona_in_open_syllables(macronized_token) == 0:
+            return macronized_token
+
+        old_macronized_token = macronized_token
+        accent_rules_token = self.apply_accentuation_rules(macronized_token) # accent rules benefit from earlier macronization
+        macronized_token = merge_or_overwrite_markup(accent_rules_token, macronized_token)
+        if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
+            self.record_result("accent_rules", macronized_token)
+            logging.debug(f'\t✅ Accent rules helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
+        else:
+            logging.debug(f'\t❌ Accent rules did not help')
+
+        if count_dichrona_in_open_syllables(macronized_token) == 0:
+            return macronized_token
+        
+        ### PREFIXES ###
+        '''
+        If the word's lemma minus a prefix string is still an LSJ entry, then we macronize the prefix.
+        Example: ἀφίκοντο can be macronized to ἀ^φίκοντο because ικνεομαι is in LSJ
+        Stacked prefixes (ἀντι-παρα-, συν-απο-) are split one at a time; see prefixes.py.
+        '''
+        if self.morphology:
+            prefix_token = prefix_trie.macronize(token, lemma) # the prefix is only known from the lemma
+            if prefix_token:
+                old_macronized_token = macronized_token
                 prefix_token = normalize_word(prefix_token)
                 logging.debug(f'\t Prefix token for {token}: {prefix_token}')
 
                 macronized_token = merge_or_overwrite_markup(prefix_token, macronized_token)
                 if self.debug and count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    prefix_results.append(macronized_token)
+                    self.record_result("prefix", macronized_token)
                     logging.debug(f'\t✅ Prefix macronization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
                 else:
                     logging.debug(f'\t❌ Prefix macronization did not help')
 
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
-
-            #################
-            ### RECURSION ###
-            #################
-
-            '''
-            # Example of working two-level recursion:
-                # 2025-03-30 11:39:44,565 - 🔄 Macronizing: Διὰ (διά, ADP, )
-                # 2025-03-30 11:39:44,565 - 🔄 Macronizing (oxytonized): Διά (διά, ADP, )
-                # 2025-03-30 11:39:44,566 - 	 Decapitalizing Διά as διά
-                # 2025-03-30 11:39:44,566 - 🔄 Macronizing (oxytonized): διά (διά, ADP, )
-                # 2025-03-30 11:39:44,566 - 	✅ Custom: διά => δι^ά^, with 0 left
-                # 2025-03-30 11:39:44,566 - 	✅ Decapitalization helped: 0 left
-                # 2025-03-30 11:39:44,567 - 	✅ Oxytonizing helped: : 0 left
-            '''
-
-            ### DOUBLE-ACCENT RECURSION ###
-
-            '''
-            Recursively handle paroxytone or properispomenon tokens with >1 accent, like Καλλίμαχός or οἷός or πράγματά.
-            # NOTE that if follows that such tokens cannot have final long, and so no risk of loosing iota subscript.
-            Hence we should be able to safely use only_bases().
-            # NOTE that what we need to handle is just that final accent can be on *the last or next to last syllable*. 
-            '''
-
-            if not double_accent_pass and len(normalize_word(token)) > 1:
-                accents = [char for char in token if char in ACCENTS]
-                if len(accents) > 1:
-                    one_accent_token_last = ''
-                    one_accent_token_next_to_last = ''
-                    reconstituted_token = ''
-                    old_macronized_token = macronized_token
-
-                    if token[-1] in ACCENTS:
-                        one_accent_token_last = token[:-1] + only_bases(token[-1])
-                    if token[-2] in ACCENTS:
-                        one_accent_token_next_to_last = token[:-2] + only_bases(token[-2:])
-                    
-                    if one_accent_token_last:
-                        one_accent_token_last = macronization_modules(one_accent_token_last, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=True)
-                        logging.debug(f'\t One-accent token macronized (last): {one_accent_token_last}')
-                        if one_accent_token_last[-1] == '_' or not one_accent_token_last: # no words with 2 accents have final long (they are either proparoxytone or properispomenon)
-                            pass
-                        elif one_accent_token_last[-1] == '^':
-                            reconstituted_token = one_accent_token_last[:-2] + token[-1] + one_accent_token_last[-1]
-                        else:
-                            reconstituted_token = one_accent_token_last[:-1] + token[-1]
-                    
-                    if one_accent_token_next_to_last:
-                        one_accent_token_next_to_last = macronization_modules(one_accent_token_next_to_last, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=True)
-                        logging.debug(f'\t One-accent token macronized (next to last): {one_accent_token_next_to_last}')
-                        if one_accent_token_next_to_last[-2] == '_' or not one_accent_token_next_to_last: # no words with 2 accents have final long (they are either proparoxytone or properispomenon)
-                            pass
-                        elif one_accent_token_next_to_last[-2] == '^':
-                            reconstituted_token = one_accent_token_next_to_last[:-3] + token[-2] + one_accent_token_next_to_last[-2] + token[-1]
-                        else:
-                            reconstituted_token = one_accent_token_next_to_last[:-2] + token[-2:]
-                    if reconstituted_token:    
-                        macronized_token = merge_or_overwrite_markup(reconstituted_token, macronized_token)
-                    if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                        double_accent_recursion_results.append(macronized_token)
-                        logging.debug(f'\t✅ Double accent macronization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                    else:
-                        logging.debug(f'\t❌ Double accent macronization did not help')
-                    
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
-
-            ### REVERSED-ELISION RECURSION ###
-
-            '''
-            Handle elided words like παρ'
-            Elided final vowels: {"α^", "ε", "ι^"}. 
-                - Example of elided alpha: διωλόμεσθ' (Sophocles)
-            
-            NOTE: When sent to full recursion, a reversed non-existent token like *διωλόμεσθι will get macronized by the proparoxytone rule
-            and merged, introducing an error. Hence the extra check for ^ in the newly macronized token before re-elision.
-            '''
-
-            elided_vowels = ["ε", "ι", "α"]
-            reversed_worked = False
-            old_macronized_token = macronized_token
-            if not reversed_elision_pass and token[-1] == "'":
-                reversed_elision_token = token[:-1] + elided_vowels[0] # remove the apostrophe and add a vowel
-                reversed_elision_token = macronization_modules(reversed_elision_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=double_accent_pass, reversed_elision_pass=True)
-                logging.debug(f'\t Reversed elision token: {reversed_elision_token}')
-                restored_token = reversed_elision_token[:-1] + "'"
-                macronized_token = merge_or_overwrite_markup(restored_token, macronized_token)
-                if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    reversed_worked = True
-                    reversed_elision_recursion_results.append(macronized_token)
-                    logging.debug(f'\t✅ Reversed elision with iota macronization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
-                    logging.debug(f'\t❌ Reversed elision with epsilon macronization did not help')
-
-            if not reversed_worked and not reversed_elision_pass and token[-1] == "'":
-                reversed_elision_token = token[:-1] + elided_vowels[1] # remove the apostrophe and add a vowel
-                reversed_elision_token = macronization_modules(reversed_elision_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=double_accent_pass, reversed_elision_pass=True)
-                logging.debug(f'\t Reversed elision token: {reversed_elision_token}')
-                if reversed_elision_token[-1] == '^' or reversed_elision_token[-1] == '_': # I have encountered pathological cases with long ultima
-                    restored_token = reversed_elision_token[:-2] + "'"
-                else:
-                    restored_token = reversed_elision_token[:-1] + "'"
-                macronized_token = merge_or_overwrite_markup(restored_token, macronized_token)
-                if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    reversed_elision_recursion_results.append(macronized_token)
-                    logging.debug(f'\t✅ Reversed elision with iota macronization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
-                    logging.debug(f'\t❌ Reversed elision with iota macronization did not help either')
-
-            ### WRONG-CASE-ENDING RECURSION ### 
+        if count_dichrona_in_open_syllables(macronized_token) == 0:
+            return macronized_token
 
-            '''
-            e.g. πόλιν should go through πόλις
-            '''
+        #################
+        ### RECURSION ###
+        #################
 
-            # 2nd declension
-            ''' 
-            Confirmed to yield στρα^τηγόν when having only "στρα^τηγός" in the db
-            '''
-            if not different_ending_pass and len(token) > 2 and only_bases(lemma[-2:]) == 'ος': # we enforce length for the last two chars to really be an ending (and for there to be dichrona)
-                logging.debug(f'\t Testing for 2D wrong-case-ending recursion: {macronized_token} ({lemma})')
-                old_macronized_token = macronized_token
-                restored_token = ''
-
-                # cases only differing wrt the last char: gen and acc sing, and nom plur
-                if (only_bases(macronized_token[-2:]) == 'ου' and 'Gen' in (morph.get("Case") or "")) or (only_bases(macronized_token[-2:]) == 'ον' and 'Acc' in (morph.get("Case") or "")) or (only_bases(macronized_token[-2:]) == 'οι' and 'Nom' in (morph.get("Case") or "")):
-                    nominative_token = token[:-1] + 'ς'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-1] + token[-1]
-
-                # non-oxytone dative
-                elif token[-1] == 'ῳ' and 'Dat' in (morph.get("Case") or ""):
-                    nominative_token = token[:-1] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-1]
-
-                # oxytone dative
-                elif token[-1] == 'ῷ' and 'Dat' in (morph.get("Case") or ""):
-                    nominative_token = token[:-1] + 'ός'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-1]
-
-                # non-oxytone gen plur
-                elif token[-2:] == 'ων' and 'Gen' in (morph.get("Case") or ""):
-                    nominative_token = token[:-2] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-2:]
-                
-                # oxytone gen plur
-                elif token[-2:] == 'ῶν' and 'Gen' in (morph.get("Case") or ""):
-                    nominative_token = token[:-2] + 'ός'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-2:]
-
-                # non-oxytone dat plur
-                elif token[-3:] == 'οις' and 'Dat' in (morph.get("Case") or ""):
-                    nominative_token = token[:-3] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-3:]
-
-                # oxytone dat plur
-                elif token[-3:] == 'οῖς' and 'Dat' in (morph.get("Case") or ""):
-                    nominative_token = token[:-3] + 'ός'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-3:]
-                
-                # non-oxytone acc plur
-                elif token[-3:] == 'ους' and 'Acc' in (morph.get("Case") or ""):
-                    nominative_token = token[:-3] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-3:]
-
-                # oxytone acc plur
-                elif token[-3:] == 'ούς' and 'Acc' in (morph.get("Case") or ""):
-                    nominative_token = token[:-3] + 'ος'
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    restored_token = nominative_token[:-2] + token[-3:]
+        ### DOUBLE-ACCENT RECURSION ###
 
-                macronized_token = merge_or_overwrite_markup(restored_token, macronized_token)
+        '''
+        Handle tokens with the second accent of an enclitic, like Καλλίμαχός or οἷός or πράγματά: the form without it
+        (see word_forms.single_accent) is sent through the modules once per type (see macronize_form), and its markup
+        is put back on the token letter for letter.
+        # NOTE that such tokens are proparoxytone or properispomenon, so they cannot have a long ultima:
+        a form macronized with one is left out.
+        '''
 
-                if self.debug and count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    case_ending_recursion_results.append(macronized_token)
-                    logging.debug(f'\t✅ Wrong-case-ending (D2) helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
-                    logging.debug(f'\t❌ Wrong-case-ending (D2) did not help')
-            
-            # 1st declension
-            if not different_ending_pass and len(token) > 2 and (only_bases(lemma[-1]) == 'α' or only_bases(lemma[-1]) == 'η') and "Fem" in (morph.get("Gender") or ""):
-                logging.debug(f'\t Testing for 1D wrong-case-ending recursion: {macronized_token} ({lemma})')
-                old_macronized_token = macronized_token
-                restored_token = ''
-
-                # gen sing
-                if (token[-2:] == 'ης' or token[-2:] == 'ας') and 'Gen' in (morph.get("Case") or ""): # e.g. οἰκίας
-                    nominative_token = token[:-1] # e.g. οἰκία
-                if token[-2:] == 'ῆς' and 'Gen' in (morph.get("Case") or ""): # e.g. καλῆς
-                    nominative_token = token[:-2] + 'ή' # e.g. καλή, note that this does not accomodate -α following non-ειρ.
-                if token[-2:] == 'ᾶς' and 'Gen' in (morph.get("Case") or ""): # e.g. καλᾶς
-                    nominative_token = token[:-2] + 'ά' # e.g. καλά
-                else:
-                    nominative_token = ""
-                if nominative_token:
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    if nominative_token[-1] == '^' or nominative_token[-1] == '_': # e.g. κα^λά_ ; note that ending changes so is not to be macronized
-                        restored_token = nominative_token[:-2] + token[-2:] # e.g. κα^λ + ᾶς
-                    else:
-                        restored_token = nominative_token[:-1] + token[-2:] # e.g. κα^λά => κα^λ + ᾶς
-
-                # dat sing
-                if (token[-1] == 'ῃ' or token[-1] == 'ῇ' or token[-1] == 'ᾳ' or token[-1] == 'ᾷ') and 'Dat' in (morph.get("Case") or "") and pos == 'NOUN': # adjectives have D1 lemmata
-                    nominative_token = macronized_token[:-1] + lemma[-1]
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    if nominative_token[-1] == '^' or nominative_token[-1] == '_':
-                        restored_token = nominative_token[:-2] + token[-1:] # e.g. κα^λ + ῇ
-                    else:
-                        restored_token = nominative_token[:-1] + token[-1:]
-
-                # acc sing
-                if (only_bases(token)[-2:] == 'ην' or only_bases(token)[-2:] == 'αν') and 'Acc' in (morph.get("Case") or "") and pos == 'NOUN': # adjectives have D1 lemmata
-                    nominative_token = macronized_token[:-2] + lemma[-1]
-                    nominative_token = macronization_modules(nominative_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, different_ending_pass=True, is_lemma=is_lemma)
-                    if nominative_token[-1] == '^' or nominative_token[-1] == '_':
-                        restored_token = nominative_token[:-2] + token[-1]
-                    else: 
-                        restored_token = nominative_token[:-1] + token[-1]
-                
-                if restored_token:
-                    macronized_token = merge_or_overwrite_markup(restored_token, macronized_token)
-
-                    if self.debug and count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                        case_ending_recursion_results.append(macronized_token)
-                        logging.debug(f'\t✅ Wrong-case-ending (D1) helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                    else:
-                        logging.debug(f'\t❌ Wrong-case-ending (D1) did not help')
-            
-            ### OXYTONIZING RECURSION ###
-            if (
-                not oxytonized_pass and (
-                    macronized_token[-1] in GRAVES or
-                    (len(macronized_token) > 1 and macronized_token[-2] in GRAVES)
-                )
-            ): # e.g. στρατηγὸν
-                old_macronized_token = macronized_token
-                oxytonized_token = old_macronized_token[:-2] + replace_grave_with_acute(old_macronized_token[-2:])
-                oxytonized_token = macronization_modules(oxytonized_token, lemma, pos, morph, recursion_depth, oxytonized_pass=True, capitalized_pass=capitalized_pass, decapitalized_pass=decapitalized_pass, is_lemma=is_lemma)
-                rebarytonized_token = ''
-                if len(oxytonized_token) > 2:
-                    rebarytonized_token = oxytonized_token[:-3] + replace_acute_with_grave(oxytonized_token[-3:])
-                else:
-                    rebarytonized_token = oxytonized_token[:-2] + replace_acute_with_grave(oxytonized_token[-2:])
-                macronized_token = merge_or_overwrite_markup(rebarytonized_token, macronized_token)
-                if self.debug and count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                    oxytonization_results.append(macronized_token)
-                    logging.debug(f'\t✅ Oxytonizing helped: : {count_dichrona_in_open_syllables(macronized_token)} left')
-                else:
-                    logging.debug(f'\t❌ Oxytonizing did not help')
+        single = single_accent(word) if not double_accent_pass else None
+        if single:
+            form, position = single
+            old_macronized_token = macronized_token
+            macronized_form = self.macronize_form(form, lemma, pos, morph, recursion_depth, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=True)
+            logging.debug(f'\t One-accent form macronized: {macronized_form}')
+            if not any(mark == '_' and index > position for index, mark in compile_marks(macronized_form)):
+                macronized_token = merge_or_overwrite_markup(transfer_markup(macronized_form, word), macronized_token)
+            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
+                self.record_result("double_accent", macronized_token)
+                logging.debug(f'\t✅ Double accent macronization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
+            else:
+                logging.debug(f'\t❌ Double accent macronization did not help')
 
-            if count_dichrona_in_open_syllables(macronized_token) == 0:
-                return macronized_token
+        if count_dichrona_in_open_syllables(macronized_token) == 0:
+            return macronized_token
 
-            ### DECAPITALIZING RECURSION ###
-            
-            '''Useful because many editions capitalize the first word of a sentence or section! '''
+        ### ELISION ###
 
-            if count_dichrona_in_open_syllables(macronized_token) > 0 and (token[0] in VOWELS_LOWER_TO_UPPER.values() or token[0] in CONSONANTS_LOWER_TO_UPPER.values()):
-                old_macronized_token = macronized_token
-                decapitalized_token = lower_grc(token[0]) + token[1:]
-                if not decapitalized_pass and macronized_token != decapitalized_token: # without the capitalized_pass check, we get infinite recursion for capitalized tokens
-                    if self.debug:
-                        logging.debug(f'\t Decapitalizing {macronized_token} as {decapitalized_token}')
-                    
-                    decapitalized_token = macronization_modules(decapitalized_token, lemma, pos, morph, recursion_depth, oxytonized_pass=oxytonized_pass, capitalized_pass=capitalized_pass,  decapitalized_pass=True, different_ending_pass=different_ending_pass, is_lemma=is_lemma, double_accent_pass=double_accent_pass, reversed_elision_pass=reversed_elision_pass)
-                    recapitalized_token = token[0] + decapitalized_token[1:] # restore the original first character
-
-                    macronized_token = merge_or_overwrite_markup(recapitalized_token, macronized_token)
-
-                    if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                        decapitalization_results.append(macronized_token)
-                        if self.debug:
-                            logging.debug(f'\t✅ Decapitalization helped: {count_dichrona_in_open_syllables(macronized_token)} left')
-                    elif self.debug:
-                        logging.debug(f'\t❌ Decapitalization did not help')
-
-            ###############################
-            # HYPOTACTIC (SPECIAL SAFETY) #
-            ###############################
-
-            '''
-            Hypotactic is the wildest of the databases, because it is culled directly from verse. 
-            To minimize bugs, the safety-net idea here is that
-                1) hypotactic is the last module so that fully macronized tokens will not reach it,
-                2) the merge is done with precedence='old' so that hypotactic does not overwrite any previous macronization, 
-                3) bugs like θύ^ελλα_ν should be allowed to be corrected by an extra final accent-rule call.
-            '''
+        '''
+        Handle elided words like παρ' and διωλόμεσθ' (Sophocles).
+        The elided vowel (α, ε, ι or ο) was short, but which one it was cannot be told from the token, so the markup of the stem
+        is looked up in the elision index, which has it from all the full forms of the stem in the databases at once (see elision.py).
+        The accent rules only need to know that the ultima was short, so they are applied to the stem with a short ε
+        in place of the elided vowel (τίν' as τίνε => τί^ν').
+        '''
 
+        if token[-1] == "'" and len(word) > 1:
             old_macronized_token = macronized_token
-            hypotactic_token = self.hypotactic(macronized_token)
-            macronized_token = merge_or_overwrite_markup(hypotactic_token, macronized_token, precedence='old')
+            stem = word[:-1]
+            elided_token = self.look_up(elisions["databases"].get, stem)
+            if not self.no_hypotactic: # as little trusted as in its own stage below
+                elided_token = merge_or_overwrite_markup(self.look_up(elisions["hypotactic"].get, stem), elided_token, precedence='old')
+            elided_token = elided_token or stem
+            elided_token = self.apply_accentuation_rules(elided_token + "ε").rstrip('^_')[:-1] + "'"
+            macronized_token = merge_or_overwrite_markup(elided_token, macronized_token)
             if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                hypotactic_results.append(macronized_token)
-                logging.debug(f'\t✅ Hypotactic helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
+                self.record_result("elision", macronized_token)
+                logging.debug(f'\t✅ Elision helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
             else:
-                logging.debug(f'\t❌ Hypotactic did not help')
+                logging.debug(f'\t❌ Elision did not help')
 
-            old_macronized_token = macronized_token
-            accent_rules_token = self.apply_accentuation_rules(macronized_token) # accent rules benefit from earlier macronization
-            macronized_token = merge_or_overwrite_markup(accent_rules_token, macronized_token)
+        ### WRONG-CASE-ENDING RECURSION ### 
 
-            if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
-                accent_rules_results.append(macronized_token)
-                logging.debug(f'\t✅ Accent rules helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
-            else:
-                logging.debug(f'\t❌ Accent rules did not help')
-    
-            ################
-            # SANITY CHECK #
-            ################
-
-            macronized_normalized_for_checking = normalize_word(macronized_token.replace("^", "").replace("_", ""))
-            token_normalized_for_checking = normalize_word(token.replace("^", "").replace("_", ""))
-            if macronized_normalized_for_checking != token_normalized_for_checking: 
-                logging.DEBUG(f"Watch out! We just accidentally perverted a token: {token_normalized_for_checking} has become {macronized_normalized_for_checking}")
+        '''
+        e.g. πόλιν should go through πόλις
+        The endings and the lemma forms they are reconstructed with are in the paradigm table of case_endings.py.
+        '''
+        if self.morphology and not different_ending_pass and len(token) > 2: # we enforce length for the last two chars to really be an ending (and for there to be dichrona)
+            ending = case_ending(token, lemma, pos, morph_signature(morph))
+            if ending:
+                logging.debug(f'\t Testing for {ending.declension}D wrong-case-ending recursion: {macronized_token} ({lemma})')
+                old_macronized_token = macronized_token
 
-            macronized_token = demacronize_diphthong(macronized_token)
+                nominative_token = self.macronize_lemma_form(lemma_form(ending, token, lemma), lemma, pos, morph, recursion_depth, is_lemma=is_lemma)
+                restored_token = restore(ending, token, lemma, nominative_token)
+                macronized_token = merge_or_overwrite_markup(restored_token, macronized_token)
 
+                if self.debug and count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
+                    self.record_result("case_ending_recursion", macronized_token)
+                    logging.debug(f'\t✅ Wrong-case-ending (D{ending.declension}) helped: {count_dichrona_in_open_syllables(macronized_token)} left')
+                else:
+                    logging.debug(f'\t❌ Wrong-case-ending (D{ending.declension}) did not help')
+        
+        if count_dichrona_in_open_syllables(macronized_token) == 0:
             return macronized_token
 
-        macronized_tokens = []
-        still_ambiguous = []
-        for token, lemma, pos, morph in tqdm(token_lemma_pos_morph, desc="Macronizing tokens ☕️", leave=self.make_prints):
-            logging.debug(f'Sending to macronization_modules: {token} ({lemma}, {pos}, {morph})')
-            result = macronization_modules(token, lemma, pos, morph)
-            if count_dichrona_in_open_syllables(result) > 0:
-                still_ambiguous.append((result, lemma, pos, morph))
-            macronized_tokens.append(result)
+        ###############################
+        # HYPOTACTIC (SPECIAL SAFETY) #
+        ###############################
 
-        logging.info(f'\n\n### END OF MACRONIZATION ###\n\n')
+        '''
+        Hypotactic is the wildest of the databases, because it is culled directly from verse. 
+        To minimize bugs, the safety-net idea here is that
+            1) hypotactic is the last module so that fully macronized tokens will not reach it,
+            2) the merge is done with precedence='old' so that hypotactic does not overwrite any previous macronization, 
+            3) bugs like θύ^ελλα_ν should be allowed to be corrected by an extra final accent-rule call.
+        '''
 
-        text_object.macronized_words = macronized_tokens
-        text_object.integrate() # creates the final .macronized_text
+        old_macronized_token = macronized_token
+        hypotactic_token = self.look_up(self.hypotactic, word, filters["hypotactic"], folded_first=True) # verse has the grave forms with positional length (παντὶ_)
+        macronized_token = merge_or_overwrite_markup(hypotactic_token, macronized_token, precedence='old')
+        if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
+            self.record_result("hypotactic", macronized_token)
+            logging.debug(f'\t✅ Hypotactic helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
+        else:
+            logging.debug(f'\t❌ Hypotactic did not help')
 
-        if self.make_prints:
-            the_ratio = self.macronization_ratio(text_object.text, text_object.macronized_text, count_all_dichrona=True, count_proper_names=True)
-        
-        # MODULE EFFICACY LISTS
+        old_macronized_token = macronized_token
+        accent_rules_token = self.apply_accentuation_rules(macronized_token) # accent rules benefit from earlier macronization
+        macronized_token = merge_or_overwrite_markup(accent_rules_token, macronized_token)
+
+        if count_dichrona_in_open_syllables(macronized_token) < count_dichrona_in_open_syllables(old_macronized_token):
+            self.record_result("accent_rules", macronized_token)
+            logging.debug(f'\t✅ Accent rules helped: {old_macronized_token} => {macronized_token}, with {count_dichrona_in_open_syllables(macronized_token)} left')
+        else:
+            logging.debug(f'\t❌ Accent rules did not help')
 
-        results_dict = {
-            "custom_results": custom_results,
-            "wiktionary_results": wiktionary_results,
-            "lsj_results": lsj_results,
+        ################
+        # SANITY CHECK #
+        ################
 
-            "nominal_forms_results": nominal_forms_results,
-            "verbal_forms_results": verbal_forms_results,
-            "accent_rules_results": accent_rules_results,
-            "prefix_results": prefix_results,
+        macronized_normalized_for_checking = normalize_word(macronized_token.replace("^", "").replace("_", ""))
+        token_normalized_for_checking = normalize_word(token.replace("^", "").replace("_", ""))
+        if macronized_normalized_for_checking != token_normalized_for_checking: 
+            logging.DEBUG(f"Watch out! We just accidentally perverted a token: {token_normalized_for_checking} has become {macronized_normalized_for_checking}")
 
-            "double_accent_recursion_results": double_accent_recursion_results,
-            "case_ending_recursion_results": case_ending_recursion_results,
-            "reversed_elision_recursion_results": reversed_elision_recursion_results,
-            "oxytonization_results": oxytonization_results,
-            "decapitalization_results": decapitalization_results,
+        macronized_token = demacronize_diphthong(macronized_token)
 
-            "hypotactic_results": hypotactic_results,
-        }
+        return macronized_token
+
+    def write_diagnostics(self, label=None):
+        """
+        Writes the module efficacy lists to diagnostics/modules and the still ambiguous words to diagnostics/still_ambiguous.
+        The still-ambiguous file is named after label (macronize() uses the first macronized word), and only written if there is one.
+        """
+
+        # MODULE EFFICACY LISTS
 
         module_dir = Path("diagnostics") / "modules"
         module_dir.mkdir(parents=True, exist_ok=True)  # better than os.makedirs
 
-        for name, result_list in results_dict.items():
+        for module, result_list in self.module_results.items():
+            name = f"{module}_results"
             logging.debug(f'RESULT LIST: Found {len(result_list)} results in {name}')
 
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -751,7 +655,7 @@ class Macronizer:
             sorted_lst = sorted(lst, key=lambda x: (-count[x[0]], x[0]))  # Sort by frequency (desc), then by value (asc)
             return sorted_lst, count  # Return sorted list + count dictionary
 
-        sorted_list, counts = sort_by_occurrences(still_ambiguous)  # Preserve order
+        sorted_list, counts = sort_by_occurrences(self.still_ambiguous)  # Preserve order
         # Remove duplicates while preserving order (based on first element of quadruple)
         seen = set()
         unique_sorted_list = []
@@ -768,9 +672,9 @@ class Macronizer:
         still_ambiguous_dir = Path("diagnostics") / "still_ambiguous"
         still_ambiguous_dir.mkdir(parents=True, exist_ok=True)  # Create directory if it doesn't exist
 
-        if len(macronized_tokens) > 0:
-            if macronized_tokens[0]:
-                file_stub = still_ambiguous_dir / f'still_ambiguous_{macronized_tokens[0].replace("^", "").replace("_", "")}'
+        if label is not None:
+            if label:
+                file_stub = still_ambiguous_dir / f'still_ambiguous_{label.replace("^", "").replace("_", "")}'
             else:
                 file_stub = still_ambiguous_dir / 'still_ambiguous'
 
@@ -784,8 +688,6 @@ class Macronizer:
                 for item in unique_sorted_list:
                     count = counts[item[0]]
                     f.write(f"{count}\t{item[0]}\t{item[1]}\t{item[2]}\t{item[3]}\n")
-
-        return text_object.macronized_text
     
     def macronization_ratio(self, text, macronized_text, count_all_dichrona=True, count_proper_names=True):
         def remove_proper_names(text):
@@ -798,7 +700,7 @@ class Macronizer:
 
             return cleaned_text
 
-        text = normalize_word(text)
+        text = grc_utils.normalize_word(text) # not memoized, unlike the normalize_word of words (see word_forms.py)
         if not count_proper_names:
             logging.debug("\nRemoving proper names...")
             text = remove_proper_names(text)
@@ -814,8 +716,8 @@ class Macronizer:
             print(f"Dichrona in open syllables not covered by accent rules before: \t\t\t{count_before}")
             print(f"Dichrona in open syllables not covered by accent rules after: \t{count_after}")
         else:
-            count_before = count_dichrona_in_open_syllables(text)
-            count_after = count_dichrona_in_open_syllables(macronized_text)
+            count_before = grc_utils.count_dichrona_in_open_syllables(text)
+            count_after = grc_utils.count_dichrona_in_open_syllables(macronized_text)
             print(f"Dichrona in open syllables before:            {count_before}")
             print(f"Unmacronized dichrona in open syllables left: {count_after}")
             
@@ -830,57 +732,13 @@ class Macronizer:
         return ratio
     
     def apply_accentuation_rules(self, old_version):
-        if "'" in old_version:
-            return old_version
-
-        if not old_version:
-            return old_version
-        old_version = normalize_word(old_version)
-
-        new_version = old_version.replace('_', '').replace('^', '') # this will be updated later
-
-        list_of_syllables = syllabifier(old_version) # important: needs to use old_version, for markup to potentially decide short_vowel and long_acute
-        total_syllables = len(list_of_syllables)
-
-        syllable_positions = [ # can't filter out sylls here because I want to join them later
-            (-(total_syllables - i), syllable)  # Position from the end
-            for i, syllable in enumerate(list_of_syllables)
-        ]
-
-        if not syllable_positions:
-            return old_version
-        
-        ultima = list_of_syllables[-1]
-        penultima = list_of_syllables[-2] if len(list_of_syllables) > 1 else None
-
-        modified_syllable_positions = []
-        for position, syllable in syllable_positions:
-            modified_syllable = syllable.replace('_', '').replace('^', '')  # Create a new variable to store modifications
-            if position == -2 and paroxytone(new_version) and short_vowel(ultima):
-                # Find the last vowel in syllable and append '^' after it
-                for i in range(len(syllable)-1, -1, -1): # NB: len(syllable)-1 is the index of the last character (0-indexed); -1 is to go backwards
-                    if vowel(syllable[i]) and word_with_real_dichrona(syllable):
-                        modified_syllable = syllable[:i+1] + '^' + syllable[i+1:].replace("^", "").replace("_", "")
-                        break
-            elif position == -1 and paroxytone(new_version) and long_acute(penultima):
-                # Find the last vowel in syllable and append '_' after it
-                for i in range(len(syllable)-1, -1, -1):
-                    if vowel(syllable[i]) and word_with_real_dichrona(syllable):
-                        modified_syllable = syllable[:i+1] + '_' + syllable[i+1:].replace("^", "").replace("_", "")
-                        break
-            elif position == -1 and (properispomenon(new_version) or proparoxytone(new_version)):
-                # Find the last vowel in syllable and append '^' after it
-                for i in range(len(syllable)-1, -1, -1):
-                    if vowel(syllable[i]) and word_with_real_dichrona(syllable):
-                        modified_syllable = syllable[:i+1] + '^' + syllable[i+1:].replace("^", "").replace("_", "")
-                        break
-            modified_syllable_positions.append((position, modified_syllable))
-            
-        new_version = ''.join(syllable for _, syllable in modified_syllable_positions)
-
-        merged = merge_or_overwrite_markup(new_version, old_version)
-
-        if macronized_diphthong(merged):
-            logging.debug(f"apply_accentuation_rules just macronized a diphthong, so we returned the old version: {merged}")
-            return old_version
-        return merged
+        """
+        The accent rules (compiled and memoized, see accent_rules.py), applied to the word folded for accent and case,
+        since grc_utils only reads the accent of lowercase words (ἆπι^ς, but Ἆπις).
+        """
+        word = key(old_version)
+        folded = canonical(word)
+        folded_version = transfer_markup(old_version, folded) if folded != word else None
+        if folded_version is None:
+            return apply_accentuation_rules(old_version)
+        return transfer_markup(apply_accentuation_rules(folded_version), word) or old_version
@@ -10,7 +10,6 @@ import warnings
 from grc_utils import (
     ACCENTS,
     ACUTES,
-    count_dichrona_in_open_syllables,
     GRAVES,
     is_greek_numeral,
     lower_grc,
@@ -20,6 +19,8 @@ from grc_utils import (
 
 from .stop_list import stop_list
 from .stop_list_epic import epic_stop_words
+from . import word_forms
+from .word_forms import count_dichrona_in_open_syllables
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -39,6 +40,41 @@ def word_list(text):
     return word_list
 
 
+BUGGY = ("final sigma mid-word", "invalid diacritics")
+
+
+def filter_reason(orth, genre="prose"):
+    """
+    Why a (normalized) word is not sent to the modules, or None if it is: numerals, stop words,
+    and words garbled by formatting or OCR (BUGGY) are left alone. Shared with plain_text.py.
+    """
+    # 1 Numerals
+    if is_greek_numeral(orth):
+        return "numeral"
+
+    # 2 Stop words
+    if orth in stop_list:
+        return "stop word"
+    if genre == "epic" and orth in epic_stop_words:
+        return "epic stop word"
+
+    # 3 Formatting/OCR errors
+    if "ς" in orth[:-1]:
+        return "final sigma mid-word"
+    if (
+        sum(char in GRAVES for char in orth) > 1
+        or (
+            any(char in GRAVES for char in orth)
+            and any(char in ACUTES for char in orth)
+        )
+        or sum(char in ACCENTS for char in orth) > 2
+        or sum(char in ROUGHS for char in orth) > 2
+    ):
+        return "invalid diacritics"
+
+    return None
+
+
 class Text:
     """
     Container for text and metadata during macronization.
@@ -87,6 +123,7 @@ class Text:
         fail_counter = 0
         buggy_words_in_input = 0
         token_lemma_pos_morph = []
+        tokens = [] # the Token objects behind token_lemma_pos_morph, index for index
 
         for sentence in sentences:
             for token in sentence:
@@ -119,49 +156,18 @@ class Text:
                     orth = token.text.replace("\u0387", "").replace(
                         "\u037e", ""
                     )  # remove ano teleia + Greek question mark
+                    orth = word_forms.normalize_word(orth) # once and for all: the modules take it as it is (see word_forms.py)
                     logging.debug(f"\tToken text: {orth}")
 
-                    # === FILTERS ===
-
-                    # 1 Numerals
-                    if is_greek_numeral(orth):
-                        logging.debug(
-                            f"Word '{orth}' is a Greek numeral. Skipping with 'continue'."
-                        )
-                        continue
-
-                    # 2 Stop words
-                    if orth in stop_list:
-                        logging.info(
-                            f"General stop word '{orth}' found. Skipping with 'continue'."
-                        )
-                        continue
-                    if genre == "epic" and orth in epic_stop_words:
-                        logging.info(
-                            f"Epic stop word '{orth}' found. Skipping with 'continue'."
-                        )
-                        continue
+                    # === FILTERS === (see filter_reason)
 
-                    # 3 Formatting/OCR errors
-                    if "ς" in list(orth[:-1]):
+                    reason = filter_reason(orth, genre)
+                    if reason:
                         logging.debug(
-                            f"Word '{orth}' contains a final sigma mid-word. Skipping with 'continue'."
+                            f"Word '{orth}' filtered out ({reason}). Skipping with 'continue'."
                         )
-                        buggy_words_in_input += 1
-                        continue
-                    if (
-                        sum(char in GRAVES for char in orth) > 1
-                        or (
-                            any(char in GRAVES for char in orth)
-                            and any(char in ACUTES for char in orth)
-                        )
-                        or sum(char in ACCENTS for char in orth) > 2
-                        or sum(char in ROUGHS for char in orth) > 2
-                    ):
-                        logging.debug(
-                            f"Pathological word '{orth}' has invalid diacritics. Skipping."
-                        )
-                        buggy_words_in_input += 1
+                        if reason in BUGGY:
+                            buggy_words_in_input += 1
                         continue
 
                     if (
@@ -200,6 +206,8 @@ class Text:
                             [orth, token.lemma_, token.pos_, token.morph]
                         )
 
+                    tokens.append(token)
+
                     logging.debug(
                         f"\tAppended: Token: {token.text}\tLemma: {token.lemma_}\tPOS: {token.pos_}\tMorph: {token.morph}"
                     )
@@ -216,6 +224,7 @@ class Text:
         self.text = all_text
         self.genre = genre
         self.token_lemma_pos_morph = token_lemma_pos_morph
+        self.tokens = tokens
         self.macronized_words = [] # populated by class_macronizer
         self.macronized_text = ''
         self.debug = debug
@@ -0,0 +1,355 @@
+'''
+Command-line entry point for macronizing a whole corpus:
+
+    grc-macronize INPUT_DIR OUTPUT_DIR --workers 8
+
+(or `python -m grc_macronizer ...` when the console script is not installed).
+
+INPUT_DIR is searched recursively for shards: CoNLL-U files (.conllu, .conllu.ud), merged UD TSV files (.tsv)
+and pickled lists of sentences (.pkl, as written by b_pickle_conllu.py). Every shard is macronized on its own,
+spread over N worker processes, and its output is written next to the others in OUTPUT_DIR, mirroring the input tree.
+
+With --format conllu, the output is the input CoNLL-U itself, streamed sentence by sentence, with the macronized form
+of each word in the MISC column (Macronized=...), and with --provenance also the modules that produced it (MacronizedBy=...).
+Pickled shards are written out as minimal CoNLL-U in that case.
+
+Every completed shard is appended to OUTPUT_DIR/manifest.jsonl. An interrupted run can simply be started again with
+the same arguments: shards already in the manifest are skipped, as long as they are unchanged since and were macronized
+with the same options (--genre, --format, --provenance, --lowercase, --no-hypotactic) and the same databases and rules
+(the fingerprint of result_cache.py). Outputs are written to a temporary file first and then renamed, so a crash
+never leaves a half-written output behind.
+
+With --cache FILE, results are kept in a persistent SQLite cache (see result_cache.py) that the workers read from
+and that only this process writes to, so that re-running a corpus after a small change only macronizes new types.
+
+With --shared-db DIR, the lookup databases are published once to DIR as memory-mapped tables (see shared_db.py),
+which all the workers map instead of each loading its own copy.
+'''
+
+import argparse
+from datetime import datetime
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import pickle
+import sys
+import time
+
+from tqdm import tqdm
+
+from .conllu import conllu_lines, macronize_conllu, read_sentences
+from .result_cache import fingerprint, ResultCache
+from .shared_db import enable as enable_shared_databases
+
+SHARD_SUFFIXES = (".conllu", ".conllu.ud", ".tsv", ".pkl")
+OUTPUT_SUFFIXES = {"text": ".txt", "conllu": ".conllu"}
+MANIFEST_NAME = "manifest.jsonl"
+
+
+######################
+# --- Shards ---  #
+######################
+
+class _ShardUnpickler(pickle.Unpickler):
+    '''
+    Pickles from b_pickle_conllu.py refer to the top-level `class_token` module,
+    which is not importable outside the repository root.
+    '''
+    def find_class(self, module, name):
+        if module == "class_token":
+            module = "grc_macronizer.class_token"
+        return super().find_class(module, name)
+
+
+def find_shards(input_dir):
+    input_dir = Path(input_dir)
+    shards = [path for path in input_dir.rglob("*") if path.is_file() and path.name.endswith(SHARD_SUFFIXES)]
+    return sorted(shards)
+
+
+def load_shard(path):
+    '''
+    Returns the shard as a list of sentences, each a list of Token objects.
+    '''
+    path = Path(path)
+    if path.name.endswith(".pkl"):
+        with path.open("rb") as f:
+            return _ShardUnpickler(f).load()
+    with path.open("r", encoding="utf-8") as f:
+        return list(read_sentences(f))
+
+
+def output_path_for(shard, input_dir, output_dir, suffix=".txt"):
+    relative = Path(shard).relative_to(input_dir)
+    name = relative.name
+    for shard_suffix in SHARD_SUFFIXES:
+        if name.endswith(shard_suffix):
+            name = name[:-len(shard_suffix)]
+            break
+    return Path(output_dir) / relative.parent / (name + suffix)
+
+
+def write_atomically(path, chunks):
+    '''
+    Writes the chunks (any iterable of strings, e.g. a generator of lines) to a temporary file in the same directory
+    and renames it into place, so that `path` either holds the complete output or does not exist.
+    '''
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    try:
+        with tmp_path.open("w", encoding="utf-8") as f:
+            f.writelines(chunks)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+
+
+########################
+# --- Manifest ---  #
+########################
+
+def shard_fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_manifest(manifest_path):
+    '''
+    Returns {shard: entry} for all completed shards. A truncated last line (from a crash mid-write) is ignored.
+    '''
+    completed = {}
+    if not os.path.exists(manifest_path):
+        return completed
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            completed[entry["shard"]] = entry
+    return completed
+
+
+def append_to_manifest(manifest_path, entry):
+    with open(manifest_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def run_settings(args, rules):
+    '''
+    What the output of a shard depends on besides the shard itself: the options that change results and the fingerprint
+    of the databases and rules (see result_cache.fingerprint). Stored with every manifest entry.
+    '''
+    return {
+        "genre": args.genre,
+        "format": args.format,
+        "provenance": args.provenance,
+        "lowercase": args.lowercase,
+        "no_hypotactic": args.no_hypotactic,
+        "fingerprint": rules,
+    }
+
+
+def is_completed(entry, shard, output_path, settings):
+    if entry is None or not output_path.exists():
+        return False
+    if entry.get("settings") != settings: # other options, databases or rules (or an entry from before settings were recorded)
+        return False
+    fingerprint = shard_fingerprint(shard)
+    return entry.get("size") == fingerprint["size"] and entry.get("mtime") == fingerprint["mtime"]
+
+
+#######################
+# --- Workers ---  #
+#######################
+
+_macronizer = None
+_options = None
+
+
+def _init_worker(options):
+    '''
+    Runs once per worker process: the databases are loaded here, not once per shard.
+    '''
+    global _macronizer, _options
+    from .class_macronizer import Macronizer
+
+    _options = options
+    cache = None
+    if options["cache"]:
+        cache = ResultCache(options["cache"], options["fingerprint"], readonly=True)
+    _macronizer = Macronizer(make_prints=False, lowercase=options["lowercase"], no_hypotactic=options["no_hypotactic"], cache=cache)
+
+
+def _macronize_shard(job):
+    key, shard, output_path = job
+    start = time.perf_counter()
+    try:
+        if _options["format"] == "conllu":
+            counts = _macronize_shard_to_conllu(shard, output_path)
+        else:
+            sentences = load_shard(shard)
+            output = _macronizer.macronize(sentences, genre=_options["genre"])
+            write_atomically(output_path, [output + "\n"])
+            counts = {"sentences": len(sentences), "tokens": sum(len(sentence) for sentence in sentences)}
+    except Exception as e:
+        return {"shard": key, "error": f"{type(e).__name__}: {e}"}
+
+    result = {
+        "shard": key,
+        "path": shard,
+        "output": output_path,
+        **counts,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    if _macronizer.cache is not None:
+        result["cache_rows"] = _macronizer.cache.take_pending() # only the parent process writes to the cache
+    return result
+
+
+def _macronize_shard_to_conllu(shard, output_path):
+    '''
+    Streams the shard through macronize_conllu into the output file, one sentence at a time.
+    '''
+    counts = {"sentences": 0, "tokens": 0}
+
+    def counted(lines):
+        for line in lines:
+            if line == "\n":
+                counts["sentences"] += 1
+            elif not line.startswith("#"):
+                counts["tokens"] += 1
+            yield line
+
+    _macronizer.reset_results()
+    if shard.endswith(".pkl"):
+        lines = conllu_lines(load_shard(shard))
+        write_atomically(output_path, counted(macronize_conllu(_macronizer, lines, genre=_options["genre"], provenance=_options["provenance"])))
+    else:
+        with open(shard, "r", encoding="utf-8") as f:
+            write_atomically(output_path, counted(macronize_conllu(_macronizer, f, genre=_options["genre"], provenance=_options["provenance"])))
+    _macronizer.write_diagnostics(Path(output_path).stem)
+
+    return counts
+
+
+####################
+# --- Main ---  #
+####################
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="grc-macronize",
+        description="Macronize a directory of CoNLL-U, TSV or pickle shards, resumably and in parallel.",
+    )
+    parser.add_argument("input_dir", help="directory searched recursively for .conllu, .conllu.ud, .tsv and .pkl shards")
+    parser.add_argument("output_dir", help="where outputs and the manifest are written")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes (default: all cores)")
+    parser.add_argument("--genre", default="prose", choices=["prose", "epic"])
+    parser.add_argument("--format", default="text", choices=list(OUTPUT_SUFFIXES), help="plain macronized text, or the input CoNLL-U with Macronized= in the MISC column")
+    parser.add_argument("--provenance", action="store_true", help="with --format conllu, also record the modules behind each word (MacronizedBy=)")
+    parser.add_argument("--lowercase", action="store_true")
+    parser.add_argument("--no-hypotactic", action="store_true")
+    parser.add_argument("--cache", metavar="FILE", help="SQLite file with results from earlier runs, reused as long as the databases and rules are unchanged")
+    parser.add_argument("--shared-db", metavar="DIR", help="publish the lookup databases to DIR (e.g. on /dev/shm) and have all workers map them")
+    parser.add_argument("--restart", action="store_true", help="ignore the manifest and macronize every shard again")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    input_dir = Path(args.input_dir).resolve()
+    output_dir = Path(args.output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+
+    if args.restart and manifest_path.exists():
+        manifest_path.unlink()
+    completed = load_manifest(manifest_path)
+    settings = run_settings(args, fingerprint(no_hypotactic=args.no_hypotactic))
+
+    jobs = []
+    skipped = 0
+    claimed = set()
+    for shard in find_shards(input_dir):
+        if output_dir in shard.parents:
+            continue
+        key = str(shard.relative_to(input_dir)) # the manifest is keyed on paths relative to the input directory
+        output_path = output_path_for(shard, input_dir, output_dir, suffix=OUTPUT_SUFFIXES[args.format])
+        if output_path in claimed: # e.g. x.tsv and x.pkl side by side
+            output_path = output_path.with_name(shard.name + OUTPUT_SUFFIXES[args.format])
+        claimed.add(output_path)
+        if is_completed(completed.get(key), shard, output_path, settings):
+            skipped += 1
+            continue
+        jobs.append((key, str(shard), str(output_path)))
+
+    print(f"{len(jobs)} shards to macronize, {skipped} already done according to {manifest_path}")
+    if not jobs:
+        return 0
+
+    options = {"genre": args.genre, "format": args.format, "provenance": args.provenance, "lowercase": args.lowercase, "no_hypotactic": args.no_hypotactic, "cache": None}
+
+    cache = None
+    if args.cache:
+        options["cache"] = str(Path(args.cache).resolve())
+        options["fingerprint"] = settings["fingerprint"]
+        cache = ResultCache(options["cache"], options["fingerprint"]) # drops results from other databases or rules
+        print(f"{len(cache)} cached results in {options['cache']}")
+    if args.shared_db:
+        if enable_shared_databases(args.shared_db):
+            print(f"Published the shared databases to {args.shared_db}")
+    workers = max(1, min(args.workers, len(jobs)))
+    failures = 0
+
+    def record(result):
+        nonlocal failures
+        if "error" in result:
+            failures += 1
+            tqdm.write(f"Failed on {result['shard']}: {result['error']}")
+            return
+        if cache is not None:
+            cache.put_many(result["cache_rows"])
+        entry = {
+            "shard": result["shard"],
+            "output": str(Path(result["output"]).relative_to(output_dir)),
+            **shard_fingerprint(result["path"]),
+            **{key: result[key] for key in ("sentences", "tokens", "seconds")},
+            "settings": settings,
+            "completed": datetime.now().isoformat(timespec="seconds"),
+        }
+        append_to_manifest(manifest_path, entry)
+
+    progress = tqdm(total=len(jobs), desc="Macronizing shards")
+    if workers == 1:
+        _init_worker(options)
+        for job in jobs:
+            record(_macronize_shard(job))
+            progress.update()
+    else:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(options,)) as pool:
+            for result in pool.imap_unordered(_macronize_shard, jobs):
+                record(result)
+                progress.update()
+    progress.close()
+
+    if cache is not None:
+        print(f"{len(cache)} cached results in {options['cache']}")
+        cache.close()
+
+    if failures:
+        print(f"{failures} shards failed; run the same command again to retry them.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
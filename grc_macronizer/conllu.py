@@ -0,0 +1,356 @@
+'''
+Streaming readers for the OGA CoNLL-U files.
+
+The corpus ships as a compressed archive (oga_conllu_ud.7z). Instead of extracting it to disk and merging
+everything into one giant TSV, the functions here stream the CoNLL-U members straight out of the archive
+and into the sentence reader, one member at a time:
+
+    from grc_macronizer.conllu import sentences_from_archive
+
+    for sentence in sentences_from_archive("oga_conllu_ud.7z"):
+        ...  # sentence is a list of Token objects
+
+Supported inputs: .7z, .zip, .tar (optionally .gz/.bz2/.xz/.zst compressed) and single .zst files.
+Only local tools are used:
+    - .7z needs a 7-Zip binary on the PATH (7z, 7zz or 7za), which streams the members out of one pass
+    - .zst needs the zstandard package, or else the zstd binary
+Everything else is in the standard library.
+'''
+
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import zipfile
+
+from grc_utils import vowel
+
+from .class_token import Token
+
+CONLLU_SUFFIXES = (".conllu", ".conllu.ud", ".tsv")
+ARCHIVE_SUFFIXES = (".7z", ".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz", ".tar.zst", ".tzst", ".zst")
+
+SEVEN_ZIP_BINARIES = ("7z", "7zz", "7za")
+
+
+#######################
+# --- Sentences ---  #
+#######################
+
+def conllu_blocks(lines):
+    '''
+    Groups CoNLL-U lines into sentences, yielding each sentence as a list of raw lines (without newlines).
+    Comment lines are kept with the sentence they precede.
+
+    A new sentence starts at a blank line, or when the token ID resets to 1.
+    The latter is needed for the merged TSV files, which have had their blank lines stripped.
+    '''
+    block = []
+    has_tokens = False
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        if not line.strip():
+            if block:
+                yield block
+            block = []
+            has_tokens = False
+            continue
+
+        if line.startswith("#"):
+            if has_tokens: # a comment after tokens means that a new sentence has begun
+                yield block
+                block = []
+                has_tokens = False
+            block.append(line)
+            continue
+
+        token_id = line.split("\t", 1)[0]
+        if token_id == "1" and has_tokens:
+            yield block
+            block = []
+
+        block.append(line)
+        has_tokens = True
+
+    if block:
+        yield block
+
+
+def tokens_from_block(block, skip_vowelless=True):
+    '''
+    Turns one sentence block into a list of Token objects, the way b_pickle_conllu.py always has:
+    comments, multi-word tokens and empty nodes are skipped, and so are words without vowels (unless skip_vowelless=False).
+    '''
+    return [token for _, token in token_rows(block, skip_vowelless=skip_vowelless)]
+
+
+def token_rows(block, skip_vowelless=True):
+    '''
+    Like tokens_from_block, but yields (index of the line in the block, Token) pairs,
+    so that results can be written back to the line each token came from.
+    '''
+    for i, line in enumerate(block):
+        if line.startswith("#"):
+            continue
+
+        fields = line.split("\t")
+        if len(fields) < 10:
+            continue
+
+        token_id = fields[0]
+        if "-" in token_id or "." in token_id:
+            continue # skip multi-word tokens and empty nodes
+
+        try:
+            token_id = int(token_id)
+        except ValueError:
+            pass
+
+        text = fields[1]
+        if skip_vowelless and not any(vowel(char) for char in text):
+            continue
+
+        yield i, Token(text, fields[2], fields[3], fields[5], token_id)
+
+
+def read_sentences(lines, skip_vowelless=True):
+    '''
+    Yields sentences (lists of Token objects) from any iterable of CoNLL-U lines, e.g. an open file.
+    Sentences left empty after filtering are not yielded.
+    '''
+    for block in conllu_blocks(lines):
+        sentence = tokens_from_block(block, skip_vowelless=skip_vowelless)
+        if sentence:
+            yield sentence
+
+
+#####################
+# --- Writing ---  #
+#####################
+
+def macronize_conllu(macronizer, lines, genre="prose", provenance=False):
+    '''
+    Macronizes CoNLL-U sentence by sentence and yields it back line by line (newline-terminated, ready for writelines),
+    with the macronized form of every word that went through the modules added to its MISC column:
+
+        3	Κῦρος	Κῦρος	PROPN	_	Case=Nom|...	_	_	_	Macronized=Κῦ^ρος
+
+    With provenance=True, the modules that contributed are added as well, e.g. MacronizedBy=lsj,double_accent.
+    Words that never reach the modules (stop words, numerals, words without dichrona etc.) are left untouched,
+    and so is everything else in the input. Nothing is integrated into a running text, so memory use stays flat
+    however long the input is.
+
+    The module efficacy lists accumulate over the whole input; call macronizer.write_diagnostics() afterwards if they are wanted.
+    '''
+    for block in conllu_blocks(lines):
+        rows = list(token_rows(block))
+        line_of_token = {id(token): i for i, token in rows}
+
+        if rows:
+            for token, result, modules in macronizer.macronize_sentence([token for _, token in rows], genre=genre):
+                i = line_of_token[id(token)]
+                fields = block[i].split("\t")
+                misc = add_to_misc(fields[9], "Macronized", result)
+                if provenance and modules:
+                    misc = add_to_misc(misc, "MacronizedBy", ",".join(modules))
+                fields[9] = misc
+                block[i] = "\t".join(fields)
+
+        for line in block:
+            yield line + "\n"
+        yield "\n"
+
+
+def add_to_misc(misc, key, value):
+    if misc in ("", "_"):
+        return f"{key}={value}"
+    return f"{misc}|{key}={value}"
+
+
+def conllu_lines(sentences):
+    '''
+    Writes sentences of Token objects (e.g. from a pickle made by b_pickle_conllu.py) back out as minimal CoNLL-U lines,
+    with ID, FORM, LEMMA, UPOS and FEATS filled in.
+    '''
+    for sentence in sentences:
+        for token in sentence:
+            yield f"{token.token_id}\t{token.text}\t{token.lemma_}\t{token.pos_}\t_\t{token.morph!r}\t_\t_\t_\t_"
+        yield ""
+
+
+######################
+# --- Archives ---  #
+######################
+
+def is_archive(path):
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def archive_members(path, suffixes=CONLLU_SUFFIXES):
+    '''
+    Yields (member_name, lines) for every member of the archive whose name ends with one of the suffixes.
+    `lines` is a lazy iterator over the decoded text of that member; it has to be consumed (or abandoned)
+    before the next member is requested, since the archive is read as one stream.
+    '''
+    name = str(path).lower()
+
+    if name.endswith(".7z"):
+        yield from _seven_zip_members(path, suffixes)
+    elif name.endswith(".zip"):
+        yield from _zip_members(path, suffixes)
+    elif name.endswith((".tar.zst", ".tzst")):
+        with _zstd_stream(path) as stream:
+            yield from _tar_members(stream, suffixes)
+    elif name.endswith(".zst"):
+        member = os.path.basename(str(path))[:-len(".zst")]
+        if member.endswith(suffixes):
+            with _zstd_stream(path) as stream:
+                yield member, _text_lines(stream)
+    elif name.endswith(ARCHIVE_SUFFIXES):
+        with open(path, "rb") as f:
+            yield from _tar_members(f, suffixes)
+    else:
+        raise ValueError(f"Unsupported archive format: {path}")
+
+
+def sentences_from_archive(path, suffixes=CONLLU_SUFFIXES, skip_vowelless=True):
+    '''
+    Streams all sentences of all CoNLL-U members of an archive, in archive order.
+    '''
+    for _, lines in archive_members(path, suffixes):
+        yield from read_sentences(lines, skip_vowelless=skip_vowelless)
+
+
+def _text_lines(binary_stream):
+    for line in binary_stream:
+        yield line.decode("utf-8")
+
+
+def _zip_members(path, suffixes):
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.endswith(suffixes):
+                continue
+            with archive.open(info) as member:
+                yield info.filename, _text_lines(member)
+
+
+def _tar_members(fileobj, suffixes):
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive: # r|* = streaming mode, any compression
+        for info in archive:
+            if not info.isfile() or not info.name.endswith(suffixes):
+                continue
+            member = archive.extractfile(info)
+            yield info.name, _text_lines(member)
+
+
+class _zstd_stream:
+    '''
+    Context manager giving a readable binary stream of a zstd-compressed file,
+    through the zstandard package if it is installed, otherwise through the zstd binary.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.process = None
+
+    def __enter__(self):
+        try:
+            import zstandard
+        except ImportError:
+            zstandard = None
+
+        if zstandard is not None:
+            self.file = open(self.path, "rb")
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(self.file))
+
+        binary = shutil.which("zstd")
+        if binary is None:
+            raise RuntimeError("Reading .zst files needs either the zstandard package or the zstd binary.")
+        self.process = subprocess.Popen([binary, "-dc", str(self.path)], stdout=subprocess.PIPE)
+        return self.process.stdout
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            self.file.close()
+        if self.process is not None:
+            self.process.stdout.close()
+            self.process.wait()
+        return False
+
+
+class _BoundedReader(io.RawIOBase):
+    '''
+    Exposes the next `size` bytes of a pipe as a stream of its own.
+    Used to split the single output stream of `7z x -so` into its members.
+    '''
+    def __init__(self, raw, size):
+        self.raw = raw
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:min(len(buffer), self.remaining)]
+        n = self.raw.readinto(view)
+        if not n:
+            raise EOFError("7-Zip output ended before the member was complete")
+        self.remaining -= n
+        return n
+
+    def drain(self):
+        while self.remaining > 0:
+            chunk = self.raw.read(min(self.remaining, 1 << 20))
+            if not chunk:
+                raise EOFError("7-Zip output ended before the member was complete")
+            self.remaining -= len(chunk)
+
+
+def _seven_zip_members(path, suffixes):
+    binary = next((shutil.which(b) for b in SEVEN_ZIP_BINARIES if shutil.which(b)), None)
+
+    if binary is None:
+        # py7zr would have to extract the members to disk before any could be read, which is what streaming avoids
+        raise RuntimeError("Reading .7z files needs a 7-Zip binary (7z, 7zz or 7za) on the PATH.")
+
+    # The whole archive is decompressed in one pass (solid archives would otherwise be
+    # decompressed again for every member). `7z x -so` writes all files back to back in listing order,
+    # so the sizes from the listing tell us where each member ends.
+    members = _seven_zip_listing(binary, path)
+    process = subprocess.Popen([binary, "x", "-so", "-bd", str(path)], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        for name, size in members:
+            reader = _BoundedReader(process.stdout, size)
+            if name.endswith(suffixes):
+                yield name, _text_lines(io.BufferedReader(reader))
+            reader.drain()
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def _seven_zip_listing(binary, path):
+    '''
+    Returns [(name, size), ...] for all files (not directories) in the archive, in archive order.
+    '''
+    listing = subprocess.run([binary, "l", "-slt", "-ba", str(path)], capture_output=True, text=True, check=True).stdout
+
+    members = []
+    entry = {}
+    for line in listing.splitlines() + [""]:
+        if not line.strip():
+            if "Path" in entry and "D" not in entry.get("Attributes", "") and entry.get("Folder") != "+":
+                members.append((entry["Path"], int(entry.get("Size") or 0)))
+            entry = {}
+            continue
+        key, sep, value = line.partition(" = ")
+        if sep:
+            entry[key.strip()] = value
+
+    return members
@@ -0,0 +1,118 @@
+'''
+ELIDED WORDS: THE MARKUP OF THE STEM FROM ALL THE FULL FORMS AT ONCE
+
+An elided word (παρ', διωλόμεσθ', τάχ') is its full form without its final short vowel: α, ε, ι or ο. Its stem is
+macronized as in the full form, but which full form it is cannot be told from the token alone (τάχ' is τάχα,
+ὧδ' is ὧδε), so compile_index() indexes the full forms in the databases on their stem once, when the indexes are
+built (see indexes.py):
+
+    {stem: markup of the stem}, e.g. {'τάχ': 'τά^χ', 'διωλόμεσθ': 'διωλόμεσθ'}
+
+so that an elided token is one lookup of its stem, whatever its vowel was. Where full forms of the same stem
+contradict each other on a mark (one has ^ where the other has _), the mark is left out; stems left without any mark
+are not indexed, as there is nothing to look them up for.
+
+A full form on a diphthong (βούλομαι, λέγει) is not indexed under the stem without its ι, which is not that of an elided word.
+
+The markup of a less trusted source (hypotactic, whose verse forms may carry the length of their position) can be checked
+against a reference (LSJ): a stem is left out if one of its marks contradicts that of the entry it is the beginning of,
+e.g. φύ^λα_κ (from φύ^λα_κα^) against φύ^λα^ξ.
+'''
+from bisect import bisect_left
+
+from .prefixes import apply_marks, compile_marks
+from .word_forms import normalize_word, only_bases
+
+ELIDED_VOWELS = "αειο"
+DIPHTHONG_FIRSTS = "αεου" # the vowels that make a diphthong with a final ι
+
+
+def strip_markup(word):
+    return word.replace('^', '').replace('_', '')
+
+
+def elided_stem(form):
+    '''
+    The stem a (normalized) full form would be elided to, or None if it does not end in a vowel that can be elided.
+    '''
+    if len(form) < 2:
+        return None
+    last = only_bases(form[-1])
+    if last not in ELIDED_VOWELS:
+        return None
+    if last == "ι" and only_bases(form[-2]) in DIPHTHONG_FIRSTS:
+        return None
+    return form[:-1]
+
+
+def stem_marks(markup):
+    '''
+    The marks of a full form on its stem: those of its final vowel left out.
+    '''
+    return compile_marks(markup.rstrip('^_')[:-1])
+
+
+def letters(word):
+    return only_bases(word).lower()
+
+
+def compile_reference(markups):
+    '''
+    [(letters, marks)] of the entries of the reference, sorted, for contradicts().
+    '''
+    return sorted((letters(strip_markup(markup)), compile_marks(markup)) for markup in markups if markup)
+
+
+def shared_length(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+def contradicts(markup, reference):
+    '''
+    Whether a mark of the stem contradicts that of the reference entry it begins: the one that shares the most letters
+    with it, all but its last at least (φύλακ and φύλαξ). Marks on the letters they do not share are not compared.
+    '''
+    stem = letters(strip_markup(markup))
+    position = bisect_left(reference, (stem,))
+    neighbours = reference[max(position - 1, 0):position + 1]
+    if not neighbours:
+        return False
+    shared, marks = max(((shared_length(stem, entry), marks) for entry, marks in neighbours), key=lambda found: found[0])
+    if shared < max(len(stem) - 1, 1):
+        return False
+    reference_marks = dict(mark for mark in marks if mark[0] <= shared)
+    return any(reference_marks.get(index, mark) != mark for index, mark in compile_marks(markup) if index <= shared)
+
+
+def compile_index(markups, reference=None):
+    '''
+    {stem: markup of the stem} from the markups of the full forms in the databases (see the module docstring),
+    without the stems that contradict `reference` (the markups of the entries of a more trusted database), if given.
+    '''
+    marks_of_stems = {}
+    for markup in markups:
+        if not markup:
+            continue
+        markup = normalize_word(markup)
+        stem = elided_stem(strip_markup(markup))
+        if stem is None:
+            continue
+        marks = marks_of_stems.setdefault(stem, {})
+        for position, mark in stem_marks(markup):
+            marks.setdefault(position, set()).add(mark)
+
+    index = {}
+    for stem, marks in marks_of_stems.items():
+        agreed = [(position, next(iter(found))) for position, found in sorted(marks.items()) if len(found) == 1]
+        if agreed:
+            index[stem] = apply_marks(stem, agreed)
+
+    if reference is not None:
+        reference = compile_reference(reference)
+        index = {stem: markup for stem, markup in index.items() if not contradicts(markup, reference)}
+    return index
@@ -0,0 +1,329 @@
+'''
+Accuracy-versus-speed harness: runs one or more pipeline configurations over a gold-annotated set and reports,
+side by side, the macronization ratio, the precision and recall against the gold, throughput, and whether the output
+is identical to that of the first configuration. Any optimization should leave the last column at "yes".
+
+    python -m grc_macronizer.evaluation --gold gold.txt
+    python -m grc_macronizer.evaluation --gold gold.conllu --configs configs.json --output report.json
+
+Gold sets:
+    - plain text marked up with ^ and _ (or with Unicode breves and macrons), split into sentences at punctuation
+    - CoNLL-U whose MISC column holds the gold form as Gold=..., so that lemma, POS and morphology are used too
+    - `hypotactic` (the default): a seeded sample of the hypotactic database. Since that database is one of the
+      modules, hypotactic is switched off in every configuration when it serves as the gold.
+
+Only the vowels the gold marks are scored: precision is the share of the macronizer's marks on those vowels that agree
+with the gold, recall the share of the gold marks that the macronizer got right.
+
+A configuration is a dict (see PRESETS; --configs takes a JSON list of them):
+    name            label in the report
+    path            "text" (Macronizer.macronize, integrated into running text) or "sentences" (macronize_sentence)
+    workers         number of processes the sentences are spread over
+    cache           macronize twice through a fresh result cache and time the warm run
+    no_hypotactic   as for Macronizer
+'''
+
+import argparse
+import difflib
+import json
+import multiprocessing
+from pathlib import Path
+import pickle
+import random
+import sys
+import tempfile
+import time
+
+from grc_utils import count_dichrona_in_open_syllables, normalize_word
+
+from .benchmark import sentences_from_plain_text
+from .class_text import word_list
+from .class_token import Token
+from .conllu import conllu_blocks, token_rows
+from .format_macrons import macron_unicode_to_markup
+
+PRESETS = [
+    {"name": "default", "path": "text"},
+    {"name": "sentences", "path": "sentences"},
+    {"name": "cached", "path": "text", "cache": True},
+    {"name": "parallel", "path": "sentences", "workers": 4},
+]
+
+
+##################
+# --- Gold ---  #
+##################
+
+def strip_markup(word):
+    return word.replace("^", "").replace("_", "")
+
+
+def gold_from_text(text):
+    '''
+    Returns (sentences, gold): sentences of Token objects without markup, and the gold words with markup, sentence for sentence.
+    '''
+    sentences, gold = [], []
+    for marked_sentence in sentences_from_plain_text(macron_unicode_to_markup(text)):
+        gold.append([token.text for token in marked_sentence])
+        sentences.append([Token(strip_markup(token.text), strip_markup(token.text), token.pos_, "_", token.token_id) for token in marked_sentence])
+    return sentences, gold
+
+
+def gold_from_conllu(lines):
+    sentences, gold = [], []
+    for block in conllu_blocks(lines):
+        sentence, gold_words = [], []
+        for i, token in token_rows(block):
+            misc = block[i].split("\t")[9].split("|")
+            gold_word = next((entry[len("Gold="):] for entry in misc if entry.startswith("Gold=")), token.text)
+            sentence.append(token)
+            gold_words.append(macron_unicode_to_markup(gold_word))
+        if sentence:
+            sentences.append(sentence)
+            gold.append(gold_words)
+    return sentences, gold
+
+
+def gold_from_hypotactic(size=2000, seed=0, sentence_length=20):
+    '''
+    A seeded sample of the hypotactic database, as sentences of `sentence_length` words without morphology.
+    '''
+    path = Path(__file__).resolve().parent / "db" / "hypotactic.pkl"
+    with path.open("rb") as f:
+        hypotactic = pickle.load(f)
+
+    words = sorted(hypotactic)
+    words = random.Random(seed).sample(words, min(size, len(words)))
+
+    sentences, gold = [], []
+    for start in range(0, len(words), sentence_length):
+        chunk = words[start:start + sentence_length]
+        sentences.append([Token(word, word, "X", "_", i + 1) for i, word in enumerate(chunk)])
+        gold.append([hypotactic[word] for word in chunk])
+    return sentences, gold
+
+
+def load_gold(source, size=2000, seed=0):
+    if source == "hypotactic":
+        return gold_from_hypotactic(size=size, seed=seed)
+    path = Path(source)
+    with path.open("r", encoding="utf-8") as f:
+        if path.name.endswith((".conllu", ".conllu.ud", ".tsv")):
+            return gold_from_conllu(f)
+        return gold_from_text(f.read())
+
+
+########################
+# --- Predicting ---  #
+########################
+
+def predict(macronizer, sentences, path="text"):
+    '''
+    Returns the macronizer's words, sentence for sentence, parallel to the input tokens
+    (tokens never sent to the modules come back as they were).
+    '''
+    if path == "sentences":
+        predictions = []
+        for sentence in sentences:
+            results = {id(token): result for token, result, _ in macronizer.macronize_sentence(sentence)}
+            predictions.append([results.get(id(token), token.text) for token in sentence])
+        return predictions
+
+    output_words = word_list(macronizer.macronize(sentences))
+    return align(sentences, output_words)
+
+
+def align(sentences, output_words):
+    '''
+    Maps the words of the integrated output text back onto the input tokens, matching them without markup.
+    '''
+    tokens = [token for sentence in sentences for token in sentence]
+    input_keys = [normalize_word(token.text) for token in tokens]
+    output_keys = [normalize_word(strip_markup(word)) for word in output_words]
+
+    flat = [token.text for token in tokens]
+    matcher = difflib.SequenceMatcher(None, input_keys, output_keys, autojunk=False)
+    for block in matcher.get_matching_blocks():
+        flat[block.a:block.a + block.size] = output_words[block.b:block.b + block.size]
+
+    predictions, start = [], 0
+    for sentence in sentences:
+        predictions.append(flat[start:start + len(sentence)])
+        start += len(sentence)
+    return predictions
+
+
+_macronizer = None
+
+
+def _init_worker(kwargs):
+    global _macronizer
+    from .class_macronizer import Macronizer
+    _macronizer = Macronizer(make_prints=False, **kwargs)
+
+
+def _predict_chunk(job):
+    sentences, path = job
+    return predict(_macronizer, sentences, path)
+
+
+def _ready(_):
+    return True
+
+
+def run_config(config, sentences, force_no_hypotactic=False):
+    '''
+    Returns (predictions, seconds) for one configuration. Loading the databases is not timed.
+    '''
+    from .class_macronizer import Macronizer
+    from .result_cache import fingerprint, ResultCache
+
+    path = config.get("path", "text")
+    workers = config.get("workers", 1)
+    kwargs = {"no_hypotactic": config.get("no_hypotactic", False) or force_no_hypotactic}
+
+    if workers > 1:
+        size = -(-len(sentences) // workers)
+        chunks = [(sentences[i:i + size], path) for i in range(0, len(sentences), size)]
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(kwargs,)) as pool:
+            pool.map(_ready, range(workers))
+            start = time.perf_counter()
+            predictions = [sentence for chunk in pool.map(_predict_chunk, chunks) for sentence in chunk]
+            return predictions, time.perf_counter() - start
+
+    if config.get("cache"):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(Path(tmp) / "cache.sqlite", fingerprint(no_hypotactic=kwargs["no_hypotactic"]))
+            macronizer = Macronizer(make_prints=False, cache=cache, **kwargs)
+            predict(macronizer, sentences, path) # cold run, filling the cache
+            cache.put_many(cache.take_pending())
+            start = time.perf_counter()
+            predictions = predict(macronizer, sentences, path)
+            seconds = time.perf_counter() - start
+            cache.close()
+            return predictions, seconds
+
+    macronizer = Macronizer(make_prints=False, **kwargs)
+    start = time.perf_counter()
+    predictions = predict(macronizer, sentences, path)
+    return predictions, time.perf_counter() - start
+
+
+#####################
+# --- Scoring ---  #
+#####################
+
+def marks(word):
+    '''
+    {index of the letter in the word without markup: '^' or '_'}
+    '''
+    found = {}
+    index = -1
+    for char in word:
+        if char in "^_":
+            found[index] = char
+        else:
+            index += 1
+    return found
+
+
+def score(sentences, gold, predictions):
+    tokens = correct = wrong = missed = extra = skipped = 0
+    dichrona_before = dichrona_after = 0
+
+    for sentence, gold_words, predicted_words in zip(sentences, gold, predictions):
+        for token, gold_word, predicted_word in zip(sentence, gold_words, predicted_words):
+            tokens += 1
+            dichrona_before += count_dichrona_in_open_syllables(token.text)
+            dichrona_after += count_dichrona_in_open_syllables(predicted_word)
+
+            if normalize_word(strip_markup(gold_word)) != normalize_word(strip_markup(predicted_word)):
+                skipped += 1 # the gold and the input disagree on the word itself
+                continue
+
+            gold_marks, predicted_marks = marks(normalize_word(gold_word)), marks(normalize_word(predicted_word))
+            for index, mark in gold_marks.items():
+                if index not in predicted_marks:
+                    missed += 1
+                elif predicted_marks[index] == mark:
+                    correct += 1
+                else:
+                    wrong += 1
+            extra += len(predicted_marks.keys() - gold_marks.keys())
+
+    return {
+        "tokens": tokens,
+        "macronization_ratio": round((dichrona_before - dichrona_after) / dichrona_before, 4) if dichrona_before else 0,
+        "precision": round(correct / (correct + wrong), 4) if correct + wrong else None,
+        "recall": round(correct / (correct + wrong + missed), 4) if correct + wrong + missed else None,
+        "correct": correct,
+        "wrong": wrong,
+        "missed": missed,
+        "unscored_marks": extra, # marks on vowels the gold leaves unmarked
+        "skipped_tokens": skipped,
+    }
+
+
+def evaluate(configs, sentences, gold, force_no_hypotactic=False):
+    report = []
+    baseline = None
+
+    for config in configs:
+        predictions, seconds = run_config(config, sentences, force_no_hypotactic=force_no_hypotactic)
+        result = {"config": config, **score(sentences, gold, predictions)}
+        result["seconds"] = round(seconds, 3)
+        result["tokens_per_second"] = round(result["tokens"] / seconds, 1) if seconds else None
+
+        if baseline is None:
+            baseline = predictions
+        differing = sum(a != b for pred, base in zip(predictions, baseline) for a, b in zip(pred, base))
+        result["words_differing_from_first"] = differing
+
+        report.append(result)
+        print(
+            f"{config['name']:<16} ratio {result['macronization_ratio']:.2%}  precision {result['precision']}  "
+            f"recall {result['recall']}  {result['tokens_per_second']} tokens/s  "
+            f"identical: {'yes' if not differing else f'no ({differing} words)'}",
+            file=sys.stderr,
+        )
+
+    return report
+
+
+####################
+# --- Main ---  #
+####################
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="grc-macronize-evaluate", description="Compare pipeline configurations for accuracy and speed against a gold set.")
+    parser.add_argument("--gold", default="hypotactic", help="gold text, gold CoNLL-U (Gold= in MISC), or 'hypotactic' (default)")
+    parser.add_argument("--configs", help="JSON file with a list of configurations (default: the presets)")
+    parser.add_argument("--size", type=int, default=2000, help="number of words sampled from hypotactic (default: 2000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report to this JSON file")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    configs = PRESETS
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as f:
+            configs = json.load(f)
+
+    sentences, gold = load_gold(args.gold, size=args.size, seed=args.seed)
+    force_no_hypotactic = args.gold == "hypotactic"
+    if force_no_hypotactic:
+        print("Gold is a sample of hypotactic, so hypotactic is switched off in every configuration.", file=sys.stderr)
+
+    report = evaluate(configs, sentences, gold, force_no_hypotactic=force_no_hypotactic)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"gold": args.gold, "results": report}, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
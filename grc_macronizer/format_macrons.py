@@ -7,6 +7,8 @@ import unicodedata
 
 from grc_utils import macrons_map, normalize_word
 
+from . import word_forms
+
 SHORT = '̆'
 LONG = '̄'
 
@@ -157,6 +159,24 @@ def macron_integrate_markup(word, macrons):
     return normalize_word(result)
 
 
+def transfer_markup(markup, word):
+    '''
+    The markup of a word put on another word of the same length, letter for letter,
+    e.g. the markup of the accent- and case-folded form of a token on the token (see word_forms.canonical).
+    Returns None if the words are not of the same length.
+
+    >>> transfer_markup('ἄ^ρης', 'Ἄρης')
+    'Ἄ^ρης'
+    '''
+    if len(markup.replace('^', '').replace('_', '')) != len(word):
+        return None
+    transferred = []
+    letters = iter(word)
+    for char in markup:
+        transferred.append(char if char in '^_' else next(letters))
+    return ''.join(transferred)
+
+
 def merge_or_overwrite_markup(new_version, old_version, precedence='new'):
     '''
     Merges two versions of a string with markup (^ and _), following these rules:
@@ -182,7 +202,9 @@ def merge_or_overwrite_markup(new_version, old_version, precedence='new'):
     # assert normalize_word(new_version.replace('^', '').replace('_', '')) == normalize_word(old_version.replace('^', '').replace('_', '')), \
     #     f'Cannot merge markup on different words: {new_version} vs {old_version}'
 
-    if normalize_word(new_version.replace('^', '').replace('_', '')) != normalize_word(old_version.replace('^', '').replace('_', '')):
+    new_bare = new_version.replace('^', '').replace('_', '')
+    old_bare = old_version.replace('^', '').replace('_', '')
+    if new_bare != old_bare and word_forms.normalize_word(new_bare) != word_forms.normalize_word(old_bare): # mostly equal as they are, the pipeline's words being normalized
         logging.debug('Words do not match, returning old version to be on the safe side')
         return old_version
 
@@ -0,0 +1,237 @@
+'''
+Incremental re-macronization after a database update.
+
+Adding a few entries to db/custom.py or refreshing lsj.py or hypotactic.pkl should not mean macronizing the whole
+corpus again. Given the result cache of the previous run (see result_cache.py) and a copy of the database directory
+as it was for that run, this module
+
+    1) diffs the old and the new databases, collecting every key that was added, removed or changed,
+    2) finds the cached types that could be affected, i.e. whose lookups or recursion variants could hit such a key,
+    3) macronizes only those types again and updates the cache, re-stamping it for the new databases,
+    4) patches the Macronized= values of CoNLL-U outputs (cli.py --format conllu) in place.
+
+    python -m grc_macronizer.incremental --cache results.sqlite --old-db path/to/old/db --outputs path/to/output
+
+The old database directory can be had with e.g. `git worktree add ../old <commit>`. This only works when the rules
+themselves have not changed since the previous run; otherwise there is nothing to do but a full re-run.
+Plain-text outputs cannot be patched, since they are integrated into running text, but re-running the CLI over them
+with the updated cache touches the modules only for the affected types.
+'''
+
+import argparse
+import json
+from pathlib import Path
+import pickle
+import runpy
+import sys
+
+from grc_utils import lower_grc, only_bases
+
+from .class_token import Morph
+from .cli import write_atomically
+from .indexes import SOURCES
+from .result_cache import cache_key, code_fingerprint, database_fingerprint, fingerprint, ResultCache
+
+DEFAULT_DB_DIR = Path(__file__).resolve().parent / "db"
+
+# The recursions look up variants differing from the word in accents, capitalization, elision and at most this many final letters
+MAX_ENDING_CHANGE = 3
+
+
+#########################
+# --- Database diff --- #
+#########################
+
+def load_database(path):
+    '''
+    Returns {name: collection} for one of the source databases (indexes.SOURCES): the variable its module defines,
+    or the pickled collection.
+    '''
+    path = Path(path)
+    if path.name not in SOURCES:
+        raise ValueError(f"{path.name} is not one of the databases")
+    if path.suffix == ".pkl":
+        with path.open("rb") as f:
+            return {path.stem: pickle.load(f)}
+
+    variable = SOURCES[path.name]
+    return {variable: runpy.run_path(str(path))[variable]}
+
+
+def changed_keys(old, new):
+    '''
+    Keys added, removed or given a different value between two versions of a collection.
+    '''
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = set(old.keys() ^ new.keys())
+        changed.update(key for key in old.keys() & new.keys() if old[key] != new[key])
+        return changed
+    return set(old) ^ set(new)
+
+
+def diff_databases(old_db_dir, new_db_dir=DEFAULT_DB_DIR):
+    '''
+    Returns the set of all database keys that differ between the two directories.
+    '''
+    old_db_dir, new_db_dir = Path(old_db_dir), Path(new_db_dir)
+
+    keys = set()
+    for name in SOURCES:
+        old_path, new_path = old_db_dir / name, new_db_dir / name
+        if old_path.exists() and new_path.exists() and old_path.read_bytes() == new_path.read_bytes():
+            continue
+
+        old = load_database(old_path) if old_path.exists() else {}
+        new = load_database(new_path) if new_path.exists() else {}
+        for collection in old.keys() | new.keys():
+            keys |= changed_keys(old.get(collection, ()), new.get(collection, ()))
+
+    return {key for key in keys if isinstance(key, str)}
+
+
+###########################
+# --- Affected types --- #
+###########################
+
+def base(word):
+    return only_bases(lower_grc(word.replace("^", "").replace("_", ""))).rstrip("'’")
+
+
+class AffectedIndex:
+    '''
+    Answers whether a word could reach one of the changed keys, through its own form, its lemma,
+    or the variants the recursions look up (other accents, capitalization, endings, elision, stripped prefixes).
+    Everything is compared on lowercased base letters, which all these variants share.
+    '''
+    def __init__(self, keys):
+        self.bases = {base(key) for key in keys}
+        self.bases.discard("")
+        self.by_prefix = {}
+        for key_base in self.bases:
+            self.by_prefix.setdefault(key_base[:2], []).append(key_base)
+
+    def __bool__(self):
+        return bool(self.bases)
+
+    def affects(self, form, lemma):
+        form_base, lemma_base = base(form), base(lemma)
+
+        if form_base in self.bases or lemma_base in self.bases:
+            return True
+
+        # the prefix module looks up the lemma without each of its (stacked) preverbs
+        if any(lemma_base[i:] in self.bases for i in range(2, len(lemma_base))):
+            return True
+
+        # the wrong-case-ending and reversed-elision recursions look up the same stem with another ending
+        stem = form_base[:max(len(form_base) - MAX_ENDING_CHANGE, 1)]
+        for key_base in self.by_prefix.get(form_base[:2], ()):
+            if key_base.startswith(stem) and abs(len(key_base) - len(form_base)) <= MAX_ENDING_CHANGE:
+                return True
+
+        return False
+
+
+##################
+# --- Update --- #
+##################
+
+def update_cache(cache, macronizer, index):
+    '''
+    Macronizes the affected cached types again. Returns {cache key: new result} for the results that changed.
+    '''
+    affected = [row for row in cache.rows() if index.affects(row[0], row[1])]
+
+    changed = {}
+    updated_rows = []
+    for form, lemma, pos, morph, old_result, old_modules in affected:
+        result, modules = macronizer.macronize_word(form, lemma, pos, Morph(morph))
+        updated_rows.append((form, lemma, pos, morph, result, json.dumps(list(modules), ensure_ascii=False)))
+        if result != old_result:
+            changed[(form, lemma, pos, morph)] = result
+
+    cache.put_many(updated_rows)
+    return len(affected), changed
+
+
+def patch_conllu(path, changed):
+    '''
+    Rewrites the Macronized= values of the tokens whose results changed. Returns the number of tokens patched.
+    '''
+    path = Path(path)
+    patched = 0
+    lines = []
+
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) >= 10 and "Macronized=" in fields[9]:
+                form = fields[1].replace("\u0387", "").replace("\u037e", "") # as in class_text.py
+                key = cache_key(form, fields[2], fields[3], Morph(fields[5]))
+                if key in changed:
+                    fields[9] = "|".join(f"Macronized={changed[key]}" if entry.startswith("Macronized=") else entry for entry in fields[9].split("|"))
+                    line = "\t".join(fields) + "\n"
+                    patched += 1
+            lines.append(line)
+
+    if patched:
+        write_atomically(path, lines)
+    return patched
+
+
+####################
+# --- Main ---  #
+####################
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="grc-macronize-incremental",
+        description="Re-macronize only the types affected by a database update, and patch CoNLL-U outputs.",
+    )
+    parser.add_argument("--cache", required=True, help="result cache of the previous run (cli.py --cache)")
+    parser.add_argument("--old-db", required=True, help="the db directory as it was for the previous run")
+    parser.add_argument("--outputs", help="output directory of the previous run, whose .conllu files are patched")
+    parser.add_argument("--no-hypotactic", action="store_true")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    new_fingerprint = fingerprint(no_hypotactic=args.no_hypotactic)
+    cache = ResultCache(args.cache, new_fingerprint, keep_stale=True)
+
+    if cache.valid:
+        print("The cache is already up to date with the databases.")
+        return 0
+
+    old_code, _, old_databases = (cache.stored_fingerprint or "").partition(".")
+    if old_code != code_fingerprint(no_hypotactic=args.no_hypotactic):
+        print("The rules (or options) have changed since the cache was made: a full re-run is needed.", file=sys.stderr)
+        return 1
+    if old_databases != database_fingerprint(args.old_db):
+        print(f"{args.old_db} is not the database version the cache was made with.", file=sys.stderr)
+        return 1
+
+    index = AffectedIndex(diff_databases(args.old_db))
+    print(f"{len(index.bases)} database keys changed")
+
+    from .class_macronizer import Macronizer
+
+    macronizer = Macronizer(make_prints=False, no_hypotactic=args.no_hypotactic)
+    affected, changed = update_cache(cache, macronizer, index) if index else (0, {})
+    cache.restamp(new_fingerprint)
+    cache.close()
+    print(f"{affected} cached types re-macronized, {len(changed)} of which changed")
+
+    if args.outputs and changed:
+        for path in sorted(Path(args.outputs).rglob("*.conllu")):
+            patched = patch_conllu(path, changed)
+            if patched:
+                print(f"Patched {patched} tokens in {path}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
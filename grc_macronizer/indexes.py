@@ -0,0 +1,387 @@
+'''
+Clean indexes of LSJ, hypotactic and Wiktionary, validated once when they are built rather than on every hit.
+
+At runtime, every LSJ hit used to be checked against the token (there are some accent bugs in db/lsj.py), and every
+hypotactic hit was syllabified to take the markup off its diphthongs (demacronize_diphthong). Both give the same
+answer for the same entry every time, so here they are done once per entry, offline:
+
+    - LSJ: entries whose macronized form is not the word of the key are dropped; the rest are normalized
+      and their diphthongs demacronized.
+    - hypotactic: entries that could never be looked up (keys that are not normalized) or never merged
+      (macronized forms of another word) are dropped; the rest have their diphthongs demacronized.
+    - Wiktionary (ambiguous forms): compiled into markup keyed on form and morphology (see morph_disambiguator.py);
+      cells whose macronized form is not the word of the key are dropped.
+    - Wiktionary (singletons): the nested lists of Unicode-macronized forms become a flat {normalized word: markup};
+      entries whose macronized form is not the word of the key are dropped.
+
+The indexes are keyed on the forms of their sources, which are lowercase and acute but for proper names and verse
+forms. Capitalized and grave tokens (Ἄρης, στρατηγὸν) are looked up with a probe or two more, folded for case and for
+accent and case (see Macronizer.look_up), rather than under extra keys here.
+
+    python -m grc_macronizer.indexes            # rebuild the db/*_index.* files
+    python -m grc_macronizer.indexes --report   # and list the entries that were dropped
+
+The singletons index is written as a shared table (see shared_db.py) rather than a pickle, and memory-mapped at load:
+nothing is read into memory before it is looked up, and nothing is decoded but the entries that are.
+
+With the indexes, two tables are derived from them (DERIVED):
+    - db/filters.pkl: Bloom filters of the words the custom module, Wiktionary and hypotactic can answer for
+      (see bloom.py), so that the cascade skips those databases for most of the words they do not have.
+    - db/elisions.pkl: the markup of the stems of all the forms that can be elided, so that an elided token
+      is one lookup rather than a run of the cascade for every vowel it may have lost (see elision.py).
+They are built with the indexes, from what the indexes hold: a source that is still a Git LFS pointer counts as empty,
+and once it is fetched the tables are out of date until they are built again.
+
+None of the built files is kept in the repository: building them is a step of the installation, like git lfs pull.
+db/indexes.json records the hash of the source each index was built from, and the pickle protocol it was written with.
+If an index or a derived table is missing, or its source has changed since (e.g. after a refresh of lsj.py), or this
+Python cannot read its protocol, load() and load_derived() raise a RuntimeError that asks for python -m grc_macronizer.indexes rather than going on with
+a stale index or building one at every start. An index whose source is still a Git LFS pointer is left empty, with a warning.
+'''
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import pickle
+import sys
+
+from grc_utils import lower_grc, normalize_word, upper_grc
+
+from .bloom import BloomFilter
+from .elision import compile_index as compile_elision_index
+from .format_macrons import macron_unicode_to_markup
+from .morph_disambiguator import compile_index as clean_wiktionary_ambiguous, FEATURES
+from .sanity_check import demacronize_diphthong
+from .shared_db import SharedTable, write_table
+
+DB_DIR = Path(__file__).resolve().parent / "db"
+MANIFEST_NAME = "indexes.json"
+LFS_POINTER = b"version https://git-lfs.github.com/spec/"
+
+
+def strip_markup(word):
+    return word.replace('^', '').replace('_', '')
+
+
+def clean_lsj(lsj):
+    '''
+    Returns ({word: macronized word}, {word: macronized word} of the dropped entries).
+    '''
+    index, dropped = {}, {}
+    for word, macronized in lsj.items():
+        if not isinstance(macronized, str) or normalize_word(strip_markup(macronized)) != normalize_word(strip_markup(word)):
+            dropped[word] = macronized
+            continue
+        index[word] = demacronize_diphthong(normalize_word(macronized))
+    return index, dropped
+
+
+def clean_hypotactic(hypotactic):
+    '''
+    Returns ({normalized word: macronized word}, {word: macronized word} of the dropped entries).
+    '''
+    index, dropped = {}, {}
+    for word, macronized in hypotactic.items():
+        if not macronized or normalize_word(word) != word or normalize_word(strip_markup(macronized)) != word:
+            dropped[word] = macronized
+            continue
+        index[word] = demacronize_diphthong(macronized)
+    return index, dropped
+
+
+def clean_wiktionary_singletons(singletons):
+    '''
+    Returns ({normalized word: markup}, {word: macronized word} of the dropped entries).
+    '''
+    index, dropped = {}, {}
+    for word, match in singletons.items():
+        macronized = match[0][0] # the db_word singleton content
+        markup = normalize_word(macron_unicode_to_markup(macronized))
+        if strip_markup(markup) != normalize_word(word):
+            dropped[word] = macronized
+            continue
+        index[normalize_word(word)] = markup
+    return index, dropped
+
+
+def _load_lsj():
+    from .db.lsj import lsj
+    return lsj
+
+
+def _load_hypotactic():
+    with (DB_DIR / "hypotactic.pkl").open("rb") as f:
+        return pickle.load(f)
+
+
+def _load_wiktionary_ambiguous():
+    from .db.wiktionary_ambiguous import wiktionary_ambiguous_map
+    return wiktionary_ambiguous_map
+
+
+def _load_wiktionary_singletons():
+    from .db.wiktionary_singletons import wiktionary_singletons_map
+    return wiktionary_singletons_map
+
+
+# name: (source file in db/, loader, cleaner)
+INDEXES = {
+    "lsj": ("lsj.py", _load_lsj, clean_lsj),
+    "hypotactic": ("hypotactic.pkl", _load_hypotactic, clean_hypotactic),
+    "wiktionary_ambiguous": ("wiktionary_ambiguous.py", _load_wiktionary_ambiguous, clean_wiktionary_ambiguous),
+    "wiktionary_singletons": ("wiktionary_singletons.py", _load_wiktionary_singletons, clean_wiktionary_singletons),
+}
+
+# Every database in db/ that results depend on, with the variable its module defines (None for a pickle):
+# the sources of the indexes and of the derived tables, and those class_macronizer and nominal_forms read as they are.
+# Nothing else in db/ is data (crawl_lsj.py is the crawler lsj.py was made with), and nothing built from these is a source.
+SOURCES = {
+    "custom.py": "custom_macron_map",
+    "hypotactic.pkl": None,
+    "ionic.py": "ionic",
+    "lsj.py": "lsj",
+    "lsj_keys.pkl": None,
+    "proper_names.py": "proper_names",
+    "wiktionary_ambiguous.py": "wiktionary_ambiguous_map",
+    "wiktionary_singletons.py": "wiktionary_singletons_map",
+}
+
+# the indexes written as memory-mapped tables rather than pickles
+TABLES = {"wiktionary_singletons"}
+
+
+def index_path(name, db_dir=DB_DIR):
+    return Path(db_dir) / f"{name}_index.{'tbl' if name in TABLES else 'pkl'}"
+
+
+def source_hash(name, db_dir=DB_DIR):
+    return hashlib.sha256((Path(db_dir) / INDEXES[name][0]).read_bytes()).hexdigest()
+
+
+def is_lfs_pointer_file(path):
+    with Path(path).open("rb") as f:
+        return f.read(len(LFS_POINTER)) == LFS_POINTER
+
+
+def is_lfs_pointer(name, db_dir=DB_DIR):
+    '''
+    Whether the source of an index is a Git LFS pointer, i.e. has not been fetched with git lfs pull.
+    '''
+    return is_lfs_pointer_file(Path(db_dir) / INDEXES[name][0])
+
+
+def build(name):
+    '''
+    Returns (index, dropped) for one database, cleaned from its source.
+    '''
+    _, loader, cleaner = INDEXES[name]
+    return cleaner(loader())
+
+
+def read_manifest(db_dir=DB_DIR):
+    try:
+        return json.loads((Path(db_dir) / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def is_readable(manifest):
+    '''
+    Whether this Python can unpickle the files the manifest was written with.
+    '''
+    protocol = manifest.get("pickle_protocol")
+    return isinstance(protocol, int) and protocol <= pickle.HIGHEST_PROTOCOL
+
+
+def write(db_dir=DB_DIR):
+    '''
+    Rebuilds every index file in db_dir whose source is there, and the derived tables.
+    Returns {name: dropped entries (none for the derived tables), or None if skipped}.
+    '''
+    db_dir = Path(db_dir)
+    manifest = read_manifest(db_dir)
+    if manifest.get("pickle_protocol") != pickle.HIGHEST_PROTOCOL:
+        manifest = {} # whatever was written with another protocol is written again, or stays out of date
+    manifest["pickle_protocol"] = pickle.HIGHEST_PROTOCOL
+    report = {}
+    indexes = {}
+    for name in INDEXES:
+        if is_lfs_pointer(name, db_dir):
+            report[name] = None
+            indexes[name] = {}
+            continue
+        index, dropped = build(name)
+        indexes[name] = index
+        path = index_path(name, db_dir)
+        if name in TABLES:
+            write_table(path, index, "str")
+        else:
+            tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+            with tmp_path.open("wb") as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        manifest[name] = source_hash(name, db_dir)
+        report[name] = dropped
+
+    for name, (file_name, _, build_derived) in DERIVED.items():
+        path = db_dir / file_name
+        tmp_path = path.with_name(f".{file_name}.tmp-{os.getpid()}")
+        with tmp_path.open("wb") as f:
+            pickle.dump(build_derived(indexes), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        manifest[name] = derived_hash(name, db_dir)
+        report[name] = {}
+
+    (db_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return report
+
+
+def capitalized(word):
+    return upper_grc(word[0]) + word[1:]
+
+
+def custom_filter_keys(indexes):
+    '''
+    The words custom_macronizer (db/custom.py) can answer for: its keys, and their case variants.
+    '''
+    from .db.custom import custom_macron_map
+    for key in custom_macron_map:
+        yield from (key, lower_grc(key), capitalized(key))
+
+
+def wiktionary_filter_keys(indexes):
+    '''
+    The words Macronizer.wiktionary can answer for: the singletons and the ambiguous forms.
+    '''
+    yield from indexes["wiktionary_singletons"]
+    yield from (key for key in indexes["wiktionary_ambiguous"] if "|" not in key)
+
+
+def hypotactic_filter_keys(indexes):
+    yield from indexes["hypotactic"]
+
+
+# name: (the files in db/ the filter depends on, keys(indexes))
+FILTERS = {
+    "custom": (("custom.py",), custom_filter_keys),
+    "wiktionary": (("wiktionary_singletons.py", "wiktionary_ambiguous.py"), wiktionary_filter_keys),
+    "hypotactic": (("hypotactic.pkl",), hypotactic_filter_keys),
+}
+
+
+def build_filters(indexes):
+    '''
+    {name: BloomFilter}, from the indexes they are built on.
+    '''
+    return {name: BloomFilter.from_keys(keys(indexes)) for name, (_, keys) in FILTERS.items()}
+
+
+def database_markups(indexes):
+    '''
+    The markup of every form in the custom module, Wiktionary and LSJ.
+    '''
+    from .db.custom import custom_macron_map
+    yield from custom_macron_map.values()
+    for name in ("lsj", "wiktionary_singletons"):
+        index = indexes[name]
+        yield from (index[key] for key in index)
+    # what all the readings of an ambiguous form agree on (the level of morph_disambiguator.LEVELS that keeps no features)
+    ambiguous = indexes["wiktionary_ambiguous"]
+    yield from (ambiguous[key] for key in ambiguous if key.endswith("|" * len(FEATURES)))
+
+
+def build_elision_indexes(indexes):
+    '''
+    {"databases": elision index, "hypotactic": elision index}: hypotactic apart, for it to be trusted as little as it is
+    in the cascade (and not at all with no_hypotactic). Its stems come from the clean index, and those whose marks
+    contradict LSJ are left out: the length of a verse form may be that of its position (φύ^λα_κα^).
+    '''
+    hypotactic, lsj = indexes["hypotactic"], indexes["lsj"]
+    return {
+        "databases": compile_elision_index(database_markups(indexes)),
+        "hypotactic": compile_elision_index((hypotactic[key] for key in hypotactic), reference=(lsj[key] for key in lsj)),
+    }
+
+
+# the tables derived from the indexes: name: (file in db/, the files in db/ it depends on, build(indexes))
+DERIVED = {
+    "filters": ("filters.pkl", tuple(sorted({source for source_files, _ in FILTERS.values() for source in source_files})), build_filters),
+    "elisions": ("elisions.pkl", ("custom.py", "hypotactic.pkl", "lsj.py", "wiktionary_ambiguous.py", "wiktionary_singletons.py"), build_elision_indexes),
+}
+
+
+def derived_hash(name, db_dir=DB_DIR):
+    digest = hashlib.sha256()
+    for source in DERIVED[name][1]:
+        digest.update((Path(db_dir) / source).read_bytes())
+    return digest.hexdigest()
+
+
+def is_up_to_date(name, db_dir=DB_DIR):
+    manifest = read_manifest(db_dir)
+    return index_path(name, db_dir).exists() and is_readable(manifest) and manifest.get(name) == source_hash(name, db_dir)
+
+
+def load(name, db_dir=DB_DIR):
+    '''
+    The clean index of a database, from its file, which must be up to date (see is_up_to_date).
+    '''
+    if is_lfs_pointer(name, db_dir):
+        logging.warning(f"db/{INDEXES[name][0]} is a Git LFS pointer (run git lfs pull, then python -m grc_macronizer.indexes); going without it")
+        return {}
+
+    path = index_path(name, db_dir)
+    if not is_up_to_date(name, db_dir):
+        raise RuntimeError(f"{path} is missing, older than db/{INDEXES[name][0]} or pickled by a newer Python; "
+                           "build it with python -m grc_macronizer.indexes")
+    if name in TABLES:
+        return SharedTable(path)
+    with path.open("rb") as f:
+        return pickle.load(f)
+
+
+def load_derived(name, db_dir=DB_DIR):
+    '''
+    A table derived from the indexes (the Bloom filters, the elision index), from its file, which must be up to date.
+    '''
+    path = Path(db_dir) / DERIVED[name][0]
+    manifest = read_manifest(db_dir)
+    if not (path.exists() and is_readable(manifest) and manifest.get(name) == derived_hash(name, db_dir)):
+        raise RuntimeError(f"{path} is missing, older than its sources or pickled by a newer Python; "
+                           "build it with python -m grc_macronizer.indexes")
+    with path.open("rb") as f:
+        return pickle.load(f)
+
+
+####################
+# --- Main ---  #
+####################
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="grc-macronize-indexes", description="Rebuild the clean LSJ, hypotactic and Wiktionary indexes in db/.")
+    parser.add_argument("--report", action="store_true", help="list the entries that were dropped")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = write()
+    for name, dropped in report.items():
+        if name in DERIVED:
+            print(f"{DERIVED[name][0]}: written")
+            continue
+        if dropped is None:
+            print(f"{index_path(name).name}: skipped, db/{INDEXES[name][0]} is a Git LFS pointer (run git lfs pull)")
+            continue
+        print(f"{index_path(name).name}: {len(dropped)} entries of {INDEXES[name][0]} dropped")
+        if args.report:
+            for word, macronized in sorted(dropped.items(), key=lambda item: str(item[0])):
+                print(f"\t{word}\t{macronized}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
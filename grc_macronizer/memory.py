@@ -0,0 +1,158 @@
+'''
+Memory footprint of the databases every Macronizer process holds, measured with tracemalloc:
+
+    python -m grc_macronizer.memory
+    python -m grc_macronizer.memory --budget budget.json   # exits with 1 if a database is over budget
+
+Each database is loaded in turn in a fresh process, and the memory it adds is attributed to it,
+including the derived structures built from it at import time (lsj_keys_set from lsj_keys).
+Databases that are Python modules are charged for their whole module, code objects included,
+since that is what stays resident. The total is what is held once class_macronizer has been imported,
+and "rest" the part of it not listed separately (rule tables, code).
+
+A budget maps database names (and "total") to megabytes. DEFAULT_BUDGET_MB is checked unless another is given;
+benchmark.py runs the same check, so that a database growing past its budget shows up as a regression.
+'''
+
+import argparse
+import gc
+import importlib
+from importlib.resources import files
+import json
+import multiprocessing
+import pickle
+import sys
+import tracemalloc
+
+MB = 1024 * 1024
+
+# Budgets in MB, with some headroom over the current footprint
+DEFAULT_BUDGET_MB = {
+    "lsj": 10,
+    "lsj_keys": 20,
+    "lsj_keys_set": 20,
+    "hypotactic": 15,
+    "proper_names": 25,
+    "ionic": 3,
+    "custom": 1,
+    "wiktionary_singletons": 5, # memory-mapped (see indexes.py)
+    "wiktionary_ambiguous": 60,
+    "rest": 10,
+    "total": 300,
+}
+
+
+def _load_pickle(name):
+    with files("grc_macronizer.db").joinpath(f"{name}.pkl").open("rb") as f:
+        return pickle.load(f)
+
+
+def _load_index(name):
+    from .indexes import load
+    return load(name)
+
+
+def _load_module(name):
+    return importlib.import_module(f"grc_macronizer.db.{name}")
+
+
+def _lsj_keys_set(loaded):
+    from grc_utils import only_bases
+    return {only_bases(key) for key in loaded["lsj_keys"]} # as in class_macronizer.py
+
+
+# (name, loader) in the order class_macronizer.py loads them; a loader gets the databases loaded so far
+DATABASES = [
+    ("custom", lambda loaded: _load_module("custom")),
+    ("lsj", lambda loaded: _load_index("lsj")),
+    ("proper_names", lambda loaded: _load_module("proper_names")),
+    ("wiktionary_ambiguous", lambda loaded: _load_index("wiktionary_ambiguous")),
+    ("wiktionary_singletons", lambda loaded: _load_index("wiktionary_singletons")),
+    ("ionic", lambda loaded: _load_module("ionic")),
+    ("lsj_keys", lambda loaded: _load_pickle("lsj_keys")),
+    ("lsj_keys_set", _lsj_keys_set),
+    ("hypotactic", lambda loaded: _load_index("hypotactic")),
+]
+
+
+def _measure_databases(_=None):
+    '''
+    Runs in a fresh process, where none of the databases have been imported yet.
+    '''
+    import grc_utils # not to be charged to the first database
+
+    tracemalloc.start()
+    loaded = {}
+    report = {}
+    for name, loader in DATABASES:
+        before = tracemalloc.get_traced_memory()[0]
+        loaded[name] = loader(loaded)
+        report[name] = tracemalloc.get_traced_memory()[0] - before
+
+    # class_macronizer loads its own copies of the pickles, so ours are dropped first (the modules stay in sys.modules)
+    loaded.clear()
+    gc.collect()
+
+    before = tracemalloc.get_traced_memory()[0]
+    import grc_macronizer.class_macronizer
+    reloaded = sum(report[name] for name in ("lsj", "lsj_keys", "lsj_keys_set", "hypotactic", "wiktionary_ambiguous", "wiktionary_singletons"))
+    report["rest"] = tracemalloc.get_traced_memory()[0] - before - reloaded # code and tables not listed above
+
+    report["total"] = tracemalloc.get_traced_memory()[0]
+    report["peak"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return report
+
+
+def memory_report():
+    '''
+    Returns {database: bytes} plus "rest", "total" and "peak", measured in a fresh process.
+    '''
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_measure_databases)
+
+
+def check_budget(report, budget_mb=DEFAULT_BUDGET_MB):
+    '''
+    Returns a list of the databases (and totals) over budget.
+    '''
+    violations = []
+    for name, limit in budget_mb.items():
+        if name in report and report[name] > limit * MB:
+            violations.append(f"{name}: {report[name] / MB:.1f} MB > {limit} MB")
+    return violations
+
+
+def load_budget(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def format_report(report):
+    lines = []
+    for name, size in sorted(report.items(), key=lambda item: -item[1]):
+        lines.append(f"{name:<24}{size / MB:>10.1f} MB")
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="grc-macronize-memory", description="Report the memory held by each database.")
+    parser.add_argument("--budget", help="JSON file mapping database names and 'total' to megabytes (default: DEFAULT_BUDGET_MB)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON (bytes)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    report = memory_report()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+    violations = check_budget(report, load_budget(args.budget) if args.budget else DEFAULT_BUDGET_MB)
+    for violation in violations:
+        print(f"OVER BUDGET {violation}", file=sys.stderr)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
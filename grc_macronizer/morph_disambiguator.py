@@ -1,47 +1,172 @@
+'''
+DISAMBIGUATING THE AMBIGUOUS WIKTIONARY FORMS BY THEIR MORPHOLOGY
+
+db/wiktionary_ambiguous.py has the forms that Wiktionary macronizes differently in different cells of its tables:
+
+    input format:       [[unnormalized tokens with macrons],    [table names], [row headers 1],  row headers 2],  [column header 1],        [column header 2]]
+    E.g.:   'ἀσφαλής':  [['ᾰ̓σφᾰλής'],                           ['Table 1'],   ['Nominative'],   [''],            ['Masculine / Feminine'], ['Singular']],
+            'ἐαθῶσιν':  [['ἐᾱθῶσῐν'],                           ['Table 10'],  ['passive'],      ['subjunctive'], ['third'],                ['plural']],
+
+compile_index() reads the headers of every cell as UD features (FEATURES) and compiles the map into one index,
+keyed on (normalized form, Case, Number, Gender, Tense, Voice, Mood, Person) as the string "form|Nom|Sing|...",
+with the markup of the form as value. disambiguate() then tries the features of the token at each of LEVELS in turn,
+dropping the ones Wiktionary often does not give (the tense of tables named 'Table 1', the case of participles), and
+the first key in the index wins. The last level keeps no features, i.e. what every reading of the form agrees on.
+The bare form is a key too (with itself as value), so that a word that is not in the map costs a single lookup.
+
+Where several cells share a key with different markup, the value is the markup they agree on (e.g. the middle and
+passive cells of an aorist, for a token with Voice=MedPass), so the index never guesses.
+'''
+from itertools import product
+
+from grc_utils import normalize_word
+
 from .format_macrons import macron_unicode_to_markup
+from .prefixes import apply_marks, compile_marks
 
-spaCy_cases = {
-    "Nom": "Nominative",
-    "Acc": "Accusative",
-    "Gen": "Genitive",
-    "Dat": "Dative",
-    "Abl": "Ablative",
-    "Loc": "Locative",
-    "Voc": "Vocative",
-    "Ins": "Instrumental",
-    "Part": "Partitive",
-    "Ess": "Essive",
-    "Trans": "Translative",
-    "Com": "Comitative",
+FEATURES = ("Case", "Number", "Gender", "Tense", "Voice", "Mood", "Person")
+
+# the features kept at each level of the fallback, most specific first
+LEVELS = [
+    FEATURES,
+    ("Case", "Number", "Gender", "Voice", "Mood", "Person"), # most tables are not named after their tense ('Table 1')
+    ("Case", "Number", "Gender"), # nouns and adjectives
+    ("Case", "Number"), # noun tables whose column headers are not genders (but e.g. οἱ μῠ́ες hoi múes)
+    ("Gender", "Tense", "Voice", "Mood"), # participles, which Wiktionary gives by gender and voice only
+    ("Gender", "Voice", "Mood"),
+    (),
+]
+
+# Wiktionary header: {feature: UD values}, several values where the token may have either
+HEADERS = {
+    "Nominative": {"Case": ("Nom",)},
+    "Genitive": {"Case": ("Gen",)},
+    "Dative": {"Case": ("Dat",)},
+    "Accusative": {"Case": ("Acc",)},
+    "Vocative": {"Case": ("Voc",)},
+    "Singular": {"Number": ("Sing",)},
+    "Dual": {"Number": ("Dual",)},
+    "Plural": {"Number": ("Plur",)},
+    "Masculine": {"Gender": ("Masc",)},
+    "Feminine": {"Gender": ("Fem",)},
+    "Neuter": {"Gender": ("Neut",)},
+    "Masculine / Feminine": {"Gender": ("Masc", "Fem")},
+    "m": {"Gender": ("Masc",)},
+    "f": {"Gender": ("Fem",)},
+    "n": {"Gender": ("Neut",)},
+    "active": {"Voice": ("Act",)},
+    "middle": {"Voice": ("Mid", "MedPass")},
+    "passive": {"Voice": ("Pass", "MedPass")},
+    "middle/ passive": {"Voice": ("Mid", "Pass", "MedPass")},
+    "middle/passive": {"Voice": ("Mid", "Pass", "MedPass")},
+    "indicative": {"Mood": ("Ind",)},
+    "subjunctive": {"Mood": ("Sub",)},
+    "optative": {"Mood": ("Opt",)},
+    "imperative": {"Mood": ("Imp",)},
+    "participle": {"Mood": ("Part",)},
+    "infinitive": {"Mood": ("Inf",)},
+    "first": {"Person": ("1",)},
+    "second": {"Person": ("2",)},
+    "third": {"Person": ("3",)},
 }
 
-spaCy_tenses = {
-    "Pres": "Present",
-    "Past": "Past",
-    "Fut": "Future",
-    "Imp": "Imperfect",
-    "Perf": "Perfect",
-    "Plup": "Pluperfect",
+# the tense a conjugation table is named after (pres-numi, aor-1-ion, ...): UD values
+TENSES = {
+    "pres": ("Pres",),
+    "imperf": ("Past", "Imp"),
+    "aor": ("Past", "Aor"),
+    "fut": ("Fut",),
+    "perf": ("Perf",),
+    "plup": ("Pqp", "Plup"),
 }
 
-def morph_disambiguator(word, lemma, pos, morph, token, tense, case_voice, mode, person, number):
-    """
-    input format:       [[unnormalized tokens with macrons],    [table names], [row headers 1],  row headers 2],  [column header 1],        [column header 2]]
-    E.g.:   'ἀσφαλής':  [['ᾰ̓σφᾰλής'],                           ['Table 1'],   ['Nominative'],   [''],            ['Masculine / Feminine'], ['Singular']],
-            'ἐαθῶσιν':  [['ἐᾱθῶσῐν'],                           ['Table 10'],  ['passive'],      ['subjunctive'], ['third'],                ['plural']],
 
-    This is hardly more than a placeholder at the moment.
-    """
-    if morph.get("Tense"):
-        tense = morph.get("Tense")[0]
+def header_features(table, headers):
+    '''
+    {feature: UD values} of a cell, from its table name and its four headers. Headers that are not features
+    (the forms with the article that head some noun tables, 'Derived forms', 'Comparative') are left out.
+    '''
+    features = {}
+    tense = TENSES.get(table.strip().split("-")[0])
+    if tense:
+        features["Tense"] = tense
+    for header in headers:
+        header = header.strip()
+        # column header 2 is 'Singular' in noun tables and 'singular' in conjugation tables; 'Plural.2' is a second plural column
+        found = HEADERS.get(header) or HEADERS.get(header.split(".")[0].capitalize())
+        if found:
+            features.update(found)
+    return features
+
+
+def index_key(form, values):
+    return "|".join((form, *(value or "" for value in values)))
+
+
+def level_keys(form, features):
+    '''
+    The keys of a cell at every level, one for each combination of its UD values.
+    '''
+    keys = {} # a dict rather than a set, for the index to be built in the same order every time
+    for level in LEVELS:
+        choices = [features.get(feature, (None,)) if feature in level else (None,) for feature in FEATURES]
+        keys.update(dict.fromkeys(index_key(form, values) for values in product(*choices)))
+    return list(keys)
+
+
+def agreed_markup(form, markups):
+    '''
+    The markup that all the markups of a form agree on, or None if they agree on none.
+    '''
+    marks = set.intersection(*(set(compile_marks(markup)) for markup in markups))
+    if not marks:
+        return None
+    return apply_marks(form, sorted(marks))
+
+
+def compile_index(wiktionary_ambiguous_map):
+    '''
+    Returns ({"form|Case|Number|Gender|Tense|Voice|Mood|Person": markup, "form": form}, {form: macronized forms} of the
+    cells dropped because their macronized form is not the form (e.g. missing accents)).
+    '''
+    markups = {}
+    dropped = {}
+    for word, (tokens, tables, *headers) in wiktionary_ambiguous_map.items():
+        form = normalize_word(word)
+        for i, token in enumerate(tokens):
+            markup = normalize_word(macron_unicode_to_markup(token))
+            if markup.replace("^", "").replace("_", "") != form:
+                dropped.setdefault(word, []).append(token)
+                continue
+            features = header_features(tables[i], [header[i] for header in headers])
+            for key in level_keys(form, features):
+                markups.setdefault(key, []).append(markup)
+
+    index = {key.split("|", 1)[0]: key.split("|", 1)[0] for key in markups}
+    for key, candidates in markups.items():
+        markup = agreed_markup(key.split("|", 1)[0], candidates)
+        if markup is not None:
+            index[key] = markup
+    return index, dropped
 
-    # Case
-    for i, case in enumerate(case_voice):
-        if spaCy_cases[morph] == case: # let's not nitpick and simply choose the first case that matches
-            disambiguated_word = macron_unicode_to_markup(token[i]) 
-            return disambiguated_word if disambiguated_word.replace("^", "").replace("_", "") == word else word # make sure there's no fucking errors entering from ugly wiktionary entries, like missing accents
-        
-    return word
 
+def token_features(morph):
+    features = {feature: morph.get(feature) for feature in FEATURES}
+    if features["Mood"] is None and morph.get("VerbForm") in ("Part", "Inf"):
+        features["Mood"] = morph.get("VerbForm")
+    return features
 
 
+def disambiguate(index, word, morph=None):
+    '''
+    The markup of a normalized word from the compiled index, for the token's morphology (a Morph, or None for plain
+    text, which only gets what all the readings agree on). None if the index has nothing for it.
+    '''
+    if word not in index:
+        return None
+    features = token_features(morph) if morph is not None else {}
+    for level in LEVELS if features else LEVELS[-1:]:
+        markup = index.get(index_key(word, (features.get(feature) if feature in level else None for feature in FEATURES)))
+        if markup is not None:
+            return markup
+    return None
@@ -46,15 +46,135 @@ The following have nominal forms in grc:
     nominal_pos_tags = {"NOUN", "PROPN", "PRON", "NUM", "ADJ"}
 '''
 import logging
+from collections import namedtuple
 
-from grc_utils import only_bases
+from .class_token import morph_signature
+from .shared_db import shared_databases
+from .word_forms import only_bases
 
-from .db.ionic import ionic
 
-### THE 3 ALGORITHMS RE NOMINAL FORMS
-# long_fem_alpha(token, tag, lemma)
-# short_masc_neut_alpha(token, tag)
-# short_dat(token, tag)
+def ionic_eta_stems():
+    '''
+    The stems of the Ionic forms on -η, i.e. the 1D words whose Attic -α is long (rules 1 and 2).
+    '''
+    from .db.ionic import ionic
+    return frozenset(ionic_word[:-1] for ionic_word in ionic if ionic_word and only_bases(ionic_word[-1]) == "η")
+
+
+# a memory-mapped set shared by all processes with GRC_MACRONIZER_SHARED_DB set (see shared_db.py)
+_shared = shared_databases()
+IONIC_ETA_STEMS = _shared["ionic_eta_stems"] if _shared else ionic_eta_stems()
+
+# The endings (of the bare word) the rules ask about; any other ending is ""
+ENDING_CLASSES = ("αν", "ας", "ιν", "α", "ι")
+
+NominalKey = namedtuple("NominalKey", ["case", "number", "gender", "pos", "ending", "is_lemma"])
+Rule = namedtuple("Rule", ["name", "applies", "action"])
+
+
+def ending_class(word):
+    bare = only_bases(word)
+    for ending in ENDING_CLASSES:
+        if bare.endswith(ending):
+            return ending
+    return ""
+
+
+### ACTIONS (word, lemma, pos) -> macronized word or None
+
+def long_final(word, lemma, pos):
+    return word + "_"
+
+def short_final(word, lemma, pos):
+    return word + "^"
+
+def long_penult(word, lemma, pos):
+    return word[:-1] + "_" + word[-1]
+
+def short_penult(word, lemma, pos):
+    return word[:-1] + "^" + word[-1]
+
+def long_final_if_ionic_eta(word, lemma, pos):
+    if word[:-1] in IONIC_ETA_STEMS:
+        return long_final(word, lemma, pos)
+    return None
+
+def long_penult_if_ionic_eta_lemma(word, lemma, pos):
+    if lemma[-1] in ["η", "α"] and lemma[:-1] in IONIC_ETA_STEMS:
+        return long_penult(word, lemma, pos)
+    return None
+
+def long_penult_if_first_declension(word, lemma, pos):
+    if pos in ["NOUN", "PROPN"]: # words with one gender
+        if lemma[-1] in ["η", "α"]:
+            return long_penult(word, lemma, pos)
+    elif pos in ["ADJ", "NUM", "PRON"]: # words whose lemma is probably in masculine
+        return long_penult(word, lemma, pos)
+    return None
+
+def stem_suffix(word, lemma, pos):
+    return macronize_nominal_stem_suffixes(word, lemma, pos, None)
+
+
+### THE RULES
+# Tried group by group, in order. Within a group, only the first rule that applies to the key is tried
+# (the groups were if/elif chains), and the first macronized word returned by any group wins.
+
+NOMINAL_RULES = [
+    [ # 1D
+        # (1) -α_ for 1D nouns in nominative/vocative singular feminine
+        # (sic: the Voc alternative does not ask for the -α, cf. the operator precedence of the original condition)
+        Rule("1D case 1",
+             lambda k: (k.ending == "α" and k.is_lemma and "Nom" in k.case) or ("Voc" in k.case and "Sing" in k.number and "Fem" in k.gender),
+             long_final_if_ionic_eta),
+        # (2) -α_ν for 1D nouns in accusative singular feminine
+        Rule("1D case 2",
+             lambda k: k.ending == "αν" and "Acc" in k.case and "Sing" in k.number and "Fem" in k.gender,
+             long_penult_if_ionic_eta_lemma),
+        # (3) -α_ς for 1D nouns in genitive singular feminine
+        Rule("1D case 3",
+             lambda k: k.ending == "ας" and "Gen" in k.case and "Sing" in k.number and "Fem" in k.gender,
+             long_penult),
+        # (4) -α_ς for 1D nouns in accusative plural feminine
+        Rule("1D case 4",
+             lambda k: k.ending == "ας" and "Acc" in k.case and "Plur" in k.number and "Fem" in k.gender,
+             long_penult_if_first_declension),
+    ],
+    [ # (5) -α^ for masculine and neutre nouns
+        Rule("Masc/Neut short alpha",
+             lambda k: k.ending == "α" and ("Masc" in k.gender or "Neut" in k.gender),
+             short_final),
+    ],
+    [ # (6) -ι^ for datives; note optional ny ephelkystikon!
+        Rule("Dat short iota",
+             lambda k: "Dat" in k.case and k.ending == "ι",
+             short_final),
+        Rule("Dat short iota (with ny ephelkystikon)",
+             lambda k: "Dat" in k.case and k.ending == "ιν",
+             short_penult),
+    ],
+    [
+        Rule("Stem suffix", lambda k: True, stem_suffix),
+    ],
+]
+
+
+def compile_rules(key):
+    '''
+    The rules to try, in order, for a key.
+    '''
+    rules = []
+    for group in NOMINAL_RULES:
+        for rule in group:
+            if rule.applies(key):
+                rules.append(rule)
+                break
+    return tuple(rules)
+
+
+# {NominalKey: (Rule, ...)}, filled as keys are met
+NOMINAL_TABLE = {}
+
 
 def macronize_nominal_stem_suffixes(word, lemma, pos, morph, debug=False):
     '''
@@ -70,127 +190,35 @@ def macronize_nominal_stem_suffixes(word, lemma, pos, morph, debug=False):
 def macronize_nominal_forms(word, lemma, pos, morph, debug=True):
     '''
     This function should only be called if ultima or penultima is not yet macronized.
-    It is slow and because of its complexity, bug prone.
     A large chunk of its use cases should be covered by the accent-rule method.
     It is primarily useful for *oxytones*.
+
+    The rules are looked up in NOMINAL_TABLE by the morph signature of the token (case, number, gender; see class_token.morph_signature),
+    its POS, the ending class of the word and whether the word is its own lemma, so that a token costs one
+    signature, one ending check and one dict lookup before its (at most four) candidate rules are tried.
+    To add a rule, add it to its group in NOMINAL_RULES.
     '''
 
     if not word or not lemma or not pos or not morph: # TODO: is this necessary?
         return word
 
-    nominal_pos_tags = {"NOUN", "PROPN", "PRON", "NUM", "ADJ"}
-
-    if morph is not None and "Dual" in (morph.get("Number") or ""):
+    signature = morph_signature(morph)
+    if "Dual" in signature.number:
         return word
 
     if debug:
         logging.debug(f'odyCy on {word}: \n\tLemma {lemma}, \n\tPOS: {pos}, \n\tMorphology: {morph}')
 
-    def first_declination(word, lemma, morph):
-        '''
-        Nominal-form algorithms for 1st declension endings.
-        '''
-
-        # -α_ for 1D nouns in nominative/vocative singular feminine
-        if (only_bases(word)[-1:] == "α" and word == lemma 
-            and 'Nom' in (morph.get("Case") or "") or 'Voc' in (morph.get("Case") or "")
-            and 'Sing' in (morph.get("Number") or "") 
-            and 'Fem' in (morph.get("Gender") or "")):
-            etacist_version = word[:-1] + "η"
-            if any(etacist_version[:-1] == ionic_word[:-1] and etacist_version[-1] == only_bases(ionic_word[-1]) for ionic_word in ionic):
-                if debug:
-                    logging.debug(f'\033[1;32m{word}: 1D case 1\033[0m')
-                return word + "_"
-
-        # -α_ν for 1D nouns in accusative singular feminine
-        elif (only_bases(word)[-2:] == "αν" 
-              and 'Acc' in (morph.get("Case") or "") 
-              and 'Sing' in (morph.get("Number") or "") 
-              and 'Fem' in (morph.get("Gender") or "")):
-            if debug:
-                logging.debug('pass 1')
-            if lemma[-1] in ["η", "α"]:
-                etacist_lemma = lemma[:-1] + "η"
-                if debug:
-                    logging.debug(f'Etacist lemma: {etacist_lemma}')
-                if any(etacist_lemma[:-1] == ionic_word[:-1] and etacist_lemma[-1] == only_bases(ionic_word[-1]) for ionic_word in ionic):
-                    if debug:
-                        logging.debug(f'\033[1;32m{word}: 1D case 2\033[0m')
-                    return word[:-1] + "_" + word[-1]
-
-        # -α_ς for 1D nouns in genitive singular feminine
-        elif (only_bases(word)[-2:] == "ας" 
-              and 'Gen' in (morph.get("Case") or "") 
-              and 'Sing' in (morph.get("Number") or "") 
-              and 'Fem' in (morph.get("Gender") or "")):
-            if debug:
-                logging.debug(f'\033[1;32m{word}: 1D case 3\033[0m')
-            return word[:-1] + "_" + word[-1]
-        
-        # -α_ς for 1D nouns in accusative plural feminine
-        elif (only_bases(word)[-2:] == "ας" 
-              and 'Acc' in (morph.get("Case") or "") 
-              and 'Plur' in (morph.get("Number") or "") 
-              and 'Fem' in (morph.get("Gender") or "")):
-            if pos in ["NOUN", "PROPN"]: # words with one gender
-                if lemma[-1] in ["η", "α"]:
-                    if debug:
-                        logging.debug(f'\033[1;32m{word}: 1D case 4 for NOUN\033[0m')
-                    return word[:-1] + "_" + word[-1]
-            elif pos in ["ADJ", "NUM", "PRON"]: # words whose lemma is probably in masculine
-                if debug:
-                    logging.debug(f'\033[1;32m{word}: 1D case 4 for ADJ\033[0m')
-                return word[:-1] + "_" + word[-1]
-        
-        else:
-            return None
-    
-    def masc_and_neutre_short_alpha(word, morph):
-        if (only_bases(word)[-1:] == "α" 
-            and ('Masc' in (morph.get("Gender") or "") or 'Neut' in (morph.get("Gender") or ""))):
+    key = NominalKey(*signature, pos, ending_class(word), word == lemma)
+    rules = NOMINAL_TABLE.get(key)
+    if rules is None:
+        rules = NOMINAL_TABLE[key] = compile_rules(key)
+
+    for rule in rules:
+        result = rule.action(word, lemma, pos)
+        if result:
             if debug:
-                logging.debug(f'\033[1;32m{word}: Masc/Neut short alpha\033[0m')
-            return word + "^"
-        
-        return None
-    
-    def dative_short_iota(word, morph):
-        '''
-        Note optional ny ephelkystikon!
-        '''
-        if 'Dat' in (morph.get("Case") or ""):
-            if only_bases(word)[-1] == "ι":
-                logging.debug(f'\033[1;32m{word}: Dat short iota\033[0m')
-                return word + "^"
-            elif only_bases(word)[-2:] == "ιν":
-                logging.debug(f'\033[1;32m{word}: Dat short iota (with ny ephelkystikon)\033[0m')
-                word = word[:-1] + "^" + word[-1]
-                return word
-        return None
-    
-    result = first_declination(word, lemma, morph)
-    if result:
-        return result
-    else:
-        logging.debug("No 1D!")
-    
-    result = masc_and_neutre_short_alpha(word, morph)
-    if result:
-        return result
-    else:
-        logging.debug("No short alpha!")
-    
-    result = dative_short_iota(word, morph)
-    if result:
-        return result
-    else:
-        logging.debug("No short alpha!")
-
-    result = macronize_nominal_stem_suffixes(word, lemma, pos, morph, debug=False)
-    if result:
-        return result
-    else:
-        logging.debug("No viable stem suffix!")
-    
-    return word
+                logging.debug(f'\033[1;32m{word}: {rule.name}\033[0m')
+            return result
 
+    return word
@@ -0,0 +1,133 @@
+'''
+Fast path for plain text, when there is no parser output (lemma, POS, morphology) to go on.
+
+Running a transformer parser over a huge raw-text corpus just to get lemmata and morphology is often not worth it.
+Here the text is split into words by a regular expression instead, and every word is sent through a Macronizer made
+with morphology=False, which skips the modules that need lemma, POS or morphology (the Wiktionary tables that are
+disambiguated by morphology, nominal and verbal forms, prefixes and the wrong-case-ending recursion) and runs the rest:
+custom, the Wiktionary singletons, LSJ, the accent rules, the double-accent and reversed-elision recursions, and
+hypotactic (the databases probed with the word folded for case and for accent and case too, e.g. Ἄρης as ἄρης). Every type goes
+through the modules once; after that it is a dict lookup.
+
+The text is streamed line by line and comes back as it went in (normalized as by Text), with only the markup added:
+
+    from grc_macronizer import Macronizer
+    from grc_macronizer.plain_text import macronize_lines
+
+    macronizer = Macronizer(make_prints=False, morphology=False)
+    with open("in.txt") as f, open("out.txt", "w") as out:
+        out.writelines(macronize_lines(macronizer, f))
+
+Macronizer.macronize also accepts a str, and hands it to macronize_plain_text, with a Macronizer without morphology
+(see Macronizer.plain_text_macronizer) if it was made with morphology. From the command line:
+
+    python -m grc_macronizer.plain_text in.txt out.txt
+    cat in.txt | python -m grc_macronizer.plain_text > out.txt
+'''
+
+import argparse
+import re
+import sys
+
+from grc_utils import lower_grc, normalize_word
+
+from .class_text import filter_reason
+from .class_token import Morph
+from .word_forms import count_dichrona_in_open_syllables, NormalizedWord
+
+# A word is a run of letters (with their diacritics), optionally elided or followed by a numeral sign
+WORD = re.compile(r"[^\W\d_]+['’‘´΄\u02bc᾿\u0374\u02b9]?")
+
+NO_MORPH = Morph("_")
+
+# Without morphology, ἄν cannot be told to go with a subjunctive, so it is short, as Text makes it in that case
+AN = {"ἂν": "ἂ^ν", "ἄν": "ἄ^ν"}
+
+
+def tokenize(line):
+    '''
+    The words of a line, without punctuation.
+    '''
+    return WORD.findall(line)
+
+
+def is_macronizable(word, genre="prose"):
+    '''
+    Whether Text would send the word to the modules: it passes Text's filters (see class_text.filter_reason)
+    and has dichrona in open syllables.
+    '''
+    return filter_reason(word, genre) is None and count_dichrona_in_open_syllables(word) > 0
+
+
+def macronize_lines(macronizer, lines, genre="prose", lowercase=False):
+    '''
+    Macronizes an iterable of lines (e.g. an open file) and yields them back one by one, line endings included.
+    The results are memoized per type for the whole iterable.
+    '''
+    memo = dict(AN)
+
+    def macronize(match):
+        word = NormalizedWord(match.group()) # a word of a normalized line
+        if word not in memo:
+            if is_macronizable(word, genre):
+                memo[word], _ = macronizer.macronize_word(word, word, "X", NO_MORPH)
+            else:
+                memo[word] = word
+        return memo[word]
+
+    for line in lines:
+        body = line.rstrip("\r\n")
+        ending = line[len(body):]
+        body = normalize_word(body)
+        if lowercase:
+            body = lower_grc(body)
+        yield WORD.sub(macronize, body) + ending
+
+
+def macronize_plain_text(macronizer, text, genre="prose", lowercase=False):
+    return "".join(macronize_lines(macronizer, text.splitlines(keepends=True), genre=genre, lowercase=lowercase))
+
+
+####################
+# --- Main ---  #
+####################
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="grc-macronize-text", description="Macronize plain text without a parser, streaming it line by line.")
+    parser.add_argument("input", nargs="?", help="text file (default: stdin)")
+    parser.add_argument("output", nargs="?", help="where to write the macronized text (default: stdout)")
+    parser.add_argument("--genre", default="prose", choices=["prose", "epic"])
+    parser.add_argument("--lowercase", action="store_true")
+    parser.add_argument("--no-hypotactic", action="store_true")
+    parser.add_argument("--shared-db", metavar="DIR", help="map the lookup databases from DIR (see shared_db.py)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.shared_db:
+        from .shared_db import enable
+        enable(args.shared_db)
+
+    from .class_macronizer import Macronizer
+    from .cli import write_atomically
+
+    macronizer = Macronizer(make_prints=False, no_hypotactic=args.no_hypotactic, morphology=False)
+
+    source = open(args.input, "r", encoding="utf-8") if args.input else sys.stdin
+    try:
+        lines = macronize_lines(macronizer, source, genre=args.genre, lowercase=args.lowercase)
+        if args.output:
+            write_atomically(args.output, lines)
+        else:
+            sys.stdout.writelines(lines)
+    finally:
+        if args.input:
+            source.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+'''
+ALGORITHMIC MACRONIZING: PREFIXES
+
+If the lemma minus a preverb is still an LSJ entry, the dichrona of the preverb can be macronized in the token,
+e.g. ἀφίκοντο => ἀ^φίκοντο, because ικνεομαι is in LSJ. Preverbs stack (ἀντι-παρα-βάλλω, συν-απο-θνῄσκω),
+so the lemma is split one preverb at a time, and every split has to leave an LSJ entry.
+
+All preverbs are in one trie over their bare forms (only_bases), with their elided, aspirated and assimilated
+variants, so the preverbs at a position of the lemma are found in one walk, longest first. A variant is only
+taken before the sounds it is used before (elided and aspirated variants before a vowel, the full forms they stand for
+before a consonant, συμ- before a labial etc.; ἀν- and παρ- also stand before consonants, by apocope in verse, and
+περι-, προ- and ἀμφι- are not elided). An elided preposition (ἀφ', ὑπ') is its own preverb.
+The split is memoized per lemma; the token has to show a variant of the same preverbs (ἀπ-έβαλον from ἀπο-βάλλω)
+and gets the markup of the variants it shows.
+
+Preverbs without dichrona (ἐκ, ἐν, εἰς, πρό, πρός) are in the trie too, so that what follows them can be reached.
+'''
+from collections import namedtuple
+
+from grc_utils import ROUGHS
+
+from .word_forms import only_bases
+
+VOWELS = "αεηιουω"
+CONSONANTS = "βγδζθκλμνξπρσςτφχψ"
+LABIALS = "βπφψμ"
+GUTTURALS = "γκχξ"
+ELISION = "'’᾿"
+
+# preverb: {bare variant: variant with markup}
+PREVERBS = {
+    "ανα": {"ανα": "α^να^", "αν": "α^ν"},
+    "αντι": {"αντι": "αντι^", "αντ": "αντ", "ανθ": "ανθ"},
+    "αμφι": {"αμφι": "αμφι^", "αμφ": "αμφ"},
+    "απο": {"απο": "α^πο", "απ": "α^π", "αφ": "α^φ"},
+    "δια": {"δια": "δι^α^", "δι": "δι^"},
+    "εις": {"εισ": "εισ"},
+    "εκ": {"εκ": "εκ", "εξ": "εξ"},
+    "εν": {"εν": "εν", "εμ": "εμ", "εγ": "εγ", "ελ": "ελ"},
+    "επι": {"επι": "επι^", "επ": "επ", "εφ": "εφ"},
+    "κατα": {"κατα": "κα^τα^", "κατ": "κα^τ", "καθ": "κα^θ"},
+    "μετα": {"μετα": "μετα^", "μετ": "μετ", "μεθ": "μεθ"},
+    "παρα": {"παρα": "πα^ρα^", "παρ": "πα^ρ"},
+    "περι": {"περι": "περι^"},
+    "προ": {"προ": "προ"},
+    "προς": {"προσ": "προσ"},
+    "συν": {"συν": "συ^ν", "συμ": "συ^μ", "συγ": "συ^γ", "συλ": "συ^λ", "συρ": "συ^ρ", "συσ": "συ^σ"},
+    "ξυν": {"ξυν": "ξυ^ν", "ξυμ": "ξυ^μ", "ξυγ": "ξυ^γ", "ξυλ": "ξυ^λ", "ξυρ": "ξυ^ρ", "ξυσ": "ξυ^σ"},
+    "υπερ": {"υπερ": "υ^περ"},
+    "υπο": {"υπο": "υ^πο", "υπ": "υ^π", "υφ": "υ^φ"},
+}
+
+# bare variant: the sounds it can stand before (any, if not listed)
+BEFORE = {
+    **dict.fromkeys(["ανα", "αντι", "απο", "δια", "επι", "κατα", "μετα", "παρα", "υπο"], CONSONANTS),
+    **dict.fromkeys(["αντ", "ανθ", "αμφ", "απ", "αφ", "δι", "εξ", "επ", "εφ", "κατ", "καθ", "μετ", "μεθ", "υπ", "υφ"], VOWELS),
+    **dict.fromkeys(["εμ", "συμ", "ξυμ"], LABIALS),
+    **dict.fromkeys(["εγ", "συγ", "ξυγ"], GUTTURALS),
+    **dict.fromkeys(["ελ", "συλ", "ξυλ"], "λ"),
+    **dict.fromkeys(["συρ", "ξυρ"], "ρ"),
+    **dict.fromkeys(["συσ", "ξυσ"], "σ"),
+}
+
+MIN_STEM_LENGTH = 3 # what is left of the lemma has to be a real word, not e.g. ὅς or ἄω
+
+Variant = namedtuple("Variant", ["preverb", "bare", "marks", "before", "rough"])
+
+
+def compile_marks(markup):
+    '''
+    [(index after which the mark goes, mark), ...]
+    '''
+    marks = []
+    index = 0
+    for char in markup:
+        if char in "^_":
+            marks.append((index, char))
+        else:
+            index += 1
+    return tuple(marks)
+
+
+def apply_marks(chars, marks):
+    marked = []
+    previous = 0
+    for index, mark in marks:
+        marked.append(chars[previous:index])
+        marked.append(mark)
+        previous = index
+    marked.append(chars[previous:])
+    return "".join(marked)
+
+
+class PrefixTrie:
+    '''
+    The preverbs as a trie, validating splits against `stems` (the bare LSJ keys) and memoizing them per lemma.
+    '''
+    def __init__(self, stems, preverbs=PREVERBS):
+        self.stems = stems
+        self.trie = {}
+        self.variants = {}
+        for preverb, variants in preverbs.items():
+            self.variants[preverb] = []
+            for bare, markup in sorted(variants.items(), key=lambda item: -len(item[0])):
+                variant = Variant(preverb, bare, compile_marks(markup), BEFORE.get(bare), bare[0] == "υ")
+                self.variants[preverb].append(variant)
+                node = self.trie
+                for char in bare:
+                    node = node.setdefault(char, {})
+                node.setdefault(None, []).append(variant)
+        self.splits = {}
+
+    def matches(self, bare_word, start):
+        '''
+        The variants at bare_word[start:], longest first.
+        '''
+        found = []
+        node = self.trie
+        for char in bare_word[start:]:
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                found.extend(node[None])
+        return found[::-1]
+
+    @staticmethod
+    def fits(variant, word, bare_word, start):
+        '''
+        Whether the variant can be read at bare_word[start:]: the sound after it, and the breathing of an initial vowel.
+        (only_bases drops the apostrophe, so an elided word ends where its bare form does.)
+        '''
+        end = start + len(variant.bare)
+        if end == len(bare_word): # only an elided preposition is a bare preverb
+            if word[-1] not in ELISION:
+                return False
+        elif variant.before is not None and bare_word[end] not in variant.before:
+            return False
+        return start > 0 or variant.bare[0] not in VOWELS or (word[0] in ROUGHS) == variant.rough
+
+    def split(self, lemma):
+        '''
+        The preverbs of a lemma, outermost first, as a tuple of Variants. Memoized per lemma.
+        '''
+        chain = self.splits.get(lemma)
+        if chain is not None:
+            return chain
+
+        bare_lemma = only_bases(lemma)
+        chain = []
+        start = 0
+        while True:
+            for variant in self.matches(bare_lemma, start):
+                stem = bare_lemma[start + len(variant.bare):]
+                elided = start == 0 and not stem
+                if (elided or len(stem) >= MIN_STEM_LENGTH and stem in self.stems) and self.fits(variant, lemma, bare_lemma, start):
+                    chain.append(variant)
+                    start += len(variant.bare)
+                    break
+            else:
+                break
+
+        chain = self.splits[lemma] = tuple(chain)
+        return chain
+
+    def macronize(self, token, lemma):
+        '''
+        The token with the markup of the preverbs of its lemma, or None if they do not give it any.
+        '''
+        if not token or not lemma:
+            return None
+        chain = self.split(lemma)
+        if not any(variant.marks for variant in chain):
+            return None
+
+        bare_token = only_bases(token)
+        pieces = []
+        start = 0
+        marked = False
+        for lemma_variant in chain:
+            # the variant of the lemma first (ἄν-ατος is not ἄνα-τος), then the others, longest first (ἀπ-έβαλον from ἀπο-βάλλω)
+            for variant in (lemma_variant, *self.variants[lemma_variant.preverb]):
+                if bare_token.startswith(variant.bare, start) and self.fits(variant, token, bare_token, start):
+                    break
+            else:
+                break # the token does not show this preverb (or any after it)
+            end = start + len(variant.bare)
+            pieces.append(apply_marks(token[start:end], variant.marks))
+            marked = marked or bool(variant.marks)
+            start = end
+
+        if not marked:
+            return None
+        return "".join(pieces) + token[start:]
@@ -0,0 +1,191 @@
+'''
+Persistent cache of macronization results, shared between runs and between worker processes.
+
+Macronizing a word depends only on the word itself, its lemma, POS and morphology, and on the databases and rules.
+The cache is therefore a single SQLite file mapping (normalized form, lemma, POS, morph) to the result and the modules
+that produced it, stamped with a fingerprint of the contents of the databases, the rule code (this package and grc_utils)
+and the options that change results. When any of these change, the fingerprint changes and the stale results are
+dropped the next time the cache is opened for writing, so re-runs after a database update start from a clean slate,
+while warm re-runs of an unchanged setup only have to macronize types they have not seen before.
+
+Usage:
+
+    cache = ResultCache("results.sqlite", fingerprint())
+    macronizer = Macronizer(cache=cache)
+    ...
+    cache.put_many(cache.take_pending()) # new results are only written when asked to
+    cache.close()
+
+Worker processes open the cache with readonly=True and hand their pending results to the parent, which is the only
+writer (see cli.py). The file is kept in WAL mode, so readers are never blocked by the writer.
+'''
+
+import hashlib
+import importlib.util
+import json
+from pathlib import Path
+import sqlite3
+
+from grc_utils import normalize_word
+
+from .indexes import SOURCES
+
+SCHEMA_VERSION = 1
+
+# Files in this package that only handle input and output, and hence do not affect results
+NON_RULE_FILES = {"__main__.py", "benchmark.py", "cli.py", "conllu.py", "evaluation.py", "incremental.py", "memory.py", "plain_text.py", "result_cache.py", "server.py"}
+
+
+def fingerprint(no_hypotactic=False, morphology=True):
+    '''
+    Hashes the databases and rule code of this package and of grc_utils, plus the options that change results.
+    The two halves (rules, databases) are kept apart, so that incremental.py can tell a database update from a rule change.
+    '''
+    return f"{code_fingerprint(no_hypotactic, morphology)}.{database_fingerprint()}"
+
+
+def code_fingerprint(no_hypotactic=False, morphology=True):
+    package_dir = Path(__file__).resolve().parent
+    paths = [path for path in package_dir.rglob("*.py") if _is_rule_file(path, package_dir)]
+
+    spec = importlib.util.find_spec("grc_utils")
+    if spec is not None and spec.origin:
+        grc_utils_dir = Path(spec.origin).resolve().parent
+        paths += [path for path in grc_utils_dir.rglob("*.py") if "__pycache__" not in path.parts]
+
+    options = f"schema={SCHEMA_VERSION}|no_hypotactic={no_hypotactic}" + ("" if morphology else "|morphology=False")
+    return _hash_files(paths, options)
+
+
+def database_fingerprint(db_dir=None):
+    '''
+    Hashes the source databases (indexes.SOURCES), not what is built from them, so rebuilding the indexes changes nothing.
+    '''
+    db_dir = Path(db_dir) if db_dir else Path(__file__).resolve().parent / "db"
+    paths = [db_dir / name for name in SOURCES if (db_dir / name).is_file()]
+    return _hash_files(paths)
+
+
+def _hash_files(paths, salt=""):
+    digest = hashlib.sha256(salt.encode())
+    for path in sorted(paths, key=lambda path: (path.name, str(path))):
+        digest.update(path.name.encode())
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_rule_file(path, package_dir):
+    relative = path.relative_to(package_dir)
+    if "__pycache__" in relative.parts or relative.parts[0] in ("tests", "db"):
+        return False
+    return str(relative) not in NON_RULE_FILES
+
+
+def cache_key(token, lemma, pos, morph):
+    return (normalize_word(token), str(lemma), str(pos), repr(morph))
+
+
+class ResultCache:
+    def __init__(self, path, fingerprint, readonly=False, keep_stale=False):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.readonly = readonly
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+        if readonly:
+            self.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "form TEXT, lemma TEXT, pos TEXT, morph TEXT, result TEXT, modules TEXT, "
+                "PRIMARY KEY (form, lemma, pos, morph)) WITHOUT ROWID"
+            )
+            if self._stored_fingerprint() != fingerprint and not keep_stale:
+                self.connection.execute("DELETE FROM results")
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+            self.connection.commit()
+
+        # a reader finding results from other databases or rules simply does not use them
+        self.stored_fingerprint = self._stored_fingerprint()
+        self.valid = self.stored_fingerprint == fingerprint
+
+    def _stored_fingerprint(self):
+        try:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        except sqlite3.OperationalError: # no meta table yet
+            return None
+        return row[0] if row else None
+
+    def get(self, token, lemma, pos, morph):
+        '''
+        Returns (result, modules) if the word has been macronized before, else None.
+        '''
+        key = cache_key(token, lemma, pos, morph)
+
+        if key in self.pending:
+            self.hits += 1
+            return self.pending[key]
+
+        row = None
+        if self.valid:
+            row = self.connection.execute(
+                "SELECT result, modules FROM results WHERE form = ? AND lemma = ? AND pos = ? AND morph = ?", key
+            ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return row[0], tuple(json.loads(row[1]))
+
+    def add(self, token, lemma, pos, morph, result, modules):
+        '''
+        Keeps a new result in memory until it is taken with take_pending().
+        '''
+        self.pending[cache_key(token, lemma, pos, morph)] = (result, tuple(modules))
+
+    def take_pending(self):
+        '''
+        Returns the new results as picklable rows and forgets them.
+        '''
+        rows = [(*key, result, json.dumps(list(modules), ensure_ascii=False)) for key, (result, modules) in self.pending.items()]
+        self.pending = {}
+        return rows
+
+    def put_many(self, rows):
+        if self.readonly:
+            raise ValueError("Cannot write to a cache opened read-only")
+        self.connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.connection.commit()
+
+    def rows(self):
+        '''
+        Iterates over all stored results as (form, lemma, pos, morph, result, modules) rows, whatever their fingerprint.
+        '''
+        return self.connection.execute("SELECT form, lemma, pos, morph, result, modules FROM results")
+
+    def restamp(self, fingerprint):
+        '''
+        Declares the stored results valid for a new fingerprint (after incremental.py has updated the affected ones).
+        '''
+        self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+        self.connection.commit()
+        self.fingerprint = self.stored_fingerprint = fingerprint
+        self.valid = True
+
+    def __len__(self):
+        if not self.valid:
+            return 0
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,531 @@
+'''
+A long-lived local macronization server, so that callers (annotation UIs, metrical scanners, notebooks)
+do not pay for loading the databases on every run:
+
+    python -m grc_macronizer.server --port 8765
+    python -m grc_macronizer.server --socket /tmp/macronizer.sock
+
+The server loads one Macronizer, then answers JSON requests over HTTP, either on localhost or on a Unix socket.
+POST /macronize with one of
+
+    {"text": "Δαρείου καὶ Παρυσάτιδος γίγνονται παῖδες δύο."}
+    {"conllu": "# sent_id = 1\\n1\tΔαρείου\tΔαρεῖος\tPROPN\t_\tCase=Gen|...\\n..."}
+    {"sentences": [["Δαρείου", {"form": "καὶ", "lemma": "καί", "upos": "CCONJ", "feats": "_"}, ...], ...]}
+
+and optionally "genre" ("prose" or "epic") and "provenance" (true/false). The answer has the same shape as the input:
+    - text: the text as it came in, punctuation and line breaks included, with the markup added (see plain_text.py;
+      it is split into words by a regular expression and macronized by a second Macronizer, made with morphology=False)
+    - conllu: the input CoNLL-U with Macronized= (and MacronizedBy=) in the MISC column, as cli.py --format conllu writes it
+    - sentences: the macronized words, sentence for sentence (words that never reach the modules come back as they were),
+      and with provenance, the modules behind each word
+together with per-request stats (sentences, or lines for text, tokens, seconds, tokens per second, results per module, cache hits).
+GET /health reports how long the databases took to load and how many requests have been served.
+
+Requests are handled one at a time, in the order they arrive. Per-request diagnostics files are not written,
+and the per-word debug log is off unless --log-level DEBUG is given.
+
+With --batch, an asyncio front end takes the requests instead, for many concurrent callers sending a verse or a
+sentence each. Requests arriving together are coalesced into one batch (at most --max-batch-size requests, waiting
+at most --max-wait-ms for more after the first), in which every type goes through the modules only once however many
+requests it occurs in; the answers are then fanned back out to each caller. An idle server answers a lone request
+after max-wait, a busy one fills its batches while the previous batch is being macronized.
+
+From Python, the client side is
+
+    from grc_macronizer.server import request
+    answer = request({"text": "..."}, port=8765)   # or socket_path="/tmp/macronizer.sock"
+'''
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import time
+
+from .class_token import Token
+from .conllu import macronize_conllu
+from .plain_text import macronize_plain_text, tokenize
+from .result_cache import cache_key, fingerprint, ResultCache
+from .shared_db import enable as enable_shared_databases
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5
+INPUT_KINDS = ("text", "conllu", "sentences")
+
+
+class RequestError(ValueError):
+    pass
+
+
+##########################
+# --- Macronization ---  #
+##########################
+
+def token_from_json(word, i):
+    '''
+    A word of a "sentences" request: a plain string, or a dict with CoNLL-U field names (form, lemma, upos, feats, id).
+    '''
+    if isinstance(word, str):
+        return Token(word, word, "X", "_", i + 1)
+    if isinstance(word, dict) and isinstance(word.get("form"), str):
+        return Token(word["form"], word.get("lemma") or word["form"], word.get("upos") or "X", word.get("feats") or "_", word.get("id", i + 1))
+    raise RequestError(f"A word must be a string or a dict with a 'form': {word!r}")
+
+
+def conllu_counts(output):
+    '''
+    (sentences, words) in a CoNLL-U string, not counting multi-word tokens and empty nodes.
+    '''
+    sentences = words = 0
+    in_sentence = False
+    for line in output.splitlines():
+        if not line.strip():
+            sentences += in_sentence
+            in_sentence = False
+        elif not line.startswith("#"):
+            in_sentence = True
+            words += line.split("\t")[0].isdigit()
+    return sentences + in_sentence, words
+
+
+def text_counts(text):
+    '''
+    (lines, words) in plain text, not counting lines without words.
+    '''
+    words = [len(tokenize(line)) for line in text.splitlines()]
+    return sum(1 for count in words if count), sum(words)
+
+
+class MacronizationService:
+    '''
+    Holds the warm Macronizers and turns request dicts into answer dicts. Independent of the transport.
+    Plain text goes to one made with morphology=False (the databases are loaded once and shared), which the result cache,
+    stamped for results with morphology, is not used for.
+    '''
+    def __init__(self, no_hypotactic=False, lowercase=False, cache_path=None):
+        start = time.perf_counter()
+        from .class_macronizer import Macronizer
+
+        self.cache = ResultCache(cache_path, fingerprint(no_hypotactic=no_hypotactic)) if cache_path else None
+        self.macronizer = Macronizer(make_prints=False, no_hypotactic=no_hypotactic, lowercase=lowercase, cache=self.cache)
+        self.plain_text_macronizer = self.macronizer.plain_text_macronizer()
+        self.load_seconds = time.perf_counter() - start
+        self.requests = 0
+        self.tokens = 0
+
+    def health(self):
+        return {"status": "ok", "load_seconds": round(self.load_seconds, 3), "requests": self.requests, "tokens": self.tokens}
+
+    def handle(self, payload):
+        if not isinstance(payload, dict):
+            raise RequestError("The request must be a JSON object")
+        kinds = [kind for kind in INPUT_KINDS if kind in payload]
+        if len(kinds) != 1:
+            raise RequestError(f"The request must have exactly one of {', '.join(INPUT_KINDS)}")
+        kind = kinds[0]
+
+        genre = payload.get("genre", "prose")
+        if genre not in ("prose", "epic"):
+            raise RequestError(f"Unknown genre: {genre}")
+        provenance = bool(payload.get("provenance", False))
+
+        macronizer = self.plain_text_macronizer if kind == "text" else self.macronizer
+        macronizer.reset_results()
+        hits = self.cache.hits if self.cache is not None else 0
+        start = time.perf_counter()
+
+        if kind == "text":
+            if not isinstance(payload["text"], str):
+                raise RequestError("'text' must be a string")
+            answer = {"output": macronize_plain_text(macronizer, payload["text"], genre, lowercase=macronizer.lowercase)}
+        elif kind == "conllu":
+            if not isinstance(payload["conllu"], str):
+                raise RequestError("'conllu' must be a string")
+            lines = payload["conllu"].splitlines()
+            answer = {"output": "".join(macronize_conllu(macronizer, lines, genre=genre, provenance=provenance))}
+        else:
+            if not isinstance(payload["sentences"], list) or not all(isinstance(sentence, list) for sentence in payload["sentences"]):
+                raise RequestError("'sentences' must be a list of lists of words")
+            sentences = [[token_from_json(word, i) for i, word in enumerate(sentence)] for sentence in payload["sentences"]]
+            answer = self.macronize_sentences(sentences, genre, provenance)
+
+        seconds = time.perf_counter() - start
+        if kind == "conllu":
+            sentence_count, tokens = conllu_counts(answer["output"])
+        elif kind == "text":
+            sentence_count, tokens = text_counts(payload["text"])
+        else:
+            sentence_count, tokens = len(sentences), sum(len(sentence) for sentence in sentences)
+
+        if self.cache is not None:
+            self.cache.put_many(self.cache.take_pending())
+
+        self.requests += 1
+        self.tokens += tokens
+        answer["stats"] = {
+            "sentences": sentence_count,
+            "tokens": tokens,
+            "seconds": round(seconds, 4),
+            "tokens_per_second": round(tokens / seconds, 1) if seconds else None,
+            "modules": {module: len(results) for module, results in macronizer.module_results.items() if results},
+            "still_ambiguous": len(macronizer.still_ambiguous),
+        }
+        if self.cache is not None:
+            answer["stats"]["cache_hits"] = self.cache.hits - hits
+        return answer
+
+    def handle_batch(self, payloads):
+        '''
+        Handles several requests in one go, macronizing every type only once across all of them.
+        Returns an answer dict or the exception raised per request.
+        '''
+        self.macronizer.cache = BatchMemo(self.cache)
+        answers = []
+        try:
+            for payload in payloads:
+                try:
+                    answer = self.handle(payload)
+                    answer["stats"]["batch_size"] = len(payloads)
+                    answers.append(answer)
+                except Exception as e: # fails this request only
+                    answers.append(e)
+        finally:
+            self.macronizer.cache = self.cache
+        return answers
+
+    def macronize_sentences(self, sentences, genre, provenance):
+        output, modules = [], []
+        for sentence in sentences:
+            results = {id(token): (result, used) for token, result, used in self.macronizer.macronize_sentence(sentence, genre=genre)}
+            output.append([results[id(token)][0] if id(token) in results else token.text for token in sentence])
+            modules.append([list(results[id(token)][1]) if id(token) in results else [] for token in sentence])
+        answer = {"output": output}
+        if provenance:
+            answer["modules"] = modules
+        return answer
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+
+class BatchMemo:
+    '''
+    Stands in for the Macronizer's cache during a batch (cf. Macronizer.macronize_word), so that a type
+    occurring in several requests goes through the modules once. Falls through to the result cache, if any.
+    '''
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.results = {}
+
+    def get(self, token, lemma, pos, morph):
+        key = cache_key(token, lemma, pos, morph)
+        if key in self.results:
+            return self.results[key]
+        cached = self.cache.get(token, lemma, pos, morph) if self.cache is not None else None
+        if cached is not None:
+            self.results[key] = cached
+        return cached
+
+    def add(self, token, lemma, pos, morph, result, modules):
+        self.results[cache_key(token, lemma, pos, morph)] = (result, tuple(modules))
+        if self.cache is not None:
+            self.cache.add(token, lemma, pos, morph, result, modules)
+
+
+#####################
+# --- Transport --- #
+#####################
+
+def read_payload(body):
+    return json.loads(body.decode("utf-8")) # json.JSONDecodeError and UnicodeDecodeError are ValueErrors
+
+
+def error_answer(e):
+    '''
+    (status, body) for an exception raised while handling a request.
+    '''
+    if isinstance(e, ValueError): # RequestError or unreadable JSON
+        return 400, {"error": str(e)}
+    logging.error("Failed on a request", exc_info=e)
+    return 500, {"error": f"{type(e).__name__}: {e}"}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "grc-macronizer"
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        self.send_json(200, self.server.service.health())
+
+    def do_POST(self):
+        if self.path != "/macronize":
+            self.send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            answer = self.server.service.handle(read_payload(self.rfile.read(length)))
+        except Exception as e:
+            self.send_json(*error_answer(e))
+            return
+        self.send_json(200, answer)
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix" # Unix sockets have no client address
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} {format % args}")
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    '''
+    HTTPServer over a Unix socket (HTTPServer.server_bind assumes a host and port).
+    '''
+    allow_reuse_address = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path) # left behind by an earlier server
+        server = UnixHTTPServer(socket_path, RequestHandler)
+    else:
+        server = HTTPServer((host, port), RequestHandler)
+    server.service = service
+    return server
+
+
+#########################
+# --- Micro-batching --- #
+#########################
+
+class MicroBatcher:
+    '''
+    Coalesces concurrent requests into batches for MacronizationService.handle_batch, which runs in a single worker thread
+    (the Macronizer is not thread-safe), so that the event loop keeps accepting requests while a batch is being macronized.
+    '''
+    def __init__(self, service, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+
+    async def submit(self, payload):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((payload, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            payloads = [payload for payload, _ in batch]
+            try:
+                answers = await loop.run_in_executor(self.executor, self.service.handle_batch, payloads)
+            except Exception as e:
+                answers = [e] * len(batch)
+            self.batches += 1
+
+            for (_, future), answer in zip(batch, answers):
+                if future.done(): # the caller has gone
+                    continue
+                if isinstance(answer, Exception):
+                    future.set_exception(answer)
+                else:
+                    future.set_result(answer)
+
+
+class AsyncFrontEnd:
+    '''
+    A minimal HTTP/1.1 server on asyncio streams (one request per connection), speaking the same protocol as RequestHandler.
+    '''
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle_connection(self, reader, writer):
+        try:
+            status, answer = await self.respond(reader)
+        except Exception as e: # a malformed request
+            status, answer = error_answer(ValueError(f"Malformed request: {e}"))
+
+        data = json.dumps(answer, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}.get(status, "Internal Server Error")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def respond(self, reader):
+        method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+        if method == "GET" and path == "/health":
+            return 200, {**self.batcher.service.health(), "batches": self.batcher.batches}
+        if method != "POST" or path != "/macronize":
+            return 404, {"error": f"Unknown path: {path}"}
+        try:
+            return 200, await self.batcher.submit(read_payload(body))
+        except Exception as e:
+            return error_answer(e)
+
+
+async def serve_batched(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    batcher = MicroBatcher(service, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    front_end = AsyncFrontEnd(batcher)
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(front_end.handle_connection, path=socket_path)
+    else:
+        server = await asyncio.start_server(front_end.handle_connection, host, port)
+
+    worker = asyncio.create_task(batcher.run())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        worker.cancel()
+        batcher.executor.shutdown(wait=True)
+
+
+##################
+# --- Client --- #
+##################
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(payload=None, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, timeout=None):
+    '''
+    Sends a request to a running server and returns the answer as a dict (GET /health if payload is None).
+    Raises RuntimeError with the server's message if the request was rejected.
+    '''
+    if socket_path:
+        connection = UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        if payload is None:
+            connection.request("GET", "/health")
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            connection.request("POST", "/macronize", body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        answer = json.loads(response.read().decode("utf-8"))
+    finally:
+        connection.close()
+
+    if response.status != 200:
+        raise RuntimeError(f"{response.status}: {answer.get('error')}")
+    return answer
+
+
+####################
+# --- Main ---  #
+####################
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="grc-macronize-server", description="Keep a warm macronizer running and answer requests over localhost HTTP or a Unix socket.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", metavar="PATH", help="listen on this Unix socket instead of a port")
+    parser.add_argument("--lowercase", action="store_true")
+    parser.add_argument("--no-hypotactic", action="store_true")
+    parser.add_argument("--cache", metavar="FILE", help="SQLite result cache shared with cli.py --cache")
+    parser.add_argument("--shared-db", metavar="DIR", help="map the lookup databases from DIR (publishing them there first if need be), to share them with other servers")
+    parser.add_argument("--batch", action="store_true", help="coalesce concurrent requests into batches (asyncio front end)")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE, help=f"with --batch, most requests per batch (default: {DEFAULT_MAX_BATCH_SIZE})")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS, help=f"with --batch, how long to wait for more requests after the first (default: {DEFAULT_MAX_WAIT_MS})")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING"], help="level of the diagnostics log (default: INFO)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.shared_db:
+        enable_shared_databases(args.shared_db)
+    service = MacronizationService(no_hypotactic=args.no_hypotactic, lowercase=args.lowercase, cache_path=args.cache)
+    logging.getLogger().setLevel(args.log_level) # class_macronizer logs every word at DEBUG
+
+    where = args.socket or f"http://{args.host}:{args.port}"
+
+    try:
+        if args.batch:
+            print(f"Databases loaded in {service.load_seconds:.1f} s; listening on {where} (batched)", file=sys.stderr)
+            asyncio.run(serve_batched(service, host=args.host, port=args.port, socket_path=args.socket, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms))
+        else:
+            server = make_server(service, host=args.host, port=args.port, socket_path=args.socket)
+            print(f"Databases loaded in {service.load_seconds:.1f} s; listening on {where}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+'''
+Read-only, memory-mapped copies of the lookup databases, shared by every process on a machine.
+
+Each process that imports class_macronizer normally builds its own dicts and sets from the LSJ and hypotactic indexes,
+the Wiktionary maps, proper_names.py, lsj_keys.pkl, the elision index and the Ionic stems of nominal_forms.py, and copy-on-write after a fork does not help for long, since merely touching
+a Python object updates its reference count and dirties its page. Here the databases are instead published once
+as flat hash tables in files, which every process maps read-only; the operating system then keeps a single copy
+in the page cache however many workers there are.
+
+    python -m grc_macronizer.shared_db /dev/shm/grc_macronizer      # publish (a no-op if already up to date)
+
+    GRC_MACRONIZER_SHARED_DB=/dev/shm/grc_macronizer python ...      # make class_macronizer use the tables
+
+cli.py and server.py do both with --shared-db DIR. The tables are stamped with the database fingerprint
+(see result_cache.py); stale or missing tables are ignored with a warning and the databases loaded as usual.
+
+A table answers `key in table`, `table[key]`, `table.get(key, default)`, `len(table)` and iteration over the keys,
+which is all class_macronizer and nominal_forms ask of the dicts and sets it replaces. Lookups cost a CRC32 of the key and usually
+a single probe; values are decoded on every lookup.
+
+What stays in every process is small, or not a table: the Bloom filters (bit arrays of about 100 KB in all, see bloom.py),
+custom_macron_map (a few hundred entries, scanned by custom_macronizer rather than looked up), the preverb trie
+(a handful of nodes; the LSJ stems it validates splits against are the shared lsj_keys_set) and the memos:
+the prefix split of every lemma met, and the reconstructed word forms, of which MEMO_SIZE are kept (see word_forms.py).
+
+File layout (native byte order): a 32-byte header (magic, number of entries, number of slots, value codec),
+the slots (uint32 entry number + 1, 0 if empty; linear probing), the entries (uint32 key offset, key length,
+value offset, value length) and the UTF-8 blob they point into.
+'''
+
+import argparse
+from array import array
+from importlib.resources import files
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+import pickle
+import struct
+import sys
+from zlib import crc32
+
+ENV_VAR = "GRC_MACRONIZER_SHARED_DB"
+MANIFEST_NAME = "manifest.json"
+SUFFIX = ".tbl"
+
+MAGIC = b"GRCTBL1\0"
+HEADER = struct.Struct("=8sIIB15x") # magic, entries, slots, codec
+CODECS = {0: "set", 1: "str", 2: "json"}
+
+
+def _load_pickle(name):
+    with files("grc_macronizer.db").joinpath(f"{name}.pkl").open("rb") as f:
+        return pickle.load(f)
+
+
+def _lsj_keys_set():
+    from grc_utils import only_bases
+    return {only_bases(key) for key in _load_pickle("lsj_keys")} # as in class_macronizer.py
+
+
+def _wiktionary_singletons():
+    from .indexes import load
+    return load("wiktionary_singletons")
+
+
+def _wiktionary_ambiguous():
+    from .indexes import load
+    return load("wiktionary_ambiguous")
+
+
+def _lsj():
+    from .indexes import load
+    return load("lsj")
+
+
+def _hypotactic():
+    from .indexes import load
+    return load("hypotactic")
+
+
+def _proper_names():
+    from .db.proper_names import proper_names
+    return proper_names
+
+
+def _elisions(name):
+    from .indexes import load_derived
+    return load_derived("elisions")[name]
+
+
+def _ionic_eta_stems():
+    from .nominal_forms import ionic_eta_stems
+    return ionic_eta_stems()
+
+
+# name: (loader, codec), for every database class_macronizer and nominal_forms look things up in
+TABLES = {
+    "lsj": (_lsj, "str"),
+    "proper_names": (_proper_names, "set"),
+    "wiktionary_ambiguous": (_wiktionary_ambiguous, "str"),
+    "wiktionary_singletons": (_wiktionary_singletons, "str"),
+    "lsj_keys_set": (_lsj_keys_set, "set"),
+    "hypotactic": (_hypotactic, "str"),
+    "elisions_databases": (lambda: _elisions("databases"), "str"),
+    "elisions_hypotactic": (lambda: _elisions("hypotactic"), "str"),
+    "ionic_eta_stems": (_ionic_eta_stems, "set"),
+}
+
+
+###################
+# --- Reading --- #
+###################
+
+class SharedTable:
+    '''
+    A read-only dict (or set) over a memory-mapped table file.
+    '''
+    def __init__(self, path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, slot_count, codec = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a shared table")
+        self.codec = CODECS[codec]
+        self._mask = slot_count - 1
+
+        view = memoryview(self._mm)
+        slots_end = HEADER.size + 4 * slot_count
+        self._slots = view[HEADER.size:slots_end].cast("I")
+        self._entries = view[slots_end:slots_end + 16 * self._count].cast("I")
+
+    def _find(self, key):
+        if not isinstance(key, str):
+            return -1
+        data = key.encode("utf-8")
+        mm, slots, entries = self._mm, self._slots, self._entries
+        i = crc32(data) & self._mask
+        while True:
+            entry = slots[i]
+            if not entry:
+                return -1
+            entry = 4 * (entry - 1)
+            offset, length = entries[entry], entries[entry + 1]
+            if length == len(data) and mm[offset:offset + length] == data:
+                return entry
+            i = (i + 1) & self._mask
+
+    def _value(self, entry):
+        offset, length = self._entries[entry + 2], self._entries[entry + 3]
+        value = self._mm[offset:offset + length].decode("utf-8")
+        return json.loads(value) if self.codec == "json" else value
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __getitem__(self, key):
+        entry = self._find(key)
+        if entry < 0 or self.codec == "set":
+            raise KeyError(key)
+        return self._value(entry)
+
+    def get(self, key, default=None):
+        entry = self._find(key)
+        if entry < 0 or self.codec == "set":
+            return default
+        return self._value(entry)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for entry in range(0, 4 * self._count, 4):
+            offset, length = self._entries[entry], self._entries[entry + 1]
+            yield self._mm[offset:offset + length].decode("utf-8")
+
+    def keys(self):
+        return iter(self)
+
+    def __repr__(self):
+        return f"SharedTable({str(self.path)!r}, {self._count} entries)"
+
+
+def shared_databases(directory=None):
+    '''
+    {name: SharedTable} for the tables published in `directory` (default: $GRC_MACRONIZER_SHARED_DB),
+    or None if there is no such directory or its tables are not those of the current databases.
+    '''
+    directory = directory or os.environ.get(ENV_VAR)
+    if not directory:
+        return None
+
+    if not is_up_to_date(directory):
+        logging.warning(f"No up-to-date shared databases in {directory}; loading the databases in this process")
+        return None
+
+    return {name: SharedTable(Path(directory) / f"{name}{SUFFIX}") for name in TABLES}
+
+
+def is_up_to_date(directory):
+    from .result_cache import database_fingerprint
+
+    try:
+        manifest = json.loads((Path(directory) / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return manifest.get("fingerprint") == database_fingerprint() and set(manifest.get("tables", ())) == set(TABLES)
+
+
+######################
+# --- Publishing --- #
+######################
+
+def write_table(path, collection, codec):
+    '''
+    Writes a dict (codec "str" or "json") or a set (codec "set") of strings as a table file, atomically.
+    '''
+    keys = [key for key in collection if isinstance(key, str)]
+    slot_count = 1
+    while slot_count < 2 * len(keys): # load factor at most 1/2
+        slot_count *= 2
+
+    blob = bytearray()
+    entries = array("I")
+    slots = array("I", bytes(4 * slot_count))
+    blob_start = HEADER.size + 4 * slot_count + 16 * len(keys)
+
+    for number, key in enumerate(keys):
+        data = key.encode("utf-8")
+        key_offset = blob_start + len(blob)
+        blob += data
+
+        if codec == "set":
+            value = b""
+        elif codec == "json":
+            value = json.dumps(collection[key], ensure_ascii=False).encode("utf-8")
+        else:
+            value = collection[key].encode("utf-8")
+        value_offset = blob_start + len(blob)
+        blob += value
+        entries.extend((key_offset, len(data), value_offset, len(value)))
+
+        i = crc32(data) & (slot_count - 1)
+        while slots[i]:
+            i = (i + 1) & (slot_count - 1)
+        slots[i] = number + 1
+
+    if blob_start + len(blob) >= 1 << 32:
+        raise ValueError(f"{path}: too large for 32-bit offsets")
+
+    codec_number = {name: number for number, name in CODECS.items()}[codec]
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    try:
+        with tmp_path.open("wb") as f:
+            f.write(HEADER.pack(MAGIC, len(keys), slot_count, codec_number))
+            f.write(slots.tobytes())
+            f.write(entries.tobytes())
+            f.write(blob)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+
+
+def publish(directory, force=False):
+    '''
+    Writes every table to `directory`, unless it already holds up-to-date tables. Returns True if anything was written.
+    '''
+    from .result_cache import database_fingerprint
+
+    directory = Path(directory)
+    if not force and is_up_to_date(directory):
+        return False
+
+    directory.mkdir(parents=True, exist_ok=True)
+    fingerprint = database_fingerprint()
+    for name, (loader, codec) in TABLES.items():
+        write_table(directory / f"{name}{SUFFIX}", loader(), codec)
+
+    # the manifest goes last, so that a crash leaves the directory unusable rather than inconsistent
+    manifest = {"fingerprint": fingerprint, "tables": list(TABLES)}
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return True
+
+
+def enable(directory):
+    '''
+    Publishes the tables if need be, and makes class_macronizer use them in this process and in the processes it starts
+    (as long as class_macronizer has not been imported yet).
+    '''
+    published = publish(directory)
+    os.environ[ENV_VAR] = str(Path(directory).resolve())
+    return published
+
+
+####################
+# --- Main ---  #
+####################
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="grc-macronize-shared-db", description="Publish the lookup databases as memory-mapped tables shared by all processes.")
+    parser.add_argument("directory", help="where to write the tables, preferably on tmpfs (e.g. /dev/shm/grc_macronizer)")
+    parser.add_argument("--force", action="store_true", help="write the tables even if they are up to date")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if publish(args.directory, force=args.force):
+        print(f"Published {len(TABLES)} tables to {args.directory}")
+    else:
+        print(f"The tables in {args.directory} are up to date")
+    print(f"Set {ENV_VAR}={Path(args.directory).resolve()} to use them")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+'''
+The accentuation rules as compiled into ACCENT_RULES (see accent_rules.py).
+'''
+import pytest
+
+from grc_macronizer.accent_rules import ACCENT_RULES, apply_accentuation_rules
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("τάχα^", "τά^χα^"),      # paroxytone with short ultima: penultima short
+    ("χώρα", "χώρα_"),        # paroxytone with long acute penultima: ultima long
+    ("σωτῆρα", "σωτῆρα^"),    # properispomenon: ultima short
+    ("ἄγαλμα", "ἄγαλμα^"),    # proparoxytone: ultima short
+    ("μά^χα", "μά^χα"),       # paroxytone, ultima not known to be short: nothing
+    ("μοῦσαι", "μοῦσαι"),     # the ultima is a diphthong, which is never marked
+    ("τίν'", "τίν'"),         # elided words are left alone
+])
+def test_rules(word, expected):
+    assert apply_accentuation_rules(word) == expected
+
+
+def test_table_covers_every_shape():
+    assert len(ACCENT_RULES) == 16
+    assert ACCENT_RULES[(False, False, False, False)] == ()
+    assert ACCENT_RULES[(True, True, True, False)] == ((-2, '^'), (-1, '_'))
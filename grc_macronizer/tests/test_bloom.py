@@ -0,0 +1,32 @@
+'''
+The Bloom filters that let the cascade skip the custom module, Wiktionary and hypotactic for most words (see bloom.py).
+'''
+from grc_macronizer.bloom import BloomFilter
+from grc_macronizer.indexes import FILTERS, build_filters
+
+
+def test_no_false_negatives():
+    keys = [f"λόγος{i}" for i in range(1000)]
+    bloom = BloomFilter.from_keys(keys)
+    assert all(key in bloom for key in keys)
+    assert sum(f"ἔργον{i}" in bloom for i in range(1000)) < 50 # about 1%
+
+
+def test_empty():
+    assert "λόγος" not in BloomFilter.from_keys([])
+
+
+def test_filters():
+    assert set(FILTERS) == {"custom", "wiktionary", "hypotactic"}
+
+    indexes = {
+        "wiktionary_singletons": {'ψεφαρα': 'ψεφα^ρα_'},
+        "wiktionary_ambiguous": {'κάλλιστος': 'κάλλιστος', 'κάλλιστος|Nom|Sing|Masc||||': 'κά^λλιστος'},
+        "hypotactic": {'ἄρης': 'ἄ^ρης'},
+    }
+    filters = build_filters(indexes)
+    wiktionary = filters["wiktionary"]
+    assert 'ψεφαρα' in wiktionary
+    assert 'κάλλιστος' in wiktionary
+    assert wiktionary.count == 2 # the bare forms, not the feature keys
+    assert 'ἄρης' in filters["hypotactic"]
@@ -0,0 +1,50 @@
+'''
+The wrong-case-ending recursion: the lemma form of a token from its ending, and the markup of its stem back on the token
+(see case_endings.py).
+'''
+import pytest
+
+from grc_macronizer.case_endings import case_ending, declension, lemma_form, nominative_morph, restore
+from grc_macronizer.class_token import Morph
+
+
+@pytest.mark.parametrize("token, lemma, pos, morph, form, macronized_form, expected", [
+    # 1D acc sing: the vowel of the ending is kept (not χώ_ρν)
+    ("χώραν", "χώρα", "NOUN", "Case=Acc|Gender=Fem|Number=Sing", "χώρα", "χώ_ρα_", "χώ_ραν"),
+    # 1D gen sing
+    ("οἰκίας", "οἰκία", "NOUN", "Case=Gen|Gender=Fem|Number=Sing", "οἰκία", "οἰκί_α_", "οἰκί_ας"),
+    ("καλῆς", "καλή", "ADJ", "Case=Gen|Gender=Fem|Number=Sing", "καλή", "κα^λή", "κα^λῆς"),
+    # 2D, including the oxytone acc plur
+    ("στρατηγόν", "στρατηγός", "NOUN", "Case=Acc|Gender=Masc|Number=Sing", "στρατηγός", "στρα^τηγός", "στρα^τηγόν"),
+    ("ἀδελφούς", "ἀδελφός", "NOUN", "Case=Acc|Gender=Masc|Number=Plur", "ἀδελφός", "ἀ^δελφός", "ἀ^δελφούς"),
+    # 3D acc sing of ι- and υ-stems
+    ("πόλιν", "πόλις", "NOUN", "Case=Acc|Gender=Fem|Number=Sing", "πόλις", "πόλι^ς", "πόλι^ν"),
+    ("ἰχθύν", "ἰχθύς", "NOUN", "Case=Acc|Gender=Masc|Number=Sing", "ἰχθύς", "ἰχθύ_ς", "ἰχθύ_ν"),
+])
+def test_recursion(token, lemma, pos, morph, form, macronized_form, expected):
+    ending = case_ending(token, lemma, pos, Morph(morph).signature())
+    assert ending is not None
+    assert lemma_form(ending, token, lemma) == form
+    assert restore(ending, token, lemma, macronized_form) == expected
+
+
+@pytest.mark.parametrize("token, lemma, pos, morph", [
+    ("πόλεως", "πόλις", "NOUN", "Case=Gen|Gender=Fem|Number=Sing"),    # no paradigm for it
+    ("χώραν", "χώρα", "ADJ", "Case=Acc|Gender=Fem|Number=Sing"),       # the 1D acc sing is for nouns only
+    ("στρατηγόν", "στρατηγός", "NOUN", "Case=Nom|Gender=Masc|Number=Sing"), # the case has to agree
+])
+def test_no_ending(token, lemma, pos, morph):
+    assert case_ending(token, lemma, pos, Morph(morph).signature()) is None
+
+
+def test_declension():
+    assert declension("χώρα", Morph("Gender=Fem").signature()) == "1"
+    assert declension("στρατηγός", Morph("Gender=Masc").signature()) == "2"
+    assert declension("πόλις", Morph("Gender=Fem").signature()) == "3"
+    assert declension("ποιητής", Morph("Gender=Masc").signature()) is None
+
+
+def test_nominative_morph():
+    morph = nominative_morph(Morph("Case=Acc|Gender=Fem|Number=Plur"))
+    assert str(morph) == "Case=Nom|Gender=Fem|Number=Sing"
+    assert nominative_morph(Morph("Case=Gen|Gender=Fem|Number=Sing")) is morph
@@ -0,0 +1,107 @@
+'''
+Resuming a corpus run from its manifest (see cli.py).
+'''
+import json
+from pathlib import Path
+
+import pytest
+
+from grc_macronizer import cli
+from grc_macronizer.cli import append_to_manifest, is_completed, load_manifest, output_path_for, shard_fingerprint
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    input_dir = tmp_path / "input"
+    (input_dir / "anabasis").mkdir(parents=True)
+    (input_dir / "anabasis" / "book1.conllu").write_text("1\tΔαρείου\tΔαρεῖος\tPROPN\t_\t_\t_\t_\t_\t_\n\n", encoding="utf-8")
+    (input_dir / "anabasis" / "book2.tsv").write_text("1\tΚῦρος\tΚῦρος\tPROPN\t_\t_\t_\t_\t_\t_\n", encoding="utf-8")
+    return input_dir, tmp_path / "output"
+
+
+@pytest.fixture
+def macronized(monkeypatch):
+    '''
+    Stands in for the workers, which would load the whole Macronizer; records which shards were macronized.
+    '''
+    shards = []
+
+    def macronize_shard(job):
+        key, shard, output_path = job
+        shards.append(key)
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(output_path).write_text("macronized\n", encoding="utf-8")
+        return {"shard": key, "path": shard, "output": output_path, "sentences": 1, "tokens": 1, "seconds": 0}
+
+    monkeypatch.setattr(cli, "_init_worker", lambda options: None)
+    monkeypatch.setattr(cli, "_macronize_shard", macronize_shard)
+    monkeypatch.setattr(cli, "fingerprint", lambda no_hypotactic=False: "rules")
+    return shards
+
+
+def test_output_path_for(tmp_path):
+    shard = tmp_path / "input" / "anabasis" / "book1.conllu.ud"
+    assert output_path_for(shard, tmp_path / "input", tmp_path / "output") == tmp_path / "output" / "anabasis" / "book1.txt"
+    assert output_path_for(shard, tmp_path / "input", tmp_path / "output", suffix=".conllu") == tmp_path / "output" / "anabasis" / "book1.conllu"
+
+
+def test_truncated_manifest_line_is_ignored(tmp_path):
+    manifest_path = tmp_path / "manifest.jsonl"
+    append_to_manifest(manifest_path, {"shard": "a.tsv", "size": 1})
+    with manifest_path.open("a", encoding="utf-8") as f:
+        f.write('{"shard": "b.tsv", "si') # crashed mid-write
+    assert load_manifest(manifest_path) == {"a.tsv": {"shard": "a.tsv", "size": 1}}
+    assert load_manifest(tmp_path / "missing.jsonl") == {}
+
+
+def test_is_completed(tmp_path):
+    shard = tmp_path / "a.tsv"
+    shard.write_text("1\tλόγος\n", encoding="utf-8")
+    output_path = tmp_path / "a.txt"
+    settings = {"genre": "prose", "fingerprint": "rules"}
+    entry = {"shard": "a.tsv", **shard_fingerprint(shard), "settings": settings}
+    assert not is_completed(entry, shard, output_path, settings) # no output yet
+    output_path.write_text("λό^γος\n", encoding="utf-8")
+    assert is_completed(entry, shard, output_path, settings)
+    assert not is_completed(None, shard, output_path, settings)
+    assert not is_completed(entry, shard, output_path, {"genre": "epic", "fingerprint": "rules"})
+    assert not is_completed({key: value for key, value in entry.items() if key != "settings"}, shard, output_path, settings)
+    shard.write_text("1\tλόγος\n2\tἔργον\n", encoding="utf-8") # changed since
+    assert not is_completed(entry, shard, output_path, settings)
+
+
+def test_resume(corpus, macronized):
+    input_dir, output_dir = corpus
+    assert cli.main([str(input_dir), str(output_dir), "--workers", "1"]) == 0
+    assert sorted(macronized) == ["anabasis/book1.conllu", "anabasis/book2.tsv"]
+    assert (output_dir / "anabasis" / "book1.txt").read_text(encoding="utf-8") == "macronized\n"
+
+    # the second run finds both shards in the manifest
+    macronized.clear()
+    assert cli.main([str(input_dir), str(output_dir), "--workers", "1"]) == 0
+    assert macronized == []
+
+    # a lost output is macronized again
+    (output_dir / "anabasis" / "book2.txt").unlink()
+    assert cli.main([str(input_dir), str(output_dir), "--workers", "1"]) == 0
+    assert macronized == ["anabasis/book2.tsv"]
+
+
+def test_settings_mismatch(corpus, macronized, monkeypatch):
+    input_dir, output_dir = corpus
+    cli.main([str(input_dir), str(output_dir), "--workers", "1"])
+    entries = [json.loads(line) for line in (output_dir / cli.MANIFEST_NAME).read_text(encoding="utf-8").splitlines()]
+    assert all(entry["settings"]["genre"] == "prose" and entry["settings"]["fingerprint"] == "rules" for entry in entries)
+
+    # other options redo every shard, and are then remembered
+    macronized.clear()
+    cli.main([str(input_dir), str(output_dir), "--workers", "1", "--genre", "epic"])
+    assert len(macronized) == 2
+    macronized.clear()
+    cli.main([str(input_dir), str(output_dir), "--workers", "1", "--genre", "epic"])
+    assert macronized == []
+
+    # and so do other databases or rules
+    monkeypatch.setattr(cli, "fingerprint", lambda no_hypotactic=False: "other rules")
+    cli.main([str(input_dir), str(output_dir), "--workers", "1", "--genre", "epic"])
+    assert len(macronized) == 2
@@ -0,0 +1,196 @@
+'''
+Streaming CoNLL-U out of archives, sentence by sentence (see conllu.py).
+'''
+import io
+import subprocess
+import tarfile
+import zipfile
+
+import pytest
+
+from grc_macronizer import conllu
+from grc_macronizer.class_token import Token
+from grc_macronizer.conllu import _BoundedReader, _seven_zip_listing, archive_members, conllu_blocks, conllu_lines, macronize_conllu, read_sentences, sentences_from_archive, token_rows
+
+
+def row(token_id, form, lemma, upos, feats="_", misc="_"):
+    return "\t".join((str(token_id), form, lemma, upos, "_", feats, "_", "_", "_", misc))
+
+
+SENTENCE_1 = [
+    "# sent_id = 1",
+    row(1, "Δαρείου", "Δαρεῖος", "PROPN", "Case=Gen|Gender=Masc|Number=Sing"),
+    row(2, "καὶ", "καί", "CCONJ"),
+    row(3, "Παρυσάτιδος", "Παρύσατις", "PROPN", "Case=Gen|Gender=Fem|Number=Sing"),
+    row(4, ".", ".", "PUNCT"),
+]
+SENTENCE_2 = [
+    row(1, "γίγνονται", "γίγνομαι", "VERB", "Mood=Ind|Number=Plur|Person=3|Tense=Pres|VerbForm=Fin|Voice=Mid"),
+    row(2, "παῖδες", "παῖς", "NOUN", "Case=Nom|Gender=Masc|Number=Plur"),
+]
+CONLLU = "\n".join(SENTENCE_1 + [""] + SENTENCE_2 + [""]) + "\n"
+
+
+def test_blocks_split_on_blank_lines():
+    assert list(conllu_blocks(io.StringIO(CONLLU))) == [SENTENCE_1, SENTENCE_2]
+
+
+def test_blocks_split_on_id_reset():
+    # the merged TSV files have had their blank lines stripped
+    assert list(conllu_blocks(SENTENCE_1 + SENTENCE_2)) == [SENTENCE_1, SENTENCE_2]
+
+
+def test_blocks_split_on_comment_after_tokens():
+    assert list(conllu_blocks(SENTENCE_2 + SENTENCE_1)) == [SENTENCE_2, SENTENCE_1]
+
+
+def test_read_sentences():
+    lines = SENTENCE_1[:2] + ["1-2\tκἀγώ\t_\t_\t_\t_\t_\t_\t_\t_", "1.1\tἐγώ\tἐγώ\tPRON\t_\t_\t_\t_\t_\t_"] + SENTENCE_1[2:]
+    sentence, = read_sentences(lines)
+    # multi-word tokens, empty nodes and words without vowels are skipped
+    assert [token.text for token in sentence] == ["Δαρείου", "καὶ", "Παρυσάτιδος"]
+    assert [token.token_id for token in sentence] == [1, 2, 3]
+    assert sentence[0].lemma_ == "Δαρεῖος"
+    assert sentence[0].pos_ == "PROPN"
+    assert sentence[0].morph.get("Case") == "Gen"
+
+
+def test_token_rows():
+    assert [(i, token.text) for i, token in token_rows(SENTENCE_1)] == [(1, "Δαρείου"), (2, "καὶ"), (3, "Παρυσάτιδος")]
+
+
+class FakeMacronizer:
+    '''
+    Marks the first ε of every word short, and says it was the custom module unless there is none.
+    '''
+    def macronize_sentence(self, sentence, genre="prose"):
+        for token in sentence:
+            if token.text == "καὶ": # never reaches the modules
+                continue
+            if "ε" in token.text:
+                yield token, token.text.replace("ε", "ε^", 1), ("custom",)
+            else:
+                yield token, token.text, ()
+
+
+@pytest.mark.parametrize("provenance", [False, True])
+def test_macronize_conllu(provenance):
+    lines = SENTENCE_1[:3] + [row(3, "Παρυσάτιδος", "Παρύσατις", "PROPN", "Case=Gen", misc="SpaceAfter=No")] + SENTENCE_1[4:] + SENTENCE_2
+    output = list(macronize_conllu(FakeMacronizer(), lines, provenance=provenance))
+    by = "|MacronizedBy=custom" if provenance else ""
+    assert output == [
+        "# sent_id = 1\n",
+        row(1, "Δαρείου", "Δαρεῖος", "PROPN", "Case=Gen|Gender=Masc|Number=Sing", misc="Macronized=Δαρε^ίου" + by) + "\n",
+        row(2, "καὶ", "καί", "CCONJ") + "\n",
+        row(3, "Παρυσάτιδος", "Παρύσατις", "PROPN", "Case=Gen", misc="SpaceAfter=No|Macronized=Παρυσάτιδος") + "\n",
+        row(4, ".", ".", "PUNCT") + "\n",
+        "\n",
+        row(1, "γίγνονται", "γίγνομαι", "VERB", "Mood=Ind|Number=Plur|Person=3|Tense=Pres|VerbForm=Fin|Voice=Mid", misc="Macronized=γίγνονται") + "\n",
+        row(2, "παῖδες", "παῖς", "NOUN", "Case=Nom|Gender=Masc|Number=Plur", misc="Macronized=παῖδε^ς" + by) + "\n",
+        "\n",
+    ]
+
+
+def test_conllu_lines():
+    sentences = [[Token("Κῦρος", "Κῦρος", "PROPN", "Case=Nom|Number=Sing", 1)]]
+    lines = list(conllu_lines(sentences))
+    assert lines == [row(1, "Κῦρος", "Κῦρος", "PROPN", "Case=Nom|Number=Sing"), ""]
+    assert [token.morph.get("Case") for sentence in read_sentences(lines) for token in sentence] == ["Nom"]
+
+
+@pytest.fixture
+def zip_archive(tmp_path):
+    path = tmp_path / "corpus.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("texts/a.conllu", CONLLU)
+        archive.writestr("texts/README.md", "not a treebank")
+        archive.writestr("texts/b.conllu", "\n".join(SENTENCE_2) + "\n")
+    return path
+
+
+@pytest.fixture
+def tar_archive(tmp_path):
+    path = tmp_path / "corpus.tar.gz"
+    with tarfile.open(path, "w:gz") as archive:
+        for name, text in (("texts/a.conllu", CONLLU), ("texts/README.md", "not a treebank"), ("texts/b.conllu", "\n".join(SENTENCE_2) + "\n")):
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+@pytest.mark.parametrize("archive", ["zip_archive", "tar_archive"])
+def test_archive_members(archive, request):
+    path = request.getfixturevalue(archive)
+    members = [(name, list(lines)) for name, lines in archive_members(path)]
+    assert [name for name, _ in members] == ["texts/a.conllu", "texts/b.conllu"]
+    assert "".join(members[0][1]) == CONLLU
+
+
+@pytest.mark.parametrize("archive", ["zip_archive", "tar_archive"])
+def test_sentences_from_archive(archive, request):
+    sentences = list(sentences_from_archive(request.getfixturevalue(archive)))
+    assert [[token.text for token in sentence] for sentence in sentences] == [
+        ["Δαρείου", "καὶ", "Παρυσάτιδος"],
+        ["γίγνονται", "παῖδες"],
+        ["γίγνονται", "παῖδες"],
+    ]
+
+
+def test_unsupported_archive(tmp_path):
+    with pytest.raises(ValueError):
+        list(archive_members(tmp_path / "corpus.rar"))
+
+
+def test_bounded_reader():
+    # `7z x -so` writes the members back to back
+    pipe = io.BytesIO("αβγ".encode("utf-8") + b"rest")
+    first = _BoundedReader(pipe, len("αβγ".encode("utf-8")))
+    assert io.BufferedReader(first).read().decode("utf-8") == "αβγ"
+    second = _BoundedReader(pipe, 2)
+    second.drain() # a member that is not read is skipped
+    assert pipe.read() == b"st"
+
+
+def test_bounded_reader_truncated():
+    reader = _BoundedReader(io.BytesIO(b"abc"), 10)
+    with pytest.raises(EOFError):
+        reader.drain()
+
+
+def test_seven_zip_listing(monkeypatch):
+    listing = "\n".join([
+        "Path = texts", "Folder = +", "Size = 0", "Attributes = D", "",
+        "Path = texts/a.conllu", "Folder = -", "Size = 120", "Attributes = A", "",
+        "Path = texts/b.conllu", "Folder = -", "Size = 37", "Attributes = A",
+    ])
+
+    def run(args, **kwargs):
+        assert args[1:4] == ["l", "-slt", "-ba"]
+        return subprocess.CompletedProcess(args, 0, stdout=listing)
+
+    monkeypatch.setattr(conllu.subprocess, "run", run)
+    assert _seven_zip_listing("7z", "corpus.7z") == [("texts/a.conllu", 120), ("texts/b.conllu", 37)]
+
+
+def test_seven_zip_members(monkeypatch):
+    members = {"texts/a.conllu": "1\tΚῦρος\n\n", "texts/notes.txt": "skipped\n", "texts/b.conllu": "1\tδύο\n\n"}
+    output = io.BytesIO(b"".join(text.encode("utf-8") for text in members.values()))
+
+    class Process:
+        stdout = output
+        def wait(self):
+            return 0
+
+    monkeypatch.setattr(conllu.shutil, "which", lambda binary: f"/usr/bin/{binary}")
+    monkeypatch.setattr(conllu, "_seven_zip_listing", lambda binary, path: [(name, len(text.encode("utf-8"))) for name, text in members.items()])
+    monkeypatch.setattr(conllu.subprocess, "Popen", lambda args, **kwargs: Process())
+    read = {name: "".join(lines) for name, lines in archive_members("corpus.7z")}
+    assert read == {"texts/a.conllu": members["texts/a.conllu"], "texts/b.conllu": members["texts/b.conllu"]}
+
+
+def test_seven_zip_needs_a_binary(monkeypatch):
+    monkeypatch.setattr(conllu.shutil, "which", lambda binary: None)
+    with pytest.raises(RuntimeError):
+        list(archive_members("corpus.7z"))
@@ -0,0 +1,40 @@
+'''
+The index of the stems of elided words (see elision.py).
+'''
+import pytest
+
+from grc_macronizer.elision import compile_index, elided_stem
+
+
+@pytest.mark.parametrize("form, expected", [
+    ("τάχα", "τάχ"),
+    ("ὧδε", "ὧδ"),
+    ("λέγει", None),      # the ι of a diphthong is not elided
+    ("βούλομαι", None),
+    ("πόλις", None),
+    ("ὁ", None),
+])
+def test_elided_stem(form, expected):
+    assert elided_stem(form) == expected
+
+
+def test_compile_index():
+    index = compile_index(['τά^χα^', 'τά^χι^στα^', 'παρά^', 'πα^ρά', 'λέγει', 'βούλομαι'])
+    # the marks of the final vowel are left out, so παρά^ and πα^ρά agree on their stem
+    assert index == {'τάχ': 'τά^χ', 'τάχιστ': 'τά^χι^στ', 'παρ': 'πα^ρ'}
+
+
+def test_stems_without_marks_are_not_indexed():
+    index = compile_index(['ἀ^γάλμα^τα^', 'τίνε^', 'οὔτι^να^', '', 'ὧδε'])
+    assert index == {'ἀγάλματ': 'ἀ^γάλμα^τ', 'οὔτιν': 'οὔτι^ν'}
+
+
+def test_contradicting_marks_are_left_out():
+    assert compile_index(['ἄ^γα^θα^', 'ἄ^γα_θε^']) == {'ἄγαθ': 'ἄ^γαθ'}
+
+
+def test_stems_that_contradict_the_reference_are_left_out():
+    reference = ['φύ^λα^ξ', 'τά^χα^', 'ἀ^γα^θός']
+    index = compile_index(['φύ^λα_κα^', 'τά^χα^', 'ἀ^γα_θά', 'ἐ^λύ_σα^το^'], reference=reference)
+    # φύλακ' and ἀγαθ' contradict φύλαξ and ἀγαθός; ἐλύσατ' begins no entry
+    assert index == {'τάχ': 'τά^χ', 'ἐλύσατ': 'ἐ^λύ_σα^τ'}
@@ -0,0 +1,110 @@
+'''
+Re-macronizing only the types a database update can affect (see incremental.py).
+'''
+import pickle
+
+import pytest
+
+from grc_macronizer.class_token import Morph
+from grc_macronizer.incremental import AffectedIndex, changed_keys, diff_databases, load_database, patch_conllu, update_cache
+from grc_macronizer.result_cache import ResultCache, cache_key
+
+
+def test_changed_keys():
+    old = {'χώρα': 'χώ_ρα_', 'λόγος': 'λό^γος', 'τάχα': 'τά^χα^'}
+    new = {'χώρα': 'χώ_ρα^', 'λόγος': 'λό^γος', 'ἄγαλμα': 'ἄ^γαλμα^'}
+    assert changed_keys(old, new) == {'χώρα', 'τάχα', 'ἄγαλμα'}
+    assert changed_keys({'Ἄρης', 'Κῦρος'}, {'Κῦρος', 'Σπάρτη'}) == {'Ἄρης', 'Σπάρτη'}
+
+
+def test_diff_databases(tmp_path):
+    old_db, new_db = tmp_path / "old", tmp_path / "new"
+    for directory, custom, hypotactic in ((old_db, {'τάχα': 'τά^χα^'}, {'ἄρης': 'ἄ^ρης'}), (new_db, {'τάχα': 'τά^χα^', 'ὧδε': 'ὧδε'}, {'ἄρης': 'ἄ_ρης'})):
+        directory.mkdir()
+        (directory / "custom.py").write_text(f"custom_macron_map = {custom!r}\n", encoding="utf-8")
+        (directory / "proper_names.py").write_text("proper_names = {'Κῦρος'}\n", encoding="utf-8") # unchanged
+        with (directory / "hypotactic.pkl").open("wb") as f:
+            pickle.dump(hypotactic, f)
+    (new_db / "crawl_lsj.py").write_text("raise RuntimeError('not a database')\n", encoding="utf-8") # never run
+    (new_db / "lsj_index.pkl").write_bytes(b"built from lsj.py") # nor read
+    assert diff_databases(old_db, new_db) == {'ὧδε', 'ἄρης'}
+
+
+def test_load_database(tmp_path):
+    (tmp_path / "proper_names.py").write_text("from grc_utils import normalize_word\nproper_names = {'Κῦρος'}\nEXTRA = {'x'}\n", encoding="utf-8")
+    assert load_database(tmp_path / "proper_names.py") == {"proper_names": {'Κῦρος'}} # the variable, by name
+    (tmp_path / "crawl_lsj.py").write_text("raise RuntimeError('not a database')\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_database(tmp_path / "crawl_lsj.py")
+
+
+@pytest.mark.parametrize("form, lemma, expected", [
+    ("χώραν", "χώρα", True),          # the lemma
+    ("Χώρα", "χώρα", True),           # the form, folded
+    ("χώρας", "χώρα", True),          # another ending of the same stem
+    ("ἀποχωρεῖ", "ἀποχωρέω", True),   # the lemma without its preverb
+    ("ἀντιπαραχωρεῖ", "ἀντιπαραχωρέω", True), # and without stacked ones
+    ("λόγον", "λόγος", False),
+    ("πόλιν", "πόλις", False),
+])
+def test_affected_index(form, lemma, expected):
+    index = AffectedIndex({'χώ_ρα_', 'χωρέω'})
+    assert index.affects(form, lemma) is expected
+
+
+def test_empty_index():
+    assert not AffectedIndex(set())
+    assert not AffectedIndex({''})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResultCache(tmp_path / "results.sqlite", "rules.old")
+    for form, lemma, result in (("χώραν", "χώρα", "χώ_ραν"), ("λόγον", "λόγος", "λό^γον")):
+        cache.add(form, lemma, "NOUN", Morph("Case=Acc"), result, ["lsj"])
+    cache.put_many(cache.take_pending())
+    cache.close()
+    return tmp_path / "results.sqlite"
+
+
+class FakeMacronizer:
+    def __init__(self):
+        self.words = []
+
+    def macronize_word(self, form, lemma, pos, morph):
+        self.words.append(form)
+        return form.replace("χώ", "χώ^"), ("custom",)
+
+
+def test_update_cache(cache):
+    results = ResultCache(cache, "rules.new", keep_stale=True)
+    assert not results.valid
+    assert len(results.rows().fetchall()) == 2 # the stale results are kept for the update
+    macronizer = FakeMacronizer()
+    affected, changed = update_cache(results, macronizer, AffectedIndex({'χώρα'}))
+    assert macronizer.words == ["χώραν"]
+    assert affected == 1
+    assert changed == {cache_key("χώραν", "χώρα", "NOUN", Morph("Case=Acc")): "χώ^ραν"}
+
+    results.restamp("rules.new")
+    results.close()
+    results = ResultCache(cache, "rules.new", readonly=True)
+    assert results.get("χώραν", "χώρα", "NOUN", Morph("Case=Acc")) == ("χώ^ραν", ("custom",))
+    assert results.get("λόγον", "λόγος", "NOUN", Morph("Case=Acc")) == ("λό^γον", ("lsj",))
+
+
+def test_patch_conllu(tmp_path):
+    path = tmp_path / "book1.conllu"
+    path.write_text(
+        "# sent_id = 1\n"
+        "1\tχώραν\tχώρα\tNOUN\t_\tCase=Acc\t_\t_\t_\tSpaceAfter=No|Macronized=χώ_ραν|MacronizedBy=lsj\n"
+        "2\tλόγον\tλόγος\tNOUN\t_\tCase=Acc\t_\t_\t_\tMacronized=λό^γον\n"
+        "\n",
+        encoding="utf-8",
+    )
+    changed = {cache_key("χώραν", "χώρα", "NOUN", Morph("Case=Acc")): "χώ^ραν"}
+    assert patch_conllu(path, changed) == 1
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines[1].endswith("\tSpaceAfter=No|Macronized=χώ^ραν|MacronizedBy=lsj")
+    assert lines[2].endswith("\tMacronized=λό^γον")
+    assert patch_conllu(path, {}) == 0
@@ -0,0 +1,116 @@
+'''
+Cleaning the database entries once, when the indexes are built (see indexes.py).
+'''
+import json
+import pickle
+
+import pytest
+
+from grc_macronizer.indexes import LFS_POINTER, clean_hypotactic, clean_lsj, clean_wiktionary_singletons, derived_hash, DERIVED, is_lfs_pointer_file, load, load_derived, MANIFEST_NAME, source_hash
+from grc_macronizer.shared_db import SharedTable, write_table
+
+
+def test_clean_lsj():
+    index, dropped = clean_lsj({
+        'ἄγαλμα': 'ἄ^γαλμα^',
+        'χώρα': 'χώ_ρα_',
+        'αἰδώς': 'αἰ_δώς',     # the markup of a diphthong is taken off
+        'καλός': 'κα^λόν',     # an accent bug: not the word of its key
+        'τοῦ': None,
+    })
+    assert index == {'ἄγαλμα': 'ἄ^γαλμα^', 'χώρα': 'χώ_ρα_', 'αἰδώς': 'αἰδώς'}
+    assert dropped == {'καλός': 'κα^λόν', 'τοῦ': None}
+
+
+def test_clean_hypotactic():
+    index, dropped = clean_hypotactic({
+        'ἄρης': 'ἄ^ρης',
+        'Ἄρης': 'Ἄ^ρης',       # proper names keep their capital
+        'μοῦσαι': 'μοῦ_σαι_',
+        'καλός': 'κα^λόν',     # could never be merged
+        'τίς': '',
+    })
+    assert index == {'ἄρης': 'ἄ^ρης', 'Ἄρης': 'Ἄ^ρης', 'μοῦσαι': 'μοῦσαι'}
+    assert dropped == {'καλός': 'κα^λόν', 'τίς': ''}
+
+
+def test_clean_wiktionary_singletons():
+    index, dropped = clean_wiktionary_singletons({
+        'ψεφαρα': [['ψεφᾰρᾱ']],
+        'κάλλιστος': [['κᾰ́λλιστος']],
+        'καλός': [['κᾰλόν']],      # not the word of its key
+    })
+    assert index == {'ψεφαρα': 'ψεφα^ρα_', 'κάλλιστος': 'κά^λλιστος'}
+    assert dropped == {'καλός': 'κᾰλόν'}
+
+
+def test_singletons_table(tmp_path):
+    index, _ = clean_wiktionary_singletons({'ψεφαρα': [['ψεφᾰρᾱ']], 'κάλλιστος': [['κᾰ́λλιστος']]})
+    path = tmp_path / "wiktionary_singletons_index.tbl"
+    write_table(path, index, "str")
+    table = SharedTable(path)
+    assert len(table) == 2
+    assert table['ψεφαρα'] == 'ψεφα^ρα_'
+    assert table.get('κάλλιστος') == 'κά^λλιστος'
+    assert 'καλός' not in table
+    assert table.get('καλός') is None
+
+
+def test_is_lfs_pointer_file(tmp_path):
+    pointer = tmp_path / "lsj.py"
+    pointer.write_bytes(LFS_POINTER + b"\noid sha256:0\nsize 0\n")
+    source = tmp_path / "custom.py"
+    source.write_text("custom_macron_map = {}\n", encoding="utf-8")
+    assert is_lfs_pointer_file(pointer)
+    assert not is_lfs_pointer_file(source)
+
+
+@pytest.fixture
+def db_dir(tmp_path):
+    (tmp_path / "lsj.py").write_text("lsj = {'ἄγαλμα': 'ἄ^γαλμα^'}\n", encoding="utf-8")
+    with (tmp_path / "lsj_index.pkl").open("wb") as f:
+        pickle.dump({'ἄγαλμα': 'ἄ^γαλμα^'}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    manifest = {"pickle_protocol": pickle.HIGHEST_PROTOCOL, "lsj": source_hash("lsj", tmp_path)}
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+    return tmp_path
+
+
+def test_load(db_dir):
+    assert load("lsj", db_dir) == {'ἄγαλμα': 'ἄ^γαλμα^'}
+
+
+@pytest.mark.parametrize("change", [
+    lambda db_dir: (db_dir / "lsj_index.pkl").unlink(),                                   # never built
+    lambda db_dir: (db_dir / MANIFEST_NAME).unlink(),
+    lambda db_dir: (db_dir / "lsj.py").write_text("lsj = {}\n", encoding="utf-8"),        # refreshed since
+    lambda db_dir: (db_dir / MANIFEST_NAME).write_text(json.dumps({                        # by a newer Python
+        "pickle_protocol": pickle.HIGHEST_PROTOCOL + 1, "lsj": source_hash("lsj", db_dir)}), encoding="utf-8"),
+    lambda db_dir: (db_dir / MANIFEST_NAME).write_text(json.dumps({                        # by an older version of this module
+        "lsj": source_hash("lsj", db_dir)}), encoding="utf-8"),
+])
+def test_load_out_of_date(db_dir, change):
+    change(db_dir)
+    with pytest.raises(RuntimeError):
+        load("lsj", db_dir)
+
+
+def test_load_lfs_pointer(tmp_path):
+    (tmp_path / "wiktionary_singletons.py").write_bytes(LFS_POINTER + b"\noid sha256:0\nsize 0\n")
+    assert load("wiktionary_singletons", tmp_path) == {}
+
+
+def test_load_derived(tmp_path):
+    for source in DERIVED["filters"][1]:
+        (tmp_path / source).write_text(f"# {source}\n", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        load_derived("filters", tmp_path) # never built
+
+    with (tmp_path / "filters.pkl").open("wb") as f:
+        pickle.dump({"custom": None}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    manifest = {"pickle_protocol": pickle.HIGHEST_PROTOCOL, "filters": derived_hash("filters", tmp_path)}
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+    assert load_derived("filters", tmp_path) == {"custom": None}
+
+    (tmp_path / "hypotactic.pkl").write_text("# fetched with git lfs pull\n", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        load_derived("filters", tmp_path)
@@ -0,0 +1,68 @@
+'''
+Words through the whole cascade of a Macronizer without morphology, as plain text is macronized (see plain_text.py).
+'''
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def macronizer(tmp_path_factory):
+    # class_macronizer writes its diagnostics to the working directory as soon as it is imported
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("macronizer"))
+    try:
+        from grc_macronizer.class_macronizer import Macronizer
+        yield Macronizer(make_prints=False, morphology=False)
+    finally:
+        os.chdir(cwd)
+
+
+def macronize(macronizer, word):
+    from grc_macronizer.plain_text import NO_MORPH
+    return macronizer.macronize_word(word, word, "X", NO_MORPH)
+
+
+@pytest.mark.parametrize("word, expected, module", [
+    ("Σπονδὰς", "Σπονδὰ_ς", "hypotactic"),    # the case-only fold, keeping the grave
+    ("Ἄρης", "Ἄ^ρης", "hypotactic"),          # the accent-and-case fold
+    ("Ἆπις", "Ἆπι^ς", "accent_rules"),        # the rules run on the folded word
+    ("Ἕλλησιν", "Ἕλλησι^ν", "accent_rules"),
+])
+def test_folded_probes(macronizer, word, expected, module):
+    assert macronize(macronizer, word) == (expected, (module,))
+
+
+@pytest.mark.parametrize("word, expected", [
+    # the full forms of most of these end in α, which the elision recursion never tried
+    ("οὔτιν'", "οὔτι^ν'"),
+    ("τάχιστ'", "τά^χιστ'"),
+    ("ἐλύσατ'", "ἐλύ_σα^τ'"),
+    ("ἀγάλματ'", "ἀ^γάλμα^τ'"),
+    ("παρ'", "πα^ρ'"),
+    ("τίν'", "τί^ν'"),        # the accent rules on the stem with ε in its place
+])
+def test_elision(macronizer, word, expected):
+    assert macronize(macronizer, word) == (expected, ("elision",))
+
+
+def test_elision_against_lsj(macronizer):
+    # hypotactic has φύ^λα_κα^, with the length of its position in the verse; LSJ has φύ^λα^ξ
+    assert macronize(macronizer, "φύλακ'")[0] != "φύ^λα_κ'"
+
+
+def test_double_accent(macronizer):
+    macronized, modules = macronize(macronizer, "Καλλίμαχός")
+    # the markup of Καλλίμαχος put back on the token (its ι is not known either way)
+    assert macronized.endswith("μα^χός")
+    assert "double_accent" in modules
+
+
+def test_forms_memo_is_bounded(macronizer, monkeypatch):
+    from grc_macronizer import class_macronizer
+    from grc_macronizer.plain_text import NO_MORPH
+    monkeypatch.setattr(class_macronizer, "MEMO_SIZE", 2)
+    monkeypatch.setattr(macronizer, "forms", class_macronizer.OrderedDict())
+    for form in ("Καλλίμαχος", "πράγματα", "ἄνθρωπος", "πράγματα", "στρατηγός"):
+        macronizer.macronize_form(form, form, "X", NO_MORPH, 1)
+    assert [memo_key[0] for memo_key in macronizer.forms] == ["πράγματα", "στρατηγός"]
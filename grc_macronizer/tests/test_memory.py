@@ -0,0 +1,29 @@
+'''
+The memory budget of the databases (see memory.py).
+'''
+import json
+
+from grc_macronizer.memory import check_budget, DATABASES, DEFAULT_BUDGET_MB, format_report, load_budget, MB
+
+
+def test_check_budget():
+    report = {"lsj": 12 * MB, "hypotactic": 3 * MB, "total": 200 * MB, "peak": 900 * MB}
+    assert check_budget(report, {"lsj": 10, "hypotactic": 15, "total": 300}) == ["lsj: 12.0 MB > 10 MB"]
+    assert check_budget(report, {"proper_names": 1}) == [] # not measured
+
+
+def test_every_database_has_a_budget():
+    assert {name for name, _ in DATABASES} | {"rest", "total"} == set(DEFAULT_BUDGET_MB)
+
+
+def test_load_budget(tmp_path):
+    path = tmp_path / "budget.json"
+    path.write_text(json.dumps({"lsj": 5, "total": 100}), encoding="utf-8")
+    assert load_budget(path) == {"lsj": 5, "total": 100}
+
+
+def test_format_report():
+    assert format_report({"lsj": 2 * MB, "total": 10 * MB}).splitlines() == [
+        f"{'total':<24}{10.0:>10.1f} MB",
+        f"{'lsj':<24}{2.0:>10.1f} MB",
+    ]
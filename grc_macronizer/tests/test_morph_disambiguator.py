@@ -0,0 +1,43 @@
+'''
+The ambiguous Wiktionary forms, compiled into a feature-keyed index and disambiguated by the morphology of the token
+(see morph_disambiguator.py).
+'''
+import pytest
+
+from grc_macronizer.class_token import Morph
+from grc_macronizer.morph_disambiguator import compile_index, disambiguate
+
+AMBIGUOUS = {
+    'ψεφαρα': [['ψεφᾰρᾱ', 'ψεφᾰρᾰ'], ['Table 1', 'Table 1'], ['Nominative', 'Nominative'], ['', ''], ['Feminine', 'Neuter'], ['Singular', 'Plural']],
+    'καλός': [['κᾰλος'], ['Table 1'], ['Nominative'], [''], ['Masculine'], ['Singular']], # no accent: not the word of its key
+}
+
+
+@pytest.fixture(scope="module")
+def index():
+    index, dropped = compile_index(AMBIGUOUS)
+    assert dropped == {'καλός': ['κᾰλος']}
+    return index
+
+
+@pytest.mark.parametrize("morph, expected", [
+    ("Case=Nom|Gender=Fem|Number=Sing", "ψεφα^ρα_"),
+    ("Case=Nom|Gender=Neut|Number=Plur", "ψεφα^ρα^"),
+    ("Case=Acc|Gender=Neut|Number=Plur", "ψεφα^ρα^"),   # no such cell: falls back to the gender
+    ("Case=Nom|Number=Sing", "ψεφα^ρα_"),               # no gender: case and number
+])
+def test_disambiguate(index, morph, expected):
+    assert disambiguate(index, 'ψεφαρα', Morph(morph)) == expected
+
+
+def test_without_morphology(index):
+    assert disambiguate(index, 'ψεφαρα') == 'ψεφα^ρα' # what both readings agree on
+
+
+def test_unknown_words(index):
+    assert disambiguate(index, 'καλός', Morph("Case=Nom|Gender=Masc|Number=Sing")) is None
+    assert disambiguate(index, 'λόγος') is None
+
+
+def test_stable_order(index):
+    assert list(compile_index(AMBIGUOUS)[0]) == list(index)
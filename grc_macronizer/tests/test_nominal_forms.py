@@ -0,0 +1,55 @@
+'''
+The nominal-form rules, dispatched from NOMINAL_TABLE by the morph signature (see nominal_forms.py).
+'''
+import pytest
+
+from grc_macronizer.class_token import Morph, morph_signature
+from grc_macronizer.nominal_forms import IONIC_ETA_STEMS, macronize_nominal_forms
+
+
+@pytest.mark.parametrize("word, lemma, pos, morph, expected", [
+    # 1D, with an Ionic κιθάρη
+    ("κιθάρα", "κιθάρα", "NOUN", "Case=Nom|Gender=Fem|Number=Sing", "κιθάρα_"),
+    ("κιθάραν", "κιθάρα", "NOUN", "Case=Acc|Gender=Fem|Number=Sing", "κιθάρα_ν"),
+    ("κιθάρας", "κιθάρα", "NOUN", "Case=Gen|Gender=Fem|Number=Sing", "κιθάρα_ς"),
+    ("καλάς", "καλός", "ADJ", "Case=Acc|Gender=Fem|Number=Plur", "καλά_ς"),
+    # masculine and neuter -α, datives on -ι(ν)
+    ("ἄνδρα", "ἀνήρ", "NOUN", "Case=Acc|Gender=Masc|Number=Sing", "ἄνδρα^"),
+    ("ἄλλα", "ἄλλος", "ADJ", "Case=Nom|Gender=Neut|Number=Plur", "ἄλλα^"),
+    ("ἀνδράσι", "ἀνήρ", "NOUN", "Case=Dat|Gender=Masc|Number=Plur", "ἀνδράσι^"),
+    ("ἀνδράσιν", "ἀνήρ", "NOUN", "Case=Dat|Gender=Masc|Number=Plur", "ἀνδράσι^ν"),
+    # stem suffixes
+    ("πολιτικόν", "πολιτικός", "ADJ", "Case=Acc|Gender=Masc|Number=Sing", "πολιτι^κόν"),
+    # duals are left alone, and so are 1D words without an Ionic -η
+    ("κιθάρα", "κιθάρα", "NOUN", "Case=Nom|Gender=Fem|Number=Dual", "κιθάρα"),
+    ("πέτρα", "πέτρα", "NOUN", "Case=Nom|Gender=Fem|Number=Sing", "πέτρα"),
+])
+def test_rules(word, lemma, pos, morph, expected):
+    assert macronize_nominal_forms(word, lemma, pos, Morph(morph), debug=False) == expected
+
+
+def test_ionic_eta_stems():
+    assert "κιθάρ" in IONIC_ETA_STEMS
+    assert "πέτρ" not in IONIC_ETA_STEMS
+
+
+class SpacyMorph:
+    '''
+    spaCy's MorphAnalysis: .get returns the list of the values of a feature.
+    '''
+    def __init__(self, features):
+        self.features = features
+
+    def get(self, name):
+        return self.features.get(name, [])
+
+
+def test_signature():
+    signature = Morph("Case=Acc|Gender=Fem|Number=Sing").signature()
+    assert (signature.case, signature.number, signature.gender) == ({"Acc"}, {"Sing"}, {"Fem"})
+    assert morph_signature(SpacyMorph({"Case": ["Acc", "Nom"], "Gender": ["Fem"]})) == ({"Acc", "Nom"}, set(), {"Fem"})
+
+
+def test_spacy_morph():
+    morph = SpacyMorph({"Case": ["Acc"], "Gender": ["Fem"], "Number": ["Sing"]})
+    assert macronize_nominal_forms("κιθάραν", "κιθάρα", "NOUN", morph, debug=False) == "κιθάρα_ν"
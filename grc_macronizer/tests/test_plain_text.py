@@ -0,0 +1,56 @@
+'''
+Plain text split into words by a regular expression (see plain_text.py).
+'''
+import pytest
+
+from grc_macronizer.plain_text import is_macronizable, macronize_lines, macronize_plain_text, tokenize
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Δαρείου καὶ Παρυσάτιδος γίγνονται παῖδες δύο.", ["Δαρείου", "καὶ", "Παρυσάτιδος", "γίγνονται", "παῖδες", "δύο"]),
+    ("πρεσβύτερος μὲν Ἀρταξέρξης, νεώτερος δὲ Κῦρος·", ["πρεσβύτερος", "μὲν", "Ἀρταξέρξης", "νεώτερος", "δὲ", "Κῦρος"]),
+    ("ἀλλ’ οὐ τάχ' ἔσται (1, 2)", ["ἀλλ’", "οὐ", "τάχ'", "ἔσται"]),   # elision marks stay with their word
+    ("", []),
+])
+def test_tokenize(line, expected):
+    assert tokenize(line) == expected
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("Παρυσάτιδος", True),
+    ("καὶ", False),    # a stop word
+    ("Κῦρος", False),  # no dichrona in open syllables
+])
+def test_is_macronizable(word, expected):
+    assert is_macronizable(word) is expected
+
+
+class FakeMacronizer:
+    '''
+    Marks the first α, ι or υ of every word short, and counts the words it is asked.
+    '''
+    def __init__(self):
+        self.words = []
+
+    def macronize_word(self, word, lemma, pos, morph):
+        self.words.append(word)
+        for i, char in enumerate(word):
+            if char in "αιυ":
+                return word[:i + 1] + "^" + word[i + 1:], ("custom",)
+        return word, ()
+
+
+def test_layout_round_trip():
+    text = "Δαρείου καὶ Παρυσάτιδος γίγνονται παῖδες δύο.\r\n\n  πρεσβύτερος μὲν Ἀρταξέρξης, νεώτερος δὲ Κῦρος· Δαρείου\n"
+    macronizer = FakeMacronizer()
+    output = macronize_plain_text(macronizer, text)
+    assert output.replace("^", "") == text # punctuation, spacing and line endings as they were
+    assert output.startswith("Δα^ρείου καὶ Πα^ρυσάτιδος")
+    assert macronizer.words.count("Δαρείου") == 1 # once per type
+
+
+def test_lines_are_streamed():
+    lines = iter(["ἂν Δαρείου\n", "δύο"])
+    output = macronize_lines(FakeMacronizer(), lines)
+    assert next(output) == "ἂ^ν Δα^ρείου\n"
+    assert next(output) == "δύο"
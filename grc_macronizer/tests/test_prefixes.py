@@ -0,0 +1,54 @@
+'''
+Splitting lemmata on their preverbs with the prefix trie, and the markup it gives the token (see prefixes.py).
+'''
+import pytest
+
+from grc_macronizer.prefixes import PrefixTrie
+
+STEMS = {
+    'βαινω', 'αβαινω', 'βαλλω', 'παραβαλλω', 'τριβω', 'διατριβω', 'ικνεομαι', 'ειλεω', 'λαω', 'ος',
+    'αινεω', 'ινεω', 'αισχυνω', 'ισχυνω', 'αιρεω', 'ιρεω',
+}
+
+
+@pytest.fixture(scope="module")
+def trie():
+    return PrefixTrie(STEMS)
+
+
+@pytest.mark.parametrize("lemma, expected", [
+    ("ἀναβαίνω", [("ανα", "ανα")]),                             # not ἀν-αβαίνω
+    ("ἀφικνέομαι", [("απο", "αφ")]),
+    ("ἀντιπαραβάλλω", [("αντι", "αντι"), ("παρα", "παρα")]),    # stacked preverbs
+    ("ἐνδιατρίβω", [("εν", "εν"), ("δια", "δια")]),
+    ("παραινέω", [("παρα", "παρ")]),                            # not παρα-ινέω, which splits a diphthong
+    ("καταισχύνω", [("κατα", "κατ")]),
+    ("ἀναιρέω", [("ανα", "αν")]),
+    ("ξυνός", []),                                              # what is left must be a stem of three letters or more
+    ("συλάω", []),
+])
+def test_split(trie, lemma, expected):
+    assert [(variant.preverb, variant.bare) for variant in trie.split(lemma)] == expected
+
+
+@pytest.mark.parametrize("token, lemma, expected", [
+    ("ἀναβαίνω", "ἀναβαίνω", "ἀ^να^βαίνω"),
+    ("ἀπέβαλον", "ἀποβάλλω", "ἀ^πέβαλον"),        # the variant the token shows, not that of the lemma
+    ("ἀφίκοντο", "ἀφικνέομαι", "ἀ^φίκοντο"),
+    ("ἀνειλέω", "ἀνειλέω", "ἀ^νειλέω"),
+    ("διατρίβω", "διατρίβω", "δι^α^τρίβω"),
+    ("ἀντιπαραβάλλω", "ἀντιπαραβάλλω", "ἀντι^πα^ρα^βάλλω"),
+    ("ἐνδιατρίβω", "ἐνδιατρίβω", "ἐνδι^α^τρίβω"),
+    ("παραινέω", "παραινέω", "πα^ραινέω"),
+    ("καταισχύνω", "καταισχύνω", "κα^ταισχύνω"),
+    ("ἀναιρέω", "ἀναιρέω", "ἀ^ναιρέω"),
+    ("ξυνῇ", "ξυνός", None),                      # not ξυ^νῇ
+    ("συλάω", "συλάω", None),                     # not συ^λάω
+])
+def test_macronize(trie, token, lemma, expected):
+    assert trie.macronize(token, lemma) == expected
+
+
+def test_split_is_memoized(trie):
+    assert trie.split("ἀναβαίνω") is trie.split("ἀναβαίνω")
+    assert "ἀναβαίνω" in trie.splits
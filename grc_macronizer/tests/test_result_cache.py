@@ -0,0 +1,67 @@
+'''
+The persistent cache of results, stamped with the fingerprint of the databases and rules (see result_cache.py).
+'''
+import pytest
+
+from grc_macronizer.class_token import Morph
+from grc_macronizer.result_cache import database_fingerprint, ResultCache
+
+MORPH = Morph("Case=Acc|Gender=Masc|Number=Sing")
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "results.sqlite"
+
+
+def test_round_trip(path):
+    cache = ResultCache(path, "rules.databases")
+    assert cache.get("στρατηγόν", "στρατηγός", "NOUN", MORPH) is None
+    cache.add("στρατηγόν", "στρατηγός", "NOUN", MORPH, "στρα^τηγόν", ["lsj"])
+    assert cache.get("στρατηγόν", "στρατηγός", "NOUN", MORPH) == ("στρα^τηγόν", ("lsj",)) # pending, not yet written
+    cache.put_many(cache.take_pending())
+    assert cache.pending == {}
+    cache.close()
+
+    reader = ResultCache(path, "rules.databases", readonly=True)
+    assert len(reader) == 1
+    assert reader.get("στρατηγόν", "στρατηγός", "NOUN", MORPH) == ("στρα^τηγόν", ("lsj",))
+    assert reader.get("στρατηγόν", "στρατηγός", "NOUN", Morph("Case=Nom")) is None # keyed on the morphology too
+    with pytest.raises(ValueError):
+        reader.put_many([])
+    reader.close()
+
+
+def test_other_fingerprint(path):
+    cache = ResultCache(path, "rules.databases")
+    cache.add("χώραν", "χώρα", "NOUN", MORPH, "χώ_ραν", ["lsj"])
+    cache.put_many(cache.take_pending())
+    cache.close()
+
+    # a reader does not use stale results, but leaves them alone
+    reader = ResultCache(path, "rules.new databases", readonly=True)
+    assert not reader.valid
+    assert len(reader) == 0
+    assert reader.get("χώραν", "χώρα", "NOUN", MORPH) is None
+    reader.close()
+
+    # a writer drops them
+    writer = ResultCache(path, "rules.new databases")
+    assert writer.valid
+    assert len(writer) == 0
+    writer.close()
+    assert ResultCache(path, "rules.databases", readonly=True).get("χώραν", "χώρα", "NOUN", MORPH) is None
+
+
+def test_database_fingerprint(tmp_path):
+    (tmp_path / "custom.py").write_text("custom_macron_map = {'τάχα': 'τά^χα^'}\n", encoding="utf-8")
+    (tmp_path / "hypotactic.pkl").write_bytes(b"hypotactic")
+    before = database_fingerprint(tmp_path)
+
+    # what is built from the sources, and what is not data, leaves it alone
+    for name in ("lsj_index.pkl", "filters.pkl", "elisions.pkl", "indexes.json", "crawl_lsj.py"):
+        (tmp_path / name).write_bytes(b"built")
+    assert database_fingerprint(tmp_path) == before
+
+    (tmp_path / "custom.py").write_text("custom_macron_map = {'τάχα': 'τά^χα_'}\n", encoding="utf-8")
+    assert database_fingerprint(tmp_path) != before
@@ -0,0 +1,87 @@
+'''
+Requests to the warm macronization service, independent of the transport (see server.py).
+'''
+import os
+
+import pytest
+
+from grc_macronizer.server import RequestError
+
+CONLLU = (
+    "# sent_id = 1\n"
+    "1\tΔαρείου\tΔαρεῖος\tPROPN\t_\tCase=Gen|Gender=Masc|Number=Sing\t_\t_\t_\t_\n"
+    "2\tκαὶ\tκαί\tCCONJ\t_\t_\t_\t_\t_\tSpaceAfter=No\n"
+    "3\t.\t.\tPUNCT\t_\t_\t_\t_\t_\t_\n"
+    "\n"
+)
+
+
+@pytest.fixture(scope="module")
+def service(tmp_path_factory):
+    # class_macronizer writes its diagnostics to the working directory as soon as it is imported
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("server"))
+    try:
+        from grc_macronizer.server import MacronizationService
+        service = MacronizationService()
+        yield service
+        service.close()
+    finally:
+        os.chdir(cwd)
+
+
+def test_text(service):
+    text = "Δαρείου καὶ Παρυσάτιδος γίγνονται παῖδες δύο.\nπρεσβύτερος μὲν Ἀρταξέρξης·\n"
+    answer = service.handle({"text": text})
+    # the layout comes back as it was, punctuation and line breaks included
+    assert answer["output"].replace("^", "").replace("_", "") == text
+    assert answer["output"] != text
+    assert answer["stats"]["sentences"] == 2 # lines
+    assert answer["stats"]["tokens"] == 9
+
+
+@pytest.mark.parametrize("provenance", [False, True])
+def test_conllu(service, provenance):
+    answer = service.handle({"conllu": CONLLU, "provenance": provenance})
+    lines = answer["output"].splitlines()
+    assert lines[0] == "# sent_id = 1"
+    misc = lines[1].split("\t")[9]
+    assert misc.startswith("Macronized=Δα")
+    assert ("MacronizedBy=" in misc) is provenance
+    assert lines[2].split("\t")[9].startswith("SpaceAfter=No") # the MISC column is kept
+    assert lines[3].split("\t")[9] == "_"                      # words without vowels are left alone
+    assert answer["stats"]["sentences"] == 1
+    assert answer["stats"]["tokens"] == 3
+
+
+def test_sentences(service):
+    sentences = [["Δαρείου", {"form": "καὶ", "lemma": "καί", "upos": "CCONJ"}], ["δύο"]]
+    answer = service.handle({"sentences": sentences, "provenance": True})
+    assert [[word.replace("^", "").replace("_", "") for word in sentence] for sentence in answer["output"]] == [["Δαρείου", "καὶ"], ["δύο"]]
+    assert [len(sentence) for sentence in answer["modules"]] == [2, 1]
+    assert answer["stats"]["sentences"] == 2
+    assert answer["stats"]["tokens"] == 3
+
+
+@pytest.mark.parametrize("payload", [
+    ["Δαρείου"],
+    {},
+    {"text": "δύο", "conllu": CONLLU},
+    {"text": 2},
+    {"text": "δύο", "genre": "lyric"},
+    {"sentences": ["Δαρείου"]},
+    {"sentences": [[{"lemma": "καί"}]]},
+])
+def test_bad_requests(service, payload):
+    with pytest.raises(RequestError):
+        service.handle(payload)
+
+
+def test_batch(service):
+    requests = service.requests
+    answers = service.handle_batch([{"sentences": [["δύο"]]}, {"text": 2}, {"sentences": [["δύο", "παῖδες"]]}])
+    assert isinstance(answers[1], RequestError) # fails that request only
+    assert answers[0]["output"][0] == answers[2]["output"][0][:1]
+    assert answers[2]["stats"]["batch_size"] == 3
+    assert service.requests == requests + 2
+    assert service.macronizer.cache is service.cache # the batch memo is taken off again
@@ -0,0 +1,92 @@
+'''
+The memory-mapped tables the worker processes share (see shared_db.py).
+'''
+import pytest
+
+from grc_macronizer import result_cache, shared_db
+from grc_macronizer.shared_db import SharedTable, publish, shared_databases, TABLES, write_table
+
+
+@pytest.mark.parametrize("collection, codec", [
+    ({'χώρα': 'χώ_ρα_', 'ἄγαλμα': 'ἄ^γαλμα^', 'ὧδε': ''}, "str"),
+    ({'κάλλιστος': [['κᾰ́λλιστος'], ['καλλίστη']], 'δύο': {'Number': 'Dual'}}, "json"),
+])
+def test_dict_tables(tmp_path, collection, codec):
+    write_table(tmp_path / "table.tbl", collection, codec)
+    table = SharedTable(tmp_path / "table.tbl")
+    assert table.codec == codec
+    assert len(table) == len(collection)
+    assert list(table) == list(collection)
+    assert all(table[key] == value for key, value in collection.items())
+    assert table.get('λόγος', 'default') == 'default'
+    with pytest.raises(KeyError):
+        table['λόγος']
+
+
+def test_set_table(tmp_path):
+    write_table(tmp_path / "table.tbl", {'Κῦρος', 'Ἀρταξέρξης', 1}, "set") # only strings are written
+    table = SharedTable(tmp_path / "table.tbl")
+    assert len(table) == 2
+    assert 'Κῦρος' in table
+    assert 'κῦρος' not in table
+    assert 1 not in table
+    assert table.get('Κῦρος') is None
+    with pytest.raises(KeyError):
+        table['Κῦρος']
+
+
+def test_many_keys(tmp_path):
+    # enough keys for their CRC32s to collide in the slots
+    collection = {f"λόγος{i}": f"λό^γος{i}" for i in range(5000)}
+    write_table(tmp_path / "table.tbl", collection, "str")
+    table = SharedTable(tmp_path / "table.tbl")
+    assert all(table.get(key) == value for key, value in collection.items())
+    assert f"λόγος{5000}" not in table
+
+
+def test_empty_table(tmp_path):
+    write_table(tmp_path / "table.tbl", {}, "str")
+    table = SharedTable(tmp_path / "table.tbl")
+    assert len(table) == 0
+    assert 'λόγος' not in table
+
+
+def test_not_a_table(tmp_path):
+    (tmp_path / "table.tbl").write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        SharedTable(tmp_path / "table.tbl")
+
+
+def test_ionic_eta_stems(tmp_path):
+    loader, codec = TABLES["ionic_eta_stems"]
+    write_table(tmp_path / "ionic_eta_stems.tbl", loader(), codec)
+    stems = SharedTable(tmp_path / "ionic_eta_stems.tbl")
+    assert "κιθάρ" in stems # as nominal_forms.IONIC_ETA_STEMS
+    assert "πέτρ" not in stems
+
+
+@pytest.fixture
+def small_databases(monkeypatch):
+    fingerprint = {"value": "databases"}
+    monkeypatch.setattr(shared_db, "TABLES", {
+        "lsj": (lambda: {'χώρα': 'χώ_ρα_'}, "str"),
+        "proper_names": (lambda: {'Κῦρος'}, "set"),
+    })
+    monkeypatch.setattr(result_cache, "database_fingerprint", lambda db_dir=None: fingerprint["value"])
+    return fingerprint
+
+
+def test_publish(tmp_path, small_databases, monkeypatch):
+    monkeypatch.delenv(shared_db.ENV_VAR, raising=False)
+    assert shared_databases() is None
+    assert shared_databases(tmp_path) is None # nothing published yet
+
+    assert publish(tmp_path)
+    assert not publish(tmp_path) # up to date
+    tables = shared_databases(tmp_path)
+    assert tables["lsj"]['χώρα'] == 'χώ_ρα_'
+    assert 'Κῦρος' in tables["proper_names"]
+
+    small_databases["value"] = "new databases"
+    assert shared_databases(tmp_path) is None # stale
+    assert publish(tmp_path)
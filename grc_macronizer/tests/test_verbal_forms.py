@@ -0,0 +1,25 @@
+'''
+The verbal-form rules, compiled into a suffix trie (see verbal_forms.py).
+'''
+import pytest
+
+from grc_macronizer.class_token import Morph
+from grc_macronizer.verbal_forms import macronize_verbal_forms
+
+PRESENT = "Mood=Ind|Tense=Pres|VerbForm=Fin|Voice=Act"
+
+
+@pytest.mark.parametrize("word, lemma, morph, expected", [
+    # -νυμι: υ long in the singular, short in the plural (δείκνυ_ς^, δείκνυτ_ε^ and δεικνύα^σ_ιν^ before the trie)
+    ("δείκνυμι", "δείκνυμι", f"{PRESENT}|Number=Sing|Person=1", "δείκνυ_μι^"),
+    ("δείκνυς", "δείκνυμι", f"{PRESENT}|Number=Sing|Person=2", "δείκνυ_ς"),
+    ("δείκνυτε", "δείκνυμι", f"{PRESENT}|Number=Plur|Person=2", "δείκνυ^τε"),
+    ("δεικνύασιν", "δείκνυμι", f"{PRESENT}|Number=Plur|Person=3", "δεικνύ^α_σι^ν"),
+    # any other -μι
+    ("τίθημι", "τίθημι", f"{PRESENT}|Number=Sing|Person=1", "τίθημι^"),
+    # present imperative 3p sing of -αω
+    ("τιμάτω", "τιμάω", "Mood=Imp|Number=Sing|Person=3|Tense=Pres|VerbForm=Fin|Voice=Act", "τιμά_τω"),
+    ("τιμάσθω", "τιμάω", "Mood=Imp|Number=Sing|Person=3|Tense=Pres|VerbForm=Fin|Voice=Mid", "τιμά_σθω"),
+])
+def test_rules(word, lemma, morph, expected):
+    assert macronize_verbal_forms(word, lemma, "VERB", Morph(morph)) == expected
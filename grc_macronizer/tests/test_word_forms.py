@@ -0,0 +1,79 @@
+'''
+The per-type forms of a word (see word_forms.py).
+'''
+from pathlib import Path
+import unicodedata
+
+import grc_utils
+import pytest
+
+from grc_macronizer import word_forms
+from grc_macronizer.format_macrons import transfer_markup
+from grc_macronizer.incremental import load_database
+from grc_macronizer.word_forms import NormalizedWord, canonical, folds, key, normalize_word, single_accent
+
+DB_DIR = Path(word_forms.__file__).resolve().parent / "db"
+
+
+def test_normalize_word():
+    decomposed = unicodedata.normalize("NFD", "στρατηγόν")
+    normalized = normalize_word(decomposed)
+    assert type(normalized) is NormalizedWord
+    assert normalized == grc_utils.normalize_word(decomposed)
+    assert normalize_word(normalized) is normalized # not normalized again
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("χώ_ρα^", "χώρα"),
+    ("ψεφᾰρᾱ", "ψεφαρα"),
+    ("στρα^τηγόν", "στρατηγόν"),
+])
+def test_key(word, expected):
+    assert key(word) == expected
+    assert type(key(word)) is NormalizedWord
+
+
+@pytest.mark.parametrize("word", ["ἄγαλμα", "Ἄρης", "στρατηγὸν", "μοῦσαι"])
+def test_same_answers_as_grc_utils(word):
+    assert word_forms.only_bases(word) == grc_utils.only_bases(word)
+    assert word_forms.lower_grc(word) == grc_utils.lower_grc(word)
+    assert word_forms.count_dichrona_in_open_syllables(word) == grc_utils.count_dichrona_in_open_syllables(word)
+
+
+def test_custom_module_loads_on_its_own():
+    # incremental.py runs the databases with runpy, without the package around them
+    assert "custom_macron_map" in load_database(DB_DIR / "custom.py")
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("Σπονδὰς", ("σπονδὰς", "σπονδάς")),   # the case-only fold first: hypotactic keys verse forms with their graves
+    ("στρατηγὸν", ("στρατηγόν",)),
+    ("Ἄρης", ("ἄρης",)),
+    ("ἄρης", ()),                          # already folded
+])
+def test_folds(word, expected):
+    assert folds(word) == expected
+
+
+def test_canonical():
+    assert canonical("Σπονδὰς") == "σπονδάς"
+    assert len(canonical("Σπονδὰς")) == len("Σπονδὰς")
+
+
+@pytest.mark.parametrize("markup, word, expected", [
+    ("ἄ^ρης", "Ἄρης", "Ἄ^ρης"),
+    ("στρα^τηγόν", "στρατηγὸν", "στρα^τηγὸν"),
+    ("ἄ^ρης", "Ἄρη", None),                # not the same length
+])
+def test_transfer_markup(markup, word, expected):
+    assert transfer_markup(markup, word) == expected
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("Καλλίμαχός", ("Καλλίμαχος", 8)),
+    ("οἷός", ("οἷος", 2)),                 # the breathing and circumflex of the first accent are kept
+    ("πράγματά", ("πράγματα", 7)),
+    ("ἄνθρωπος", None),
+])
+def test_single_accent(word, expected):
+    assert single_accent(word) == expected
@@ -8,12 +8,103 @@ The main verbal forms that contain dichrona are:
 - imperfect and imperative 2 & 3p sing of verba contracta on -αω
     - however, only imperative 3p sing (e.g. τιμάτω) is not covered by the σωτῆρα rule
 
+The rules are declarative: (lemma suffix, morphology, form suffix, the form suffix with markup), all without diacritics.
+They are compiled into a trie over the reversed form suffixes, so that finding the rules for a word costs
+one step per letter of its longest matching ending, however many rules there are.
+The longest form suffix wins; rules with the same form suffix are tried in the order they are declared.
+
+To add a paradigm, add its endings to VERBAL_RULES.
 '''
-from grc_utils import only_bases
+from collections import namedtuple
+
+from .word_forms import only_bases
+
+VerbalRule = namedtuple("VerbalRule", ["lemma_suffix", "morph", "form_suffix", "markup"])
+
+NYMI_PRESENT = {"Tense": "Pres", "Voice": "Act", "Mood": "Ind", "VerbForm": "Fin"}
+IMPERATIVE_3_SING = {"Tense": "Pres", "Mood": "Imp", "Person": "3", "Number": "Sing"}
+
+VERBAL_RULES = [
+    # Present active indicative (finite) conjugation of -νυμι (υ long in "Sing" and short in "Plur")
+    VerbalRule("νυμι", {**NYMI_PRESENT, "Number": "Sing", "Person": "1"}, "υμι", "υ_μι^"),
+    VerbalRule("νυμι", {**NYMI_PRESENT, "Number": "Sing", "Person": "2"}, "υς", "υ_ς"),
+    VerbalRule("νυμι", {**NYMI_PRESENT, "Number": "Sing", "Person": "3"}, "υσι", "υ_σι^"),
+    VerbalRule("νυμι", {**NYMI_PRESENT, "Number": "Sing", "Person": "3"}, "υσιν", "υ_σι^ν"),
+    VerbalRule("νυμι", {**NYMI_PRESENT, "Number": "Plur", "Person": "1"}, "υμεν", "υ^μεν"),
+    VerbalRule("νυμι", {**NYMI_PRESENT, "Number": "Plur", "Person": "2"}, "υτε", "υ^τε"),
+    VerbalRule("νυμι", {**NYMI_PRESENT, "Number": "Plur", "Person": "3"}, "υασι", "υ^α_σι^"),
+    VerbalRule("νυμι", {**NYMI_PRESENT, "Number": "Plur", "Person": "3"}, "υασιν", "υ^α_σι^ν"),
+    # any other -μι
+    VerbalRule("", {}, "μι", "μι^"),
+
+    # Present imperative 3p sing of -αω: αε contracts to long α (τιμα_τω, τιμα_σθω)
+    VerbalRule("αω", {**IMPERATIVE_3_SING, "Voice": "Act"}, "ατω", "α_τω"),
+    VerbalRule("αω", IMPERATIVE_3_SING, "ασθω", "α_σθω"),
+]
+
+
+def compile_markup(form_suffix, markup):
+    '''
+    The markup of a suffix as [(index in the suffix after which the mark goes, mark), ...].
+    '''
+    marks = []
+    index = 0
+    for char in markup:
+        if char in "^_":
+            marks.append((index, char))
+        else:
+            index += 1
+    if markup.replace("^", "").replace("_", "") != form_suffix:
+        raise ValueError(f"Verbal rule markup {markup!r} does not match the form suffix {form_suffix!r}")
+    return tuple(marks)
+
+
+def compile_rules(rules):
+    '''
+    A trie over the reversed form suffixes: {char: node}, where the rules ending at a node are under the key None.
+    '''
+    trie = {}
+    for rule in rules:
+        node = trie
+        for char in reversed(rule.form_suffix):
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append((rule, compile_markup(rule.form_suffix, rule.markup)))
+    return trie
+
+
+VERBAL_TRIE = compile_rules(VERBAL_RULES)
+
+
+def matching_rules(bare_word):
+    '''
+    The rules whose form suffix ends bare_word, longest suffix first.
+    '''
+    found = []
+    node = VERBAL_TRIE
+    for char in reversed(bare_word):
+        node = node.get(char)
+        if node is None:
+            break
+        if None in node:
+            found.append(node[None])
+    return [rule for rules in reversed(found) for rule in rules]
+
+
+def apply_markup(word, length, marks):
+    tail = word[len(word) - length:]
+    marked = []
+    previous = 0
+    for index, mark in marks:
+        marked.append(tail[previous:index])
+        marked.append(mark)
+        previous = index
+    marked.append(tail[previous:])
+    return word[:len(word) - length] + "".join(marked)
+
 
 def macronize_verbal_forms(word, lemma, pos, morph, debug=False):
     '''
-    Reference: morph.get takes keys and values from: 
+    Reference: morph.get takes keys and values from:
     Mood=Imp|Number=Sing|Person=2|Tense=Pres|VerbForm=Fin|Voice=Act
     '''
 
@@ -24,41 +115,14 @@ def macronize_verbal_forms(word, lemma, pos, morph, debug=False):
     #     if debug:
     #         print(f"\t{word} is not VERB but {pos}")
     #     return word
-    
-    def mi_verbs(word, lemma, morph):
-        # Present active indicative (finite) conjugation of -νυμι (υ long in "Sing" and short in "Plur")
-        if only_bases(lemma)[-4:] == "νυμι" and morph.get("Tense") == "Pres" and morph.get("Voice") == "Act" and morph.get("Mood") == "Ind" and morph.get("VerbForm") == "Fin":
-            if morph.get("Number") == "Sing":
-                # νυ_μι^
-                if morph.get("Person") == "1":
-                    return word[:-2] + "_" + word[-2:] + "^"
-                # νυ_ς
-                if morph.get("Person") == "2":
-                    return word[:-1] + "_" + word[-1] + "^"
-                # νυ_σι^
-                if morph.get("Person") == "3" and word[-1] == "ι":
-                    return word[:-2] + "_" + word[-2:] + "^"
-                # νυ_σι^ν
-                if morph.get("Person") == "3" and word[-1] == "ν":
-                    return word[:-3] + "_" + word[-3:-1] + "^" + word[-1]
-            if morph.get("Number") == "Plur":
-                # νυ^μεν
-                if morph.get("Person") == "1":
-                    return word[:-3] + "^" + word[-3:]
-                # νυ^τε
-                if morph.get("Person") == "2":
-                    return word[:-1] + "_" + word[-1] + "^"
-                # νυ^α_σι^
-                if morph.get("Person") == "3":
-                    return word[:-3] + "^" + word[-3] + "_" + word[-2:] + "^"
-                # νυ^α_σι^ν
-                if morph.get("Person") == "3":
-                    return word[:-4] + "^" + word[-3] + "_" + word[-3:-1] + "^" + word[-1]
-        elif only_bases(word)[-2:] == "μι":
-            return word + "^"
-
-    result = mi_verbs(word, lemma, morph)
-    if result:
-        return result
-
-    return word
\ No newline at end of file
+
+    rules = matching_rules(only_bases(word))
+    if not rules:
+        return word
+
+    bare_lemma = only_bases(lemma)
+    for rule, marks in rules:
+        if bare_lemma.endswith(rule.lemma_suffix) and all(morph.get(feature) == value for feature, value in rule.morph.items()):
+            return apply_markup(word, len(rule.form_suffix), marks)
+
+    return word
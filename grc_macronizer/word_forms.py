@@ -0,0 +1,121 @@
+'''
+The forms of a word that the pipeline asks for over and over, computed once per word type.
+
+Tokens are normalized once, when they enter the pipeline (class_text.py, plain_text.py), and carried through it as
+NormalizedWord, a str that is known to be normalized, so that normalize_word() returns them as they are rather than
+running Unicode normalization on them again in every stage. Strings built from them (recursion variants, markup)
+are plain str again, and are normalized, like every other string, through a memo per type.
+
+The other forms asked of the same strings by many stages are memoized per type too:
+    - key(): the key of a word in the databases (normalized, without markup or Unicode macrons)
+    - canonical(): the key folded for accent and case (final grave made acute, first letter lowercased), and folds(),
+      the keys the databases are probed with when the key itself is not in them
+    - single_accent(): the word without the second accent an enclitic gives it (Καλλίμαχός => Καλλίμαχος)
+    - only_bases() and lower_grc(), as in grc_utils
+    - count_dichrona_in_open_syllables(), as in grc_utils, which syllabifies the word and is asked of every token
+      before and after every module (it is the costliest of them all)
+
+The functions have the names and the answers of their grc_utils counterparts, so modules import them from here instead.
+'''
+from functools import lru_cache
+import unicodedata
+
+from grc_utils import ACCENTS
+from grc_utils import count_dichrona_in_open_syllables as grc_count_dichrona_in_open_syllables
+from grc_utils import lower_grc as grc_lower_grc
+from grc_utils import no_macrons
+from grc_utils import normalize_word as grc_normalize_word
+from grc_utils import only_bases as grc_only_bases
+
+from .barytone import grave_to_acute
+
+MEMO_SIZE = 1 << 18
+ACUTE = "\u0301"
+
+
+class NormalizedWord(str):
+    '''
+    A string that normalize_word() leaves as it is.
+    '''
+    __slots__ = ()
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _normalize_word(word):
+    return NormalizedWord(grc_normalize_word(word))
+
+
+def normalize_word(word):
+    if type(word) is NormalizedWord:
+        return word
+    return _normalize_word(word)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def key(word):
+    '''
+    The key of a word in the databases: normalized, without markup (^ and _) or Unicode macrons and breves.
+    '''
+    return NormalizedWord(grc_normalize_word(no_macrons(word.replace('^', '').replace('_', ''))))
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def canonical(word):
+    '''
+    A key folded for accent and case: a grave on either of the last two letters made acute (στρατηγὸν => στρατηγόν)
+    and the first letter lowercased (Ἄρης => ἄρης). It is the key letter for letter, so that markup found for it can be
+    put back on the key by position (see format_macrons.transfer_markup).
+    '''
+    if not word:
+        return word
+    folded = word[:-2] + "".join(grave_to_acute.get(char, char) for char in word[-2:])
+    return NormalizedWord(lower_grc(folded[0]) + folded[1:])
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def folds(word):
+    '''
+    The folded keys of a key, least folded first and without the key itself: folded for case only, keeping its grave
+    (hypotactic has the grave forms of verse: Σπονδὰς as σπονδὰς), then for accent and case (see canonical()).
+    '''
+    if not word:
+        return ()
+    found = []
+    for folded in (NormalizedWord(lower_grc(word[0]) + word[1:]), canonical(word)):
+        if folded != word and folded not in found:
+            found.append(folded)
+    return tuple(found)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def single_accent(word):
+    '''
+    (the word without the acute that an enclitic puts on its ultima, the position of that acute), or None if the word
+    has not two accents. The second accent is the last one, on the last or the next to last letter:
+    Καλλίμαχός => Καλλίμαχος, πράγματά => πράγματα, οἷός => οἷος. The form is the word letter for letter.
+    '''
+    if len(word) < 2 or sum(char in ACCENTS for char in word) < 2:
+        return None
+    position = len(word) - 1 if word[-1] in ACCENTS else len(word) - 2
+    if word[position] not in ACCENTS:
+        return None
+    decomposed = unicodedata.normalize("NFD", word[position])
+    if ACUTE not in decomposed:
+        return None
+    letter = unicodedata.normalize("NFC", decomposed.replace(ACUTE, ""))
+    return NormalizedWord(word[:position] + letter + word[position + 1:]), position
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def only_bases(word):
+    return grc_only_bases(word)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def lower_grc(word):
+    return grc_lower_grc(word)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def count_dichrona_in_open_syllables(word):
+    return grc_count_dichrona_in_open_syllables(word)